@@ -12,8 +12,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Import our models
 from app.db.database import Base
-from app.models.user import User, Role, Permission, UserRole, RolePermission
+from app.models.user import User, Role, Permission, UserRole, RolePermission, RevokedToken, UserSession
 from app.models.land_parcel import LandParcel, Document, Task, Approval, Milestone
+from app.models.notification import Notification, NotificationTemplate, EmailOutbox, NotificationCounter, NotificationJob
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
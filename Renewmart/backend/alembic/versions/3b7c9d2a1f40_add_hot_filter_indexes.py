@@ -0,0 +1,61 @@
+"""Add indexes for hot endpoint filters
+
+Revision ID: 3b7c9d2a1f40
+Revises: e54047eee1a6
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7c9d2a1f40'
+down_revision: Union[str, Sequence[str], None] = 'e54047eee1a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns, partial index predicate)
+# Enum columns are stored by member name, hence the upper-case literals.
+INDEXES = [
+    ('ix_documents_land_parcel_id_id', 'documents', ['land_parcel_id', 'id'], None),
+    ('ix_documents_task_id_id', 'documents', ['task_id', 'id'], None),
+    ('ix_documents_project_id_id', 'documents', ['project_id', 'id'], None),
+    ('ix_documents_proposal_id_id', 'documents', ['proposal_id', 'id'], None),
+    ('ix_tasks_status_id', 'tasks', ['status', 'id'], None),
+    ('ix_tasks_assigned_to_status', 'tasks', ['assigned_to', 'status'], None),
+    ('ix_tasks_land_parcel_id_id', 'tasks', ['land_parcel_id', 'id'], None),
+    ('ix_tasks_project_id_id', 'tasks', ['project_id', 'id'], None),
+    ('ix_tasks_milestone_id_id', 'tasks', ['milestone_id', 'id'], None),
+    ('ix_tasks_due_date', 'tasks', ['due_date'], None),
+    ('ix_approvals_status_id', 'approvals', ['status', 'id'], None),
+    ('ix_approvals_approval_type_id', 'approvals', ['approval_type', 'id'], None),
+    ('ix_approvals_approved_by_status', 'approvals', ['approved_by', 'status'], None),
+    ('ix_approvals_created_by_status', 'approvals', ['created_by', 'status'], None),
+    ('ix_notifications_user_id_created_at_id', 'notifications', ['user_id', 'created_at', 'id'], None),
+    ('ix_notifications_user_id_unread', 'notifications', ['user_id'], "status IN ('PENDING', 'SENT', 'DELIVERED')"),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so
+    # this migration is not atomic; if_not_exists makes it safe to re-run.
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns,
+                unique=False,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None,
+                if_not_exists=True
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,29 @@
+"""Add users.token_version for revoking claims-based tokens
+
+Revision ID: 5d2a8e7c1b64
+Revises: 8f1e2c4b6a93
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2a8e7c1b64'
+down_revision: Union[str, Sequence[str], None] = '8f1e2c4b6a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A constant server default is a metadata-only change, no table rewrite
+    op.add_column('users', sa.Column('token_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'token_version')
@@ -0,0 +1,52 @@
+"""Add pg_trgm indexes for region and name search
+
+Revision ID: 8f1e2c4b6a93
+Revises: 3b7c9d2a1f40
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f1e2c4b6a93'
+down_revision: Union[str, Sequence[str], None] = '3b7c9d2a1f40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, column) pairs searched through app.db.search.fuzzy_match
+TRIGRAM_COLUMNS = [
+    ('investment_opportunities', 'title'),
+    ('investment_opportunities', 'target_region'),
+    ('template_projects', 'name'),
+    ('template_projects', 'region'),
+    ('approval_rules', 'name'),
+    ('approval_rules', 'region'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for table, column in TRIGRAM_COLUMNS:
+            op.create_index(
+                f'ix_{table}_{column}_trgm', table, [column],
+                unique=False,
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'},
+                postgresql_concurrently=True,
+                if_not_exists=True
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # pg_trgm itself is left installed; other objects may depend on it
+    with op.get_context().autocommit_block():
+        for table, column in reversed(TRIGRAM_COLUMNS):
+            op.drop_index(f'ix_{table}_{column}_trgm', table_name=table, postgresql_concurrently=True, if_exists=True)
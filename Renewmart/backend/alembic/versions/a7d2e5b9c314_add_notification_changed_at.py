@@ -0,0 +1,48 @@
+"""Add notifications.changed_at for notification streams
+
+Revision ID: a7d2e5b9c314
+Revises: d6a1c3e8f459
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d2e5b9c314'
+down_revision: Union[str, Sequence[str], None] = 'd6a1c3e8f459'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows keep a NULL changed_at: they are not new to any stream
+    op.add_column('notifications', sa.Column('changed_at', sa.DateTime(timezone=True), nullable=True))
+    op.alter_column('notifications', 'changed_at', server_default=sa.text('now()'))
+    # Partitioned tables cannot be indexed concurrently; this creates the index on every partition
+    op.create_index('ix_notifications_user_id_changed_at', 'notifications', ['user_id', 'changed_at'])
+    # Digest merges change changed_at but not status; they wake streams too
+    op.execute("DROP TRIGGER notifications_notify_status ON notifications")
+    op.execute("""
+        CREATE TRIGGER notifications_notify_status
+        AFTER UPDATE OF status, changed_at ON notifications
+        FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status OR OLD.changed_at IS DISTINCT FROM NEW.changed_at)
+        EXECUTE FUNCTION notify_notification_change()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER notifications_notify_status ON notifications")
+    op.execute("""
+        CREATE TRIGGER notifications_notify_status
+        AFTER UPDATE OF status ON notifications
+        FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)
+        EXECUTE FUNCTION notify_notification_change()
+    """)
+    op.drop_index('ix_notifications_user_id_changed_at', table_name='notifications')
+    op.drop_column('notifications', 'changed_at')
@@ -0,0 +1,100 @@
+"""Add notification_counters maintained by triggers on notifications
+
+Revision ID: a7d3e9f2b851
+Revises: f5b1d8e3c6a2
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3e9f2b851'
+down_revision: Union[str, Sequence[str], None] = 'f5b1d8e3c6a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'notification_counters',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('unread', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    op.execute("""
+        CREATE OR REPLACE FUNCTION count_notification_changes() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO notification_counters (user_id, total, unread)
+                SELECT user_id, count(*), count(*) FILTER (WHERE status IN ('PENDING', 'SENT', 'DELIVERED'))
+                FROM new_rows WHERE user_id IS NOT NULL
+                GROUP BY user_id ORDER BY user_id
+                ON CONFLICT (user_id) DO UPDATE SET
+                    total = notification_counters.total + EXCLUDED.total,
+                    unread = notification_counters.unread + EXCLUDED.unread;
+            ELSIF TG_OP = 'DELETE' THEN
+                INSERT INTO notification_counters (user_id, total, unread)
+                SELECT user_id, -count(*), -count(*) FILTER (WHERE status IN ('PENDING', 'SENT', 'DELIVERED'))
+                FROM old_rows WHERE user_id IS NOT NULL
+                GROUP BY user_id ORDER BY user_id
+                ON CONFLICT (user_id) DO UPDATE SET
+                    total = notification_counters.total + EXCLUDED.total,
+                    unread = notification_counters.unread + EXCLUDED.unread;
+            ELSE
+                INSERT INTO notification_counters (user_id, total, unread)
+                SELECT user_id, sum(total), sum(unread) FROM (
+                    SELECT user_id, 1 AS total, CASE WHEN status IN ('PENDING', 'SENT', 'DELIVERED') THEN 1 ELSE 0 END AS unread
+                    FROM new_rows
+                    UNION ALL
+                    SELECT user_id, -1, CASE WHEN status IN ('PENDING', 'SENT', 'DELIVERED') THEN -1 ELSE 0 END
+                    FROM old_rows
+                ) AS changes
+                WHERE user_id IS NOT NULL
+                GROUP BY user_id HAVING sum(total) <> 0 OR sum(unread) <> 0 ORDER BY user_id
+                ON CONFLICT (user_id) DO UPDATE SET
+                    total = notification_counters.total + EXCLUDED.total,
+                    unread = notification_counters.unread + EXCLUDED.unread;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER notifications_count_insert
+        AFTER INSERT ON notifications REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION count_notification_changes()
+    """)
+    op.execute("""
+        CREATE TRIGGER notifications_count_update
+        AFTER UPDATE ON notifications REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION count_notification_changes()
+    """)
+    op.execute("""
+        CREATE TRIGGER notifications_count_delete
+        AFTER DELETE ON notifications REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION count_notification_changes()
+    """)
+    # The triggers block writes to notifications until this migration
+    # commits, so the backfill cannot miss or double count a change
+    op.execute("""
+        INSERT INTO notification_counters (user_id, total, unread)
+        SELECT user_id, count(*), count(*) FILTER (WHERE status IN ('PENDING', 'SENT', 'DELIVERED'))
+        FROM notifications WHERE user_id IS NOT NULL
+        GROUP BY user_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS notifications_count_delete ON notifications")
+    op.execute("DROP TRIGGER IF EXISTS notifications_count_update ON notifications")
+    op.execute("DROP TRIGGER IF EXISTS notifications_count_insert ON notifications")
+    op.execute("DROP FUNCTION IF EXISTS count_notification_changes()")
+    op.drop_table('notification_counters')
@@ -0,0 +1,65 @@
+"""Add notification_jobs for audience-based bulk sends
+
+Revision ID: b3e8f1a4c927
+Revises: a7d3e9f2b851
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e8f1a4c927'
+down_revision: Union[str, Sequence[str], None] = 'a7d3e9f2b851'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+notification_job_status = sa.Enum('QUEUED', 'RUNNING', 'COMPLETED', 'FAILED', name='notificationjobstatus')
+# Created along with the notifications table
+notification_type = postgresql.ENUM(name='notificationtype', create_type=False)
+notification_channel = postgresql.ENUM(name='notificationchannel', create_type=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'notification_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('status', notification_job_status, nullable=False),
+        sa.Column('audience', sa.JSON(), nullable=False),
+        sa.Column('notification_type', notification_type, nullable=False),
+        sa.Column('channel', notification_channel, nullable=False),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('message', sa.Text(), nullable=True),
+        sa.Column('template_id', sa.Integer(), nullable=True),
+        sa.Column('data', sa.JSON(), nullable=True),
+        sa.Column('total_recipients', sa.Integer(), nullable=True),
+        sa.Column('sent_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('last_user_id', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('lease_expires_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['template_id'], ['notification_templates.id'], ),
+        sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_notification_jobs_id'), 'notification_jobs', ['id'], unique=False)
+    op.create_index(
+        'ix_notification_jobs_unfinished_lease_expires_at', 'notification_jobs', ['lease_expires_at'],
+        postgresql_where=sa.text("status IN ('QUEUED', 'RUNNING')")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_notification_jobs_unfinished_lease_expires_at', table_name='notification_jobs')
+    op.drop_index(op.f('ix_notification_jobs_id'), table_name='notification_jobs')
+    op.drop_table('notification_jobs')
+    notification_job_status.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,116 @@
+"""Partition notifications by month of created_at
+
+Revision ID: c4f9a2d6e813
+Revises: b3e8f1a4c927
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f9a2d6e813'
+down_revision: Union[str, Sequence[str], None] = 'b3e8f1a4c927'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Partitions are created this many months past the current one; the
+# partition maintainer keeps the window moving afterwards
+PARTITIONS_AHEAD = 3
+
+INDEXES = """
+    CREATE INDEX ix_notifications_id ON notifications (id);
+    CREATE INDEX ix_notifications_user_id ON notifications (user_id);
+    CREATE INDEX ix_notifications_user_id_created_at_id ON notifications (user_id, created_at, id);
+    CREATE INDEX ix_notifications_user_id_unread ON notifications (user_id)
+        WHERE status IN ('PENDING', 'SENT', 'DELIVERED');
+    CREATE INDEX ix_notifications_pending_next_attempt_at ON notifications (next_attempt_at)
+        WHERE status = 'PENDING';
+"""
+
+TRIGGERS = """
+    CREATE TRIGGER notifications_notify_insert_delete
+    AFTER INSERT OR DELETE ON notifications
+    FOR EACH ROW EXECUTE FUNCTION notify_notification_change();
+    CREATE TRIGGER notifications_notify_status
+    AFTER UPDATE OF status ON notifications
+    FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)
+    EXECUTE FUNCTION notify_notification_change();
+    CREATE TRIGGER notifications_count_insert
+    AFTER INSERT ON notifications REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_notification_changes();
+    CREATE TRIGGER notifications_count_update
+    AFTER UPDATE ON notifications REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_notification_changes();
+    CREATE TRIGGER notifications_count_delete
+    AFTER DELETE ON notifications REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_notification_changes();
+"""
+
+
+def _swap_in(new_table: str, primary_key: str) -> None:
+    """Replace notifications with new_table, keeping the id sequence, keys,
+    indexes and triggers. Copying rows through the new table's triggers is
+    avoided by creating them only after the swap."""
+    op.execute(f"INSERT INTO {new_table} SELECT * FROM notifications")
+    op.execute("ALTER SEQUENCE notifications_id_seq OWNED BY NONE")
+    op.execute("DROP TABLE notifications")
+    op.execute(f"ALTER TABLE {new_table} RENAME TO notifications")
+    op.execute("ALTER SEQUENCE notifications_id_seq OWNED BY notifications.id")
+    op.execute(f"ALTER TABLE notifications ADD CONSTRAINT notifications_pkey PRIMARY KEY ({primary_key})")
+    op.execute("ALTER TABLE notifications ADD CONSTRAINT notifications_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id)")
+    op.execute("ALTER TABLE notifications ADD CONSTRAINT notifications_created_by_fkey FOREIGN KEY (created_by) REFERENCES users (id)")
+    op.execute(INDEXES)
+    op.execute(TRIGGERS)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Writers wait for the copy instead of losing rows to it
+    op.execute("LOCK TABLE notifications IN EXCLUSIVE MODE")
+    op.execute("UPDATE notifications SET created_at = now() WHERE created_at IS NULL")
+    op.execute("""
+        CREATE TABLE notifications_partitioned
+        (LIKE notifications INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+        PARTITION BY RANGE (created_at)
+    """)
+    op.execute("ALTER TABLE notifications_partitioned ALTER COLUMN created_at SET NOT NULL")
+    # One partition per month from the oldest notification on; bounds are UTC months
+    op.execute(f"""
+        DO $$
+        DECLARE
+            month timestamp;
+        BEGIN
+            FOR month IN
+                SELECT generate_series(
+                    date_trunc('month', coalesce(min(created_at), now()) AT TIME ZONE 'UTC'),
+                    date_trunc('month', now() AT TIME ZONE 'UTC') + interval '{PARTITIONS_AHEAD} months',
+                    interval '1 month'
+                ) FROM notifications
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF notifications_partitioned FOR VALUES FROM (%L) TO (%L)',
+                    'notifications_' || to_char(month, 'YYYY_MM'),
+                    (month AT TIME ZONE 'UTC'),
+                    ((month + interval '1 month') AT TIME ZONE 'UTC')
+                );
+            END LOOP;
+        END
+        $$
+    """)
+    _swap_in("notifications_partitioned", "id, created_at")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("LOCK TABLE notifications IN EXCLUSIVE MODE")
+    op.execute("""
+        CREATE TABLE notifications_unpartitioned
+        (LIKE notifications INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+    """)
+    op.execute("ALTER TABLE notifications_unpartitioned ALTER COLUMN created_at DROP NOT NULL")
+    # Dropping the partitioned table drops its partitions; archived partitions
+    # already detached by the maintainer are not restored
+    _swap_in("notifications_unpartitioned", "id")
@@ -0,0 +1,39 @@
+"""Add notification digests and per-user notification preferences
+
+Revision ID: d6a1c3e8f459
+Revises: c4f9a2d6e813
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd6a1c3e8f459'
+down_revision: Union[str, Sequence[str], None] = 'c4f9a2d6e813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('notifications', sa.Column('coalesce_until', sa.DateTime(timezone=True), nullable=True))
+    op.create_table(
+        'notification_preferences',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('digest_enabled', sa.Boolean(), server_default=sa.text('true'), nullable=False),
+        sa.Column('digest_window_seconds', sa.Integer(), nullable=True),
+        sa.Column('email_enabled', sa.Boolean(), server_default=sa.text('true'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('notification_preferences')
+    op.drop_column('notifications', 'coalesce_until')
@@ -0,0 +1,41 @@
+"""Add notifications.next_attempt_at for the delivery worker
+
+Revision ID: e27c4f8a1d35
+Revises: d93b7a2c4e18
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e27c4f8a1d35'
+down_revision: Union[str, Sequence[str], None] = 'd93b7a2c4e18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows keep a NULL next_attempt_at, which the delivery worker never
+    # treats as due: notifications created before the worker existed are not
+    # sent out as a backlog on deploy. Only new rows default to now().
+    op.add_column('notifications', sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=True))
+    op.alter_column('notifications', 'next_attempt_at', server_default=sa.text('now()'))
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_notifications_pending_next_attempt_at', 'notifications', ['next_attempt_at'],
+            postgresql_where=sa.text("status = 'PENDING'"),
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_notifications_pending_next_attempt_at', table_name='notifications', postgresql_concurrently=True, if_exists=True)
+    op.drop_column('notifications', 'next_attempt_at')
@@ -0,0 +1,51 @@
+"""Send NOTIFY notification_changes when a user's notifications change
+
+Revision ID: f5b1d8e3c6a2
+Revises: e27c4f8a1d35
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5b1d8e3c6a2'
+down_revision: Union[str, Sequence[str], None] = 'e27c4f8a1d35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_notification_change() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                PERFORM pg_notify('notification_changes', OLD.user_id::text);
+            ELSE
+                PERFORM pg_notify('notification_changes', NEW.user_id::text);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER notifications_notify_insert_delete
+        AFTER INSERT OR DELETE ON notifications
+        FOR EACH ROW EXECUTE FUNCTION notify_notification_change()
+    """)
+    op.execute("""
+        CREATE TRIGGER notifications_notify_status
+        AFTER UPDATE OF status ON notifications
+        FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)
+        EXECUTE FUNCTION notify_notification_change()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS notifications_notify_status ON notifications")
+    op.execute("DROP TRIGGER IF EXISTS notifications_notify_insert_delete ON notifications")
+    op.execute("DROP FUNCTION IF EXISTS notify_notification_change()")
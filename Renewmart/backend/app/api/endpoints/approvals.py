@@ -1,68 +1,71 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 
 from app.db.database import get_db
-from app.models.user import User
+from app.db.pagination import Keyset, paginate
+from app.db.repository import get_or_404, list_filtered, select_filtered
+from app.db.instrumentation import query_budget
+from app.db.timeouts import statement_timeout
 from app.models.land_parcel import Approval, ApprovalStatus
 from app.schemas.land_parcel import Approval as ApprovalSchema, ApprovalCreate, ApprovalUpdate
-from app.api.endpoints.auth import get_current_user
+from app.core.principal import Principal
+from app.api.endpoints.auth import get_current_principal
 
 router = APIRouter()
 
 @router.get("/", response_model=List[ApprovalSchema])
+@query_budget(2)
+@statement_timeout("list")
 async def get_approvals(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     status: Optional[ApprovalStatus] = None,
     approval_type: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get all approvals with optional filtering"""
-    query = db.query(Approval)
+    query = select_filtered(Approval, status=status, approval_type=approval_type)
     
-    if status:
-        query = query.filter(Approval.status == status)
-    if approval_type:
-        query = query.filter(Approval.approval_type == approval_type)
-    
-    approvals = query.offset(skip).limit(limit).all()
+    approvals = await paginate(db, query, Keyset(Approval.id), request, response, skip, limit, cursor)
     return approvals
 
 @router.get("/pending", response_model=List[ApprovalSchema])
+@statement_timeout("list")
 async def get_pending_approvals(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get all pending approvals"""
-    approvals = db.query(Approval).filter(Approval.status == ApprovalStatus.PENDING).all()
+    approvals = await list_filtered(db, Approval, status=ApprovalStatus.PENDING)
     return approvals
 
 @router.get("/{approval_id}", response_model=ApprovalSchema)
 async def get_approval(
     approval_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get approval by ID"""
-    approval = db.query(Approval).filter(Approval.id == approval_id).first()
-    if not approval:
-        raise HTTPException(status_code=404, detail="Approval not found")
+    approval = await get_or_404(db, Approval, approval_id, "Approval not found")
     return approval
 
 @router.post("/", response_model=ApprovalSchema)
 async def create_approval(
     approval: ApprovalCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Create a new approval request"""
     db_approval = Approval(**approval.dict())
     db.add(db_approval)
-    db.commit()
-    db.refresh(db_approval)
+    await db.commit()
+    await db.refresh(db_approval)
     return db_approval
 
 @router.post("/{approval_id}/decision")
@@ -70,13 +73,11 @@ async def make_approval_decision(
     approval_id: int,
     decision: str,  # "approve" or "reject"
     comments: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Make approval decision (approve/reject)"""
-    approval = db.query(Approval).filter(Approval.id == approval_id).first()
-    if not approval:
-        raise HTTPException(status_code=404, detail="Approval not found")
+    approval = await get_or_404(db, Approval, approval_id, "Approval not found")
     
     if approval.status != ApprovalStatus.PENDING:
         raise HTTPException(status_code=400, detail="Approval is not pending")
@@ -99,8 +100,8 @@ async def make_approval_decision(
     if comments:
         approval.comments = comments
     
-    db.commit()
-    db.refresh(approval)
+    await db.commit()
+    await db.refresh(approval)
     
     return {
         "message": f"Approval {decision}d successfully",
@@ -111,80 +112,66 @@ async def make_approval_decision(
 async def update_approval(
     approval_id: int,
     approval_update: ApprovalUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Update approval by ID"""
-    approval = db.query(Approval).filter(Approval.id == approval_id).first()
-    if not approval:
-        raise HTTPException(status_code=404, detail="Approval not found")
+    approval = await get_or_404(db, Approval, approval_id, "Approval not found")
     
     for field, value in approval_update.dict(exclude_unset=True).items():
         setattr(approval, field, value)
     
-    db.commit()
-    db.refresh(approval)
+    await db.commit()
+    await db.refresh(approval)
     return approval
 
 @router.delete("/{approval_id}")
 async def delete_approval(
     approval_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Delete approval by ID"""
-    approval = db.query(Approval).filter(Approval.id == approval_id).first()
-    if not approval:
-        raise HTTPException(status_code=404, detail="Approval not found")
+    approval = await get_or_404(db, Approval, approval_id, "Approval not found")
     
-    db.delete(approval)
-    db.commit()
+    await db.delete(approval)
+    await db.commit()
     
     return {"message": "Approval deleted successfully"}
 
 @router.get("/user/{user_id}", response_model=List[ApprovalSchema])
+@statement_timeout("list")
 async def get_user_approvals(
     user_id: int,
     status: Optional[ApprovalStatus] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get approvals created by a specific user"""
-    query = db.query(Approval).filter(Approval.created_by == user_id)
-    
-    if status:
-        query = query.filter(Approval.status == status)
-    
-    approvals = query.all()
+    approvals = await list_filtered(db, Approval, created_by=user_id, status=status)
     return approvals
 
 @router.get("/approver/{user_id}", response_model=List[ApprovalSchema])
+@statement_timeout("list")
 async def get_approver_approvals(
     user_id: int,
     status: Optional[ApprovalStatus] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get approvals approved by a specific user"""
-    query = db.query(Approval).filter(Approval.approved_by == user_id)
-    
-    if status:
-        query = query.filter(Approval.status == status)
-    
-    approvals = query.all()
+    approvals = await list_filtered(db, Approval, approved_by=user_id, status=status)
     return approvals
 
 @router.patch("/{approval_id}/cancel")
 async def cancel_approval(
     approval_id: int,
     reason: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Cancel a pending approval"""
-    approval = db.query(Approval).filter(Approval.id == approval_id).first()
-    if not approval:
-        raise HTTPException(status_code=404, detail="Approval not found")
+    approval = await get_or_404(db, Approval, approval_id, "Approval not found")
     
     if approval.status != ApprovalStatus.PENDING:
         raise HTTPException(status_code=400, detail="Only pending approvals can be cancelled")
@@ -194,6 +181,6 @@ async def cancel_approval(
     
     approval.status = ApprovalStatus.CANCELLED
     approval.comments = f"Cancelled: {reason}"
-    db.commit()
+    await db.commit()
     
     return {"message": "Approval cancelled successfully"}
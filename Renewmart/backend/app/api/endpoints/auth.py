@@ -1,39 +1,40 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 import jwt
 import os
 import secrets
 import string
-from passlib.context import CryptContext
 
 from app.db.database import get_db
+from app.db.routing import primary_reads
 from app.models.user import User, UserType
-from app.schemas.user import User as UserSchema, UserCreate, PasswordResetRequest, PasswordResetVerify
+from app.schemas.user import User as UserSchema, UserCreate, PasswordResetRequest, PasswordResetVerify, RefreshTokenRequest
 from app.core.config import settings
-from app.services.email_service import send_password_reset_otp
+from app.core.principal import Principal, token_claims
+from app.core.principal_cache import principal_cache, token_versions
+from app.core.security import hash_password, verify_and_update
+from app.core.rate_limit import login_rate_limit, password_reset_rate_limit
+from app.core.revocation import revocation_list
+from app.core.sessions import end_session, rotate_session, start_session
+from app.services.email_service import queue_password_reset_otp
 
 router = APIRouter()
 
 # Security configuration
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
+# For endpoints that also accept the token some other way
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login", auto_error=False)
 
 # JWT settings
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-super-secret-jwt-key-for-renewmart-2024")  # Fallback if env var not set
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password: str) -> str:
-    """Hash a password"""
-    return pwd_context.hash(password)
-
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -42,55 +43,101 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
+    # Identifies this token on the revocation list
+    to_encode.setdefault("jti", secrets.token_urlsafe(16))
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def authenticate_user(db: Session, email: str, password: str):
+async def authenticate_user(db: AsyncSession, email: str, password: str):
     """Authenticate a user with email and password"""
-    user = db.query(User).filter(User.email == email).first()
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalar_one_or_none()
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    verified, new_hash = await verify_and_update(password, user.hashed_password)
+    if not verified:
         return False
+    if new_hash:
+        # Same password under the current work factor. Written with a plain
+        # UPDATE so the ORM hooks do not treat it as a password change and
+        # revoke the user's tokens.
+        await db.execute(update(User).where(User.id == user.id).values(hashed_password=new_hash))
+        set_committed_value(user, "hashed_password", new_hash)
+        await db.commit()
     return user
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Get current authenticated user from JWT token"""
-    credentials_exception = HTTPException(
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
-    # print(f"DEBUG: Token received: {token}")
-    # print(f"DEBUG: SECRET_KEY: {SECRET_KEY}")
-    
+
+def decode_token(token: str) -> dict:
+    """Decode and verify a JWT access token"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        # print(f"DEBUG: Payload decoded: {payload}")
-        email: str = payload.get("sub")
-        if email is None:
-            # print("DEBUG: Email is None in payload")
-            raise credentials_exception
-    except jwt.PyJWTError as e:
-        # print(f"DEBUG: JWT Error: {e}")
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.email == email).first()
+    except jwt.PyJWTError:
+        raise credentials_exception()
+    if payload.get("sub") is None:
+        raise credentials_exception()
+    return payload
+
+async def verify_token(token: str, db: AsyncSession) -> dict:
+    """Decode a JWT access token and reject it if it has been revoked"""
+    payload = decode_token(token)
+    if "jti" in payload and await revocation_list.is_revoked(db, payload["jti"]):
+        raise credentials_exception()
+    return payload
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    """Get current authenticated user from JWT token"""
+    payload = await verify_token(token, db)
+    
+    cached_user = principal_cache.get(token)
+    if cached_user is not None:
+        # Attach the cached snapshot to this session without querying
+        return await db.merge(cached_user, load=False)
+    
+    # On the primary, so a bumped token_version is seen right away
+    with primary_reads(db):
+        result = await db.execute(select(User).where(User.email == payload["sub"]))
+    user = result.scalar_one_or_none()
     if user is None:
-        # print(f"DEBUG: User not found for email: {email}")
-        raise credentials_exception
-    # print(f"DEBUG: User found: {user.email}")
+        raise credentials_exception()
+    # Tokens issued before token_version was bumped are revoked
+    if "ver" in payload and payload["ver"] != (user.token_version or 0):
+        raise credentials_exception()
+    principal_cache.put(token, user, token_expires_at=payload.get("exp"))
     return user
 
-@router.post("/login")
+async def get_current_principal(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> Principal:
+    """Get the caller from the claims of their JWT token, without loading the user.
+
+    Use instead of get_current_user when an endpoint only needs the caller's
+    id, email, user_type or is_active.
+    """
+    payload = await verify_token(token, db)
+    if "uid" not in payload:
+        # Token issued before claims were added; it expires within ACCESS_TOKEN_EXPIRE_MINUTES
+        return Principal.from_user(await get_current_user(token, db))
+    
+    try:
+        principal = Principal.from_claims(payload)
+    except (KeyError, ValueError):
+        raise credentials_exception()
+    if not await token_versions.is_current(db, principal.id, principal.token_version):
+        raise credentials_exception()
+    return principal
+
+@router.post("/login", dependencies=[Depends(login_rate_limit)])
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Authenticate user and return access token"""
 
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -100,23 +147,45 @@ async def login(
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, 
+        data=token_claims(user), 
         expires_delta=access_token_expires
     )
+    refresh_token = await start_session(db, user)
     
     return {
         "access_token": access_token,
+        "refresh_token": refresh_token,
         "token_type": "bearer",
         "user": UserSchema.model_validate(user)
     }
 
+@router.post("/token/refresh")
+async def refresh_session(request: RefreshTokenRequest, db: AsyncSession = Depends(get_db)):
+    """Exchange a refresh token for a new access token and refresh token"""
+    user, refresh_token = await rotate_session(db, request.refresh_token)
+    access_token = create_access_token(
+        data=token_claims(user),
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer"
+    }
+
+@router.post("/token/revoke")
+async def revoke_session(request: RefreshTokenRequest, db: AsyncSession = Depends(get_db)):
+    """End the session of a refresh token"""
+    await end_session(db, request.refresh_token)
+    return {"message": "Session ended"}
+
 @router.post("/refresh")
 async def refresh_token(current_user: User = Depends(get_current_user)):
-    """Refresh access token"""
+    """Refresh access token (needs a still valid one; prefer /token/refresh)"""
     #   print(current_user)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": current_user.email}, expires_delta=access_token_expires
+        data=token_claims(current_user), expires_delta=access_token_expires
     )
     return {
         "access_token": access_token,
@@ -124,15 +193,31 @@ async def refresh_token(current_user: User = Depends(get_current_user)):
     }
 
 @router.post("/logout")
-async def logout(current_user: User = Depends(get_current_user)):
-    """Logout user (token invalidation would be handled client-side)"""
+async def logout(
+    token: str = Depends(oauth2_scheme),
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Logout user by revoking the access token"""
+    payload = decode_token(token)
+    if "jti" in payload:
+        expires_at = datetime.fromtimestamp(payload["exp"], timezone.utc)
+        await revocation_list.revoke(db, payload["jti"], current_user.id, expires_at)
     return {"message": "Successfully logged out"}
 
+@router.post("/logout-all")
+async def logout_all(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """Revoke every token issued to the current user"""
+    current_user.token_version = (current_user.token_version or 0) + 1
+    await db.commit()
+    return {"message": "All sessions have been logged out"}
+
 @router.post("/register", response_model=UserSchema)
-async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """Register a new user"""
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    result = await db.execute(select(User).where(User.email == user_data.email))
+    existing_user = result.scalar_one_or_none()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -140,7 +225,7 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Hash the password
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await hash_password(user_data.password)
     
     # Create new user
     db_user = User(
@@ -154,8 +239,8 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
@@ -163,15 +248,16 @@ def generate_otp(length: int = 6) -> str:
     """Generate a random OTP"""
     return ''.join(secrets.choice(string.digits) for _ in range(length))
 
-@router.post("/password-reset-request")
+@router.post("/password-reset-request", dependencies=[Depends(password_reset_rate_limit)])
 async def request_password_reset(
     request: PasswordResetRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Request password reset by sending OTP to email"""
     
     # Check if user exists
-    user = db.query(User).filter(User.email == request.email).first()
+    result = await db.execute(select(User).where(User.email == request.email))
+    user = result.scalar_one_or_none()
     if not user:
         # Don't reveal if user exists or not for security
         return {"message": "If the email exists, an OTP has been sent"}
@@ -183,26 +269,22 @@ async def request_password_reset(
     user.reset_otp = otp
     user.reset_otp_expires = datetime.utcnow() + timedelta(minutes=10)
     
-    db.commit()
+    # Queue the OTP email in the same transaction; the outbox sender delivers it
+    queue_password_reset_otp(db, user.email, otp, user.name)
+    await db.commit()
     
-    # Send OTP via email
-    try:
-        await send_password_reset_otp(user.email, otp, user.name)
-        return {"message": "If the email exists, an OTP has been sent"}
-    except Exception as e:
-        # Log the error but don't reveal it to the user
-        print(f"Error sending email: {e}")
-        return {"message": "If the email exists, an OTP has been sent"}
+    return {"message": "If the email exists, an OTP has been sent"}
 
 @router.post("/password-reset-verify")
 async def verify_password_reset(
     request: PasswordResetVerify,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Verify OTP and reset password"""
     
     # Find user
-    user = db.query(User).filter(User.email == request.email).first()
+    result = await db.execute(select(User).where(User.email == request.email))
+    user = result.scalar_one_or_none()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -220,7 +302,7 @@ async def verify_password_reset(
         # Clear expired OTP
         user.reset_otp = None
         user.reset_otp_expires = None
-        db.commit()
+        await db.commit()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="OTP has expired. Please request a new password reset."
@@ -234,10 +316,10 @@ async def verify_password_reset(
         )
     
     # Reset password
-    user.hashed_password = get_password_hash(request.new_password)
+    user.hashed_password = await hash_password(request.new_password)
     user.reset_otp = None
     user.reset_otp_expires = None
     
-    db.commit()
+    await db.commit()
     
     return {"message": "Password has been reset successfully"}
@@ -1,10 +1,18 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Response
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
+from datetime import datetime
 
-from app.db.database import get_db
+from app.db.database import get_db, async_engine, replica_set
+from app.db.pagination import Keyset, paginate
+from app.db.timeouts import statement_timeout
+from app.db.repository import get_or_404, select_filtered
+from app.db.search import fuzzy_match, ranked_page
+from app.db.pool import pool_status
 from app.models.user import User
-from app.models.project import TemplateProject, TemplateMilestone, TemplateTask, ApprovalRule
+from app.models.project import TemplateProject, TemplateMilestone, TemplateTask, ApprovalRule, DevelopmentProject
+from app.models.land_parcel import Task, Approval
 from app.models.notification import NotificationTemplate
 from app.schemas.project import (
     TemplateProject as TemplateProjectSchema,
@@ -25,36 +33,45 @@ from app.schemas.notification import (
     NotificationTemplateCreate,
     NotificationTemplateUpdate
 )
-from app.api.endpoints.auth import get_current_user
+from app.core.principal import Principal
+from app.core.rate_limit import rate_limit_status
+from app.services.templates import TemplateError, template_renderer
+from app.api.endpoints.auth import get_current_principal
 
 router = APIRouter()
 
 # Template Project Management
 @router.get("/project-types", response_model=List[TemplateProjectSchema])
+@statement_timeout("list")
 async def get_project_types(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     project_type: Optional[str] = None,
     region: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    search: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get all project type templates"""
-    query = db.query(TemplateProject)
+    query = select_filtered(TemplateProject, project_type=project_type)
     
-    if project_type:
-        query = query.filter(TemplateProject.project_type == project_type)
     if region:
-        query = query.filter(TemplateProject.region.ilike(f"%{region}%"))
+        query = query.where(fuzzy_match(TemplateProject.region, region))
+    if search:
+        # Best matches first, so a typo still finds its template on the first page
+        return await ranked_page(db, query, TemplateProject.name, search, skip, limit, cursor)
     
-    templates = query.offset(skip).limit(limit).all()
+    templates = await paginate(db, query, Keyset(TemplateProject.id), request, response, skip, limit, cursor)
     return templates
 
 @router.post("/project-types", response_model=TemplateProjectSchema)
 async def create_project_type(
     template: TemplateProjectCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Create a new project type template"""
     # Only admins can create project templates
@@ -66,59 +83,56 @@ async def create_project_type(
     
     db_template = TemplateProject(**template_data)
     db.add(db_template)
-    db.commit()
-    db.refresh(db_template)
+    await db.commit()
+    await db.refresh(db_template)
     return db_template
 
 @router.put("/project-types/{template_id}", response_model=TemplateProjectSchema)
 async def update_project_type(
     template_id: int,
     template_update: TemplateProjectUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Update project type template"""
     # Only admins can update project templates
     if current_user.user_type.value != "admin":
         raise HTTPException(status_code=403, detail="Not authorized to update project templates")
     
-    template = db.query(TemplateProject).filter(TemplateProject.id == template_id).first()
-    if not template:
-        raise HTTPException(status_code=404, detail="Project template not found")
+    template = await get_or_404(db, TemplateProject, template_id, "Project template not found")
     
     for field, value in template_update.dict(exclude_unset=True).items():
         setattr(template, field, value)
     
-    db.commit()
-    db.refresh(template)
+    await db.commit()
+    await db.refresh(template)
     return template
 
 # Template Task Management
 @router.get("/templates", response_model=List[TemplateTaskSchema])
+@statement_timeout("list")
 async def get_task_templates(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     task_type: Optional[str] = None,
     template_project_id: Optional[int] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get all task templates"""
-    query = db.query(TemplateTask)
+    query = select_filtered(TemplateTask, task_type=task_type, template_project_id=template_project_id)
     
-    if task_type:
-        query = query.filter(TemplateTask.task_type == task_type)
-    if template_project_id:
-        query = query.filter(TemplateTask.template_project_id == template_project_id)
-    
-    templates = query.offset(skip).limit(limit).all()
+    templates = await paginate(db, query, Keyset(TemplateTask.id), request, response, skip, limit, cursor)
     return templates
 
 @router.post("/templates", response_model=TemplateTaskSchema)
 async def create_task_template(
     template: TemplateTaskCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Create a new task template"""
     # Only admins can create task templates
@@ -130,62 +144,64 @@ async def create_task_template(
     
     db_template = TemplateTask(**template_data)
     db.add(db_template)
-    db.commit()
-    db.refresh(db_template)
+    await db.commit()
+    await db.refresh(db_template)
     return db_template
 
 @router.put("/templates/{template_id}", response_model=TemplateTaskSchema)
 async def update_task_template(
     template_id: int,
     template_update: TemplateTaskUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Update task template"""
     # Only admins can update task templates
     if current_user.user_type.value != "admin":
         raise HTTPException(status_code=403, detail="Not authorized to update task templates")
     
-    template = db.query(TemplateTask).filter(TemplateTask.id == template_id).first()
-    if not template:
-        raise HTTPException(status_code=404, detail="Task template not found")
+    template = await get_or_404(db, TemplateTask, template_id, "Task template not found")
     
     for field, value in template_update.dict(exclude_unset=True).items():
         setattr(template, field, value)
     
-    db.commit()
-    db.refresh(template)
+    await db.commit()
+    await db.refresh(template)
     return template
 
 # Approval Rules Management
 @router.get("/approval-rules", response_model=List[ApprovalRuleSchema])
+@statement_timeout("list")
 async def get_approval_rules(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     project_type: Optional[str] = None,
     region: Optional[str] = None,
+    search: Optional[str] = None,
     is_active: Optional[bool] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get all approval rules"""
-    query = db.query(ApprovalRule)
+    query = select_filtered(ApprovalRule, project_type=project_type, is_active=is_active)
     
-    if project_type:
-        query = query.filter(ApprovalRule.project_type == project_type)
     if region:
-        query = query.filter(ApprovalRule.region.ilike(f"%{region}%"))
-    if is_active is not None:
-        query = query.filter(ApprovalRule.is_active == is_active)
+        query = query.where(fuzzy_match(ApprovalRule.region, region))
+    if search:
+        # Best matches first, so a typo still finds its rule on the first page
+        return await ranked_page(db, query, ApprovalRule.name, search, skip, limit, cursor)
     
-    rules = query.offset(skip).limit(limit).all()
+    rules = await paginate(db, query, Keyset(ApprovalRule.id), request, response, skip, limit, cursor)
     return rules
 
 @router.post("/approval-rules", response_model=ApprovalRuleSchema)
 async def create_approval_rule(
     rule: ApprovalRuleCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Create a new approval rule"""
     # Only admins can create approval rules
@@ -197,145 +213,145 @@ async def create_approval_rule(
     
     db_rule = ApprovalRule(**rule_data)
     db.add(db_rule)
-    db.commit()
-    db.refresh(db_rule)
+    await db.commit()
+    await db.refresh(db_rule)
     return db_rule
 
 @router.put("/approval-rules/{rule_id}", response_model=ApprovalRuleSchema)
 async def update_approval_rule(
     rule_id: int,
     rule_update: ApprovalRuleUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Update approval rule"""
     # Only admins can update approval rules
     if current_user.user_type.value != "admin":
         raise HTTPException(status_code=403, detail="Not authorized to update approval rules")
     
-    rule = db.query(ApprovalRule).filter(ApprovalRule.id == rule_id).first()
-    if not rule:
-        raise HTTPException(status_code=404, detail="Approval rule not found")
+    rule = await get_or_404(db, ApprovalRule, rule_id, "Approval rule not found")
     
     for field, value in rule_update.dict(exclude_unset=True).items():
         setattr(rule, field, value)
     
-    db.commit()
-    db.refresh(rule)
+    await db.commit()
+    await db.refresh(rule)
     return rule
 
 @router.delete("/approval-rules/{rule_id}")
 async def delete_approval_rule(
     rule_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Delete approval rule"""
     # Only admins can delete approval rules
     if current_user.user_type.value != "admin":
         raise HTTPException(status_code=403, detail="Not authorized to delete approval rules")
     
-    rule = db.query(ApprovalRule).filter(ApprovalRule.id == rule_id).first()
-    if not rule:
-        raise HTTPException(status_code=404, detail="Approval rule not found")
+    rule = await get_or_404(db, ApprovalRule, rule_id, "Approval rule not found")
     
-    db.delete(rule)
-    db.commit()
+    await db.delete(rule)
+    await db.commit()
     
     return {"message": "Approval rule deleted successfully"}
 
 # Notification Template Management
 @router.get("/notification-templates", response_model=List[NotificationTemplateSchema])
+@statement_timeout("list")
 async def get_notification_templates(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     notification_type: Optional[str] = None,
     channel: Optional[str] = None,
     is_active: Optional[bool] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get all notification templates"""
-    query = db.query(NotificationTemplate)
-    
-    if notification_type:
-        query = query.filter(NotificationTemplate.notification_type == notification_type)
-    if channel:
-        query = query.filter(NotificationTemplate.channel == channel)
-    if is_active is not None:
-        query = query.filter(NotificationTemplate.is_active == is_active)
+    query = select_filtered(NotificationTemplate, notification_type=notification_type, channel=channel, is_active=is_active)
     
-    templates = query.offset(skip).limit(limit).all()
+    templates = await paginate(db, query, Keyset(NotificationTemplate.id), request, response, skip, limit, cursor)
     return templates
 
 @router.post("/notification-templates", response_model=NotificationTemplateSchema)
 async def create_notification_template(
     template: NotificationTemplateCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Create a new notification template"""
     # Only admins can create notification templates
     if current_user.user_type.value != "admin":
         raise HTTPException(status_code=403, detail="Not authorized to create notification templates")
     
+    try:
+        template_renderer.validate(template.subject_template, template.message_template, template.variables)
+    except TemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     template_data = template.dict()
     template_data["created_by"] = current_user.id
     
     db_template = NotificationTemplate(**template_data)
     db.add(db_template)
-    db.commit()
-    db.refresh(db_template)
+    await db.commit()
+    await db.refresh(db_template)
     return db_template
 
 @router.put("/notification-templates/{template_id}", response_model=NotificationTemplateSchema)
 async def update_notification_template(
     template_id: int,
     template_update: NotificationTemplateUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Update notification template"""
     # Only admins can update notification templates
     if current_user.user_type.value != "admin":
         raise HTTPException(status_code=403, detail="Not authorized to update notification templates")
     
-    template = db.query(NotificationTemplate).filter(NotificationTemplate.id == template_id).first()
-    if not template:
-        raise HTTPException(status_code=404, detail="Notification template not found")
+    template = await get_or_404(db, NotificationTemplate, template_id, "Notification template not found")
     
     for field, value in template_update.dict(exclude_unset=True).items():
         setattr(template, field, value)
     
-    db.commit()
-    db.refresh(template)
+    try:
+        template_renderer.validate(template.subject_template, template.message_template, template.variables or [])
+    except TemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    await db.commit()
+    await db.refresh(template)
     return template
 
 @router.delete("/notification-templates/{template_id}")
 async def delete_notification_template(
     template_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Delete notification template"""
     # Only admins can delete notification templates
     if current_user.user_type.value != "admin":
         raise HTTPException(status_code=403, detail="Not authorized to delete notification templates")
     
-    template = db.query(NotificationTemplate).filter(NotificationTemplate.id == template_id).first()
-    if not template:
-        raise HTTPException(status_code=404, detail="Notification template not found")
+    template = await get_or_404(db, NotificationTemplate, template_id, "Notification template not found")
     
-    db.delete(template)
-    db.commit()
+    await db.delete(template)
+    await db.commit()
     
     return {"message": "Notification template deleted successfully"}
 
 # System Configuration
 @router.get("/system/health")
+@statement_timeout("report")
 async def get_system_health(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get system health status"""
     # Only admins can view system health
@@ -343,10 +359,10 @@ async def get_system_health(
         raise HTTPException(status_code=403, detail="Not authorized to view system health")
     
     # Get basic system statistics
-    total_users = db.query(User).count()
-    total_projects = db.query(DevelopmentProject).count()
-    total_tasks = db.query(Task).count()
-    total_approvals = db.query(Approval).count()
+    total_users = await db.scalar(select(func.count()).select_from(User))
+    total_projects = await db.scalar(select(func.count()).select_from(DevelopmentProject))
+    total_tasks = await db.scalar(select(func.count()).select_from(Task))
+    total_approvals = await db.scalar(select(func.count()).select_from(Approval))
     
     return {
         "status": "healthy",
@@ -358,3 +374,35 @@ async def get_system_health(
             "total_approvals": total_approvals
         }
     }
+
+@router.get("/system/db-pool")
+async def get_db_pool_status(
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Get database connection pool status and checkout wait times"""
+    # Only admins can view pool metrics
+    if current_user.user_type.value != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized to view pool metrics")
+    
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "primary": pool_status(async_engine),
+        "replicas": [
+            {**status, "pool": pool_status(replica.engine)}
+            for replica, status in zip(replica_set.replicas, replica_set.status())
+        ]
+    }
+
+@router.get("/system/rate-limits")
+async def get_rate_limit_status(
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Get sign-in throttling backend and rejected attempt counts"""
+    # Only admins can view throttling metrics
+    if current_user.user_type.value != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized to view rate limit metrics")
+    
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        **rate_limit_status()
+    }
@@ -1,15 +1,22 @@
-from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Form, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import hashlib
 import os
 from datetime import datetime
 
 from app.db.database import get_db
-from app.models.user import User
-from app.models.land_parcel import Document
+from app.db.pagination import Keyset, paginate
+from app.db.repository import get_or_404, select_filtered
+from app.db.instrumentation import query_budget
+from app.db.timeouts import statement_timeout
+from app.models.land_parcel import Document, LandParcel, Task
+from app.models.notification import NotificationType
+from app.models.project import DevelopmentProject
 from app.schemas.land_parcel import Document as DocumentSchema, DocumentCreate
-from app.api.endpoints.auth import get_current_user
+from app.core.principal import Principal
+from app.api.endpoints.auth import get_current_principal
+from app.services.notification_digest import queue_notification
 
 router = APIRouter()
 
@@ -30,45 +37,78 @@ def get_file_extension(filename: str) -> str:
     """Get file extension from filename"""
     return os.path.splitext(filename)[1].lower()
 
+async def notify_document_uploaded(db: AsyncSession, document: Document, uploaded_by: int):
+    """Notify the owners of what a document was uploaded to: the project
+    manager, the landowner and the task assignee. Uploads to one entity are
+    coalesced into one digest."""
+    related = [
+        ("project", document.project_id, DevelopmentProject, "project_manager_id"),
+        ("land_parcel", document.land_parcel_id, LandParcel, "landowner_id"),
+        ("task", document.task_id, Task, "assigned_to"),
+    ]
+    related = [entry for entry in related if entry[1] is not None]
+    if not related:
+        return
+    
+    recipients = set()
+    for _, entity_id, model, owner_field in related:
+        entity = await db.get(model, entity_id)
+        if entity is not None and getattr(entity, owner_field) is not None:
+            recipients.add(getattr(entity, owner_field))
+    recipients.discard(uploaded_by)
+    
+    related_entity_type, related_entity_id = related[0][:2]
+    for user_id in sorted(recipients):
+        await queue_notification(
+            db,
+            user_id=user_id,
+            notification_type=NotificationType.DOCUMENT_UPLOADED,
+            title="New document uploaded",
+            message=f"{document.name} ({document.document_type}) was uploaded",
+            created_by=uploaded_by,
+            related_entity_type=related_entity_type,
+            related_entity_id=related_entity_id,
+            data={"document_id": document.id}
+        )
+
 @router.get("/", response_model=List[DocumentSchema])
+@query_budget(2)
+@statement_timeout("list")
 async def get_documents(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     document_type: Optional[str] = None,
     land_parcel_id: Optional[int] = None,
     task_id: Optional[int] = None,
     project_id: Optional[int] = None,
     proposal_id: Optional[int] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get all documents with optional filtering"""
-    query = db.query(Document)
+    query = select_filtered(
+        Document,
+        document_type=document_type,
+        land_parcel_id=land_parcel_id,
+        task_id=task_id,
+        project_id=project_id,
+        proposal_id=proposal_id
+    )
     
-    if document_type:
-        query = query.filter(Document.document_type == document_type)
-    if land_parcel_id:
-        query = query.filter(Document.land_parcel_id == land_parcel_id)
-    if task_id:
-        query = query.filter(Document.task_id == task_id)
-    if project_id:
-        query = query.filter(Document.project_id == project_id)
-    if proposal_id:
-        query = query.filter(Document.proposal_id == proposal_id)
-    
-    documents = query.offset(skip).limit(limit).all()
+    documents = await paginate(db, query, Keyset(Document.id), request, response, skip, limit, cursor)
     return documents
 
 @router.get("/{document_id}", response_model=DocumentSchema)
 async def get_document(
     document_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get document by ID"""
-    document = db.query(Document).filter(Document.id == document_id).first()
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
+    document = await get_or_404(db, Document, document_id, "Document not found")
     return document
 
 @router.post("/upload")
@@ -79,8 +119,8 @@ async def upload_document(
     task_id: Optional[int] = Form(None),
     project_id: Optional[int] = Form(None),
     proposal_id: Optional[int] = Form(None),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Upload a new document"""
     
@@ -130,8 +170,10 @@ async def upload_document(
     
     db_document = Document(**document_data.dict())
     db.add(db_document)
-    db.commit()
-    db.refresh(db_document)
+    await db.flush()
+    await notify_document_uploaded(db, db_document, current_user.id)
+    await db.commit()
+    await db.refresh(db_document)
     
     return {
         "message": "Document uploaded successfully",
@@ -141,13 +183,11 @@ async def upload_document(
 @router.get("/{document_id}/download")
 async def download_document(
     document_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Download document by ID"""
-    document = db.query(Document).filter(Document.id == document_id).first()
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
+    document = await get_or_404(db, Document, document_id, "Document not found")
     
     if not os.path.exists(document.file_path):
         raise HTTPException(status_code=404, detail="File not found on disk")
@@ -163,33 +203,29 @@ async def update_document(
     document_id: int,
     name: Optional[str] = None,
     document_type: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Update document metadata"""
-    document = db.query(Document).filter(Document.id == document_id).first()
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
+    document = await get_or_404(db, Document, document_id, "Document not found")
     
     if name:
         document.name = name
     if document_type:
         document.document_type = document_type
     
-    db.commit()
-    db.refresh(document)
+    await db.commit()
+    await db.refresh(document)
     return document
 
 @router.delete("/{document_id}")
 async def delete_document(
     document_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Delete document by ID"""
-    document = db.query(Document).filter(Document.id == document_id).first()
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
+    document = await get_or_404(db, Document, document_id, "Document not found")
     
     # Delete file from disk
     if os.path.exists(document.file_path):
@@ -199,21 +235,19 @@ async def delete_document(
             print(f"Warning: Could not delete file {document.file_path}: {e}")
     
     # Delete database record
-    db.delete(document)
-    db.commit()
+    await db.delete(document)
+    await db.commit()
     
     return {"message": "Document deleted successfully"}
 
 @router.get("/verify/{document_id}")
 async def verify_document_integrity(
     document_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Verify document integrity using checksum"""
-    document = db.query(Document).filter(Document.id == document_id).first()
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
+    document = await get_or_404(db, Document, document_id, "Document not found")
     
     if not os.path.exists(document.file_path):
         return {
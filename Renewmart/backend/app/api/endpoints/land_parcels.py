@@ -1,52 +1,55 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
 from app.db.database import get_db
+from app.db.pagination import Keyset, paginate
+from app.db.repository import get_by_id, get_or_404, select_filtered
+from app.db.instrumentation import query_budget
+from app.db.timeouts import statement_timeout
 from app.models.user import User
 from app.models.land_parcel import LandParcel, ParcelStatus
 from app.schemas.land_parcel import LandParcel as LandParcelSchema, LandParcelCreate, LandParcelUpdate
-from app.api.endpoints.auth import get_current_user
+from app.core.principal import Principal
+from app.api.endpoints.auth import get_current_principal
 
 router = APIRouter()
 
 @router.get("/", response_model=List[LandParcelSchema])
+@query_budget(2)
+@statement_timeout("list")
 async def get_land_parcels(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     status: Optional[ParcelStatus] = None,
     landowner_id: Optional[int] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get all land parcels"""
-    query = db.query(LandParcel)
+    query = select_filtered(LandParcel, status=status, landowner_id=landowner_id)
     
-    if status:
-        query = query.filter(LandParcel.status == status)
-    if landowner_id:
-        query = query.filter(LandParcel.landowner_id == landowner_id)
-    
-    parcels = query.offset(skip).limit(limit).all()
+    parcels = await paginate(db, query, Keyset(LandParcel.id), request, response, skip, limit, cursor)
     return parcels
 
 @router.get("/{parcel_id}", response_model=LandParcelSchema)
 async def get_land_parcel(
     parcel_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get land parcel by ID"""
-    parcel = db.query(LandParcel).filter(LandParcel.id == parcel_id).first()
-    if not parcel:
-        raise HTTPException(status_code=404, detail="Land parcel not found")
+    parcel = await get_or_404(db, LandParcel, parcel_id, "Land parcel not found")
     return parcel
 
 @router.post("/", response_model=LandParcelSchema)
 async def create_land_parcel(
     parcel: LandParcelCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Create a new land parcel"""
     # Only landowners and admins can create parcels
@@ -57,32 +60,31 @@ async def create_land_parcel(
     if not parcel.landowner_id:
         raise HTTPException(status_code=400, detail="landowner_id is required")
     
-    # Verify the landowner exists
-    landowner = db.query(User).filter(User.id == parcel.landowner_id).first()
-    if not landowner:
-        raise HTTPException(status_code=400, detail="Invalid landowner_id: user not found")
-    
     # If current user is a landowner, they can only create parcels for themselves
     if current_user.user_type.value == "landowner" and parcel.landowner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Landowners can only create parcels for themselves")
     
+    # Verify the landowner exists; the caller is a claims-only Principal, so
+    # the User row is loaded here (once per request, via the entity cache)
+    landowner = await get_by_id(db, User, parcel.landowner_id)
+    if not landowner:
+        raise HTTPException(status_code=400, detail="Invalid landowner_id: user not found")
+    
     db_parcel = LandParcel(**parcel.dict())
     db.add(db_parcel)
-    db.commit()
-    db.refresh(db_parcel)
+    await db.commit()
+    await db.refresh(db_parcel)
     return db_parcel
 
 @router.put("/{parcel_id}", response_model=LandParcelSchema)
 async def update_land_parcel(
     parcel_id: int,
     parcel_update: LandParcelUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Update land parcel by ID"""
-    parcel = db.query(LandParcel).filter(LandParcel.id == parcel_id).first()
-    if not parcel:
-        raise HTTPException(status_code=404, detail="Land parcel not found")
+    parcel = await get_or_404(db, LandParcel, parcel_id, "Land parcel not found")
     
     # Check authorization
     if (parcel.landowner_id != current_user.id and 
@@ -92,28 +94,26 @@ async def update_land_parcel(
     for field, value in parcel_update.dict(exclude_unset=True).items():
         setattr(parcel, field, value)
     
-    db.commit()
-    db.refresh(parcel)
+    await db.commit()
+    await db.refresh(parcel)
     return parcel
 
 @router.delete("/{parcel_id}")
 async def delete_land_parcel(
     parcel_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Delete land parcel by ID"""
-    parcel = db.query(LandParcel).filter(LandParcel.id == parcel_id).first()
-    if not parcel:
-        raise HTTPException(status_code=404, detail="Land parcel not found")
+    parcel = await get_or_404(db, LandParcel, parcel_id, "Land parcel not found")
     
     # Check authorization
     if (parcel.landowner_id != current_user.id and 
         current_user.user_type.value not in ["admin"]):
         raise HTTPException(status_code=403, detail="Not authorized to delete this parcel")
     
-    db.delete(parcel)
-    db.commit()
+    await db.delete(parcel)
+    await db.commit()
     
     return {"message": "Land parcel deleted successfully"}
 
@@ -122,17 +122,15 @@ async def assign_feasibility_study(
     parcel_id: int,
     analyst_id: int,
     due_date: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Assign feasibility study to a parcel"""
     # Only advisors and admins can assign feasibility studies
     if current_user.user_type.value not in ["advisor", "admin"]:
         raise HTTPException(status_code=403, detail="Not authorized to assign feasibility studies")
     
-    parcel = db.query(LandParcel).filter(LandParcel.id == parcel_id).first()
-    if not parcel:
-        raise HTTPException(status_code=404, detail="Land parcel not found")
+    parcel = await get_or_404(db, LandParcel, parcel_id, "Land parcel not found")
     
     # Update parcel status
     parcel.status = ParcelStatus.FEASIBILITY_ASSIGNED
@@ -153,7 +151,7 @@ async def assign_feasibility_study(
     )
     
     db.add(task)
-    db.commit()
+    await db.commit()
     
     return {"message": "Feasibility study assigned successfully"}
 
@@ -162,13 +160,11 @@ async def update_parcel_status(
     parcel_id: int,
     new_status: ParcelStatus,
     comments: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Update parcel status with state transition validation"""
-    parcel = db.query(LandParcel).filter(LandParcel.id == parcel_id).first()
-    if not parcel:
-        raise HTTPException(status_code=404, detail="Land parcel not found")
+    parcel = await get_or_404(db, LandParcel, parcel_id, "Land parcel not found")
     
     # Check authorization
     if (parcel.landowner_id != current_user.id and 
@@ -197,8 +193,8 @@ async def update_parcel_status(
     if comments:
         parcel.description += f"\n\nStatus Update: {comments}"
     
-    db.commit()
-    db.refresh(parcel)
+    await db.commit()
+    await db.refresh(parcel)
     
     return {
         "message": f"Parcel status updated to {new_status}",
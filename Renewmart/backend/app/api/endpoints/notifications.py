@@ -1,75 +1,150 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, Header, status, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple
+from datetime import datetime, timezone
 
-from app.db.database import get_db
+from app.db.database import AsyncSessionLocal, get_db
+from app.db.instrumentation import query_budget
+from app.db.timeouts import statement_timeout
+from app.db.pagination import Keyset, paginate
+from app.db.repository import get_or_404, select_filtered
 from app.models.user import User
-from app.models.notification import Notification, NotificationStatus, NotificationType, NotificationChannel
+from app.models.notification import (
+    Notification, NotificationCounter, NotificationJob, NotificationPreference, NotificationStatus, NotificationType,
+    NotificationChannel, NotificationTemplate, UNREAD_STATUSES
+)
 from app.schemas.notification import (
     Notification as NotificationSchema,
+    NotificationAudience,
     NotificationCreate,
+    NotificationJob as NotificationJobSchema,
+    NotificationPreference as NotificationPreferenceSchema,
+    NotificationPreferenceUpdate,
+    NotificationSelection,
     NotificationUpdate
 )
-from app.api.endpoints.auth import get_current_user
+from app.core.principal import Principal
+from app.services.notification_stream import notification_events
+from app.services.templates import TemplateError, recipient_context, template_renderer
+from app.api.endpoints.auth import credentials_exception, decode_token, get_current_principal, optional_oauth2_scheme
 
 router = APIRouter()
 
 @router.get("/", response_model=List[NotificationSchema])
+@query_budget(2)
+@statement_timeout("list")
 async def get_notifications(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     status: Optional[NotificationStatus] = None,
     notification_type: Optional[NotificationType] = None,
     channel: Optional[NotificationChannel] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get notifications for the current user"""
-    query = db.query(Notification).filter(Notification.user_id == current_user.id)
-    
-    if status:
-        query = query.filter(Notification.status == status)
-    if notification_type:
-        query = query.filter(Notification.notification_type == notification_type)
-    if channel:
-        query = query.filter(Notification.channel == channel)
+    query = select_filtered(
+        Notification,
+        user_id=current_user.id,
+        status=status,
+        notification_type=notification_type,
+        channel=channel
+    )
     
-    notifications = query.offset(skip).limit(limit).order_by(Notification.created_at.desc()).all()
+    keyset = Keyset(Notification.created_at, Notification.id, descending=True)
+    notifications = await paginate(db, query, keyset, request, response, skip, limit, cursor)
     return notifications
 
 @router.get("/unread", response_model=List[NotificationSchema])
+@statement_timeout("list")
 async def get_unread_notifications(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get unread notifications for the current user"""
-    notifications = db.query(Notification).filter(
+    result = await db.execute(select(Notification).where(
         Notification.user_id == current_user.id,
-        Notification.status.in_([NotificationStatus.PENDING, NotificationStatus.SENT, NotificationStatus.DELIVERED])
-    ).order_by(Notification.created_at.desc()).all()
+        Notification.status.in_(UNREAD_STATUSES)
+    ).order_by(Notification.created_at.desc()))
+    notifications = result.scalars().all()
     return notifications
 
+@router.get("/stream")
+async def stream_notifications(
+    access_token: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None),
+    token: Optional[str] = Depends(optional_oauth2_scheme)
+):
+    """Server-sent events with the current user's new notifications and unread count.
+
+    Browsers' EventSource cannot send an Authorization header, so the access
+    token may be given as the access_token query parameter instead.
+    """
+    token = token or access_token
+    if not token:
+        raise credentials_exception()
+    # Authenticated once; the stream itself only borrows connections to read changes
+    async with AsyncSessionLocal() as db:
+        current_user = await get_current_principal(token, db)
+    exp = decode_token(token).get("exp")
+    expires_at = datetime.fromtimestamp(exp, timezone.utc) if exp else None
+    
+    return StreamingResponse(
+        notification_events(current_user, last_event_id, expires_at),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/preferences", response_model=NotificationPreferenceSchema)
+async def get_notification_preferences(
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Get the current user's notification preferences"""
+    preference = await db.get(NotificationPreference, current_user.id)
+    return preference or NotificationPreferenceSchema()
+
+@router.put("/preferences", response_model=NotificationPreferenceSchema)
+async def update_notification_preferences(
+    preference_update: NotificationPreferenceUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Update the current user's notification preferences"""
+    preference = await db.get(NotificationPreference, current_user.id)
+    if preference is None:
+        preference = NotificationPreference(user_id=current_user.id, digest_enabled=True, email_enabled=True)
+        db.add(preference)
+    
+    for field, value in preference_update.dict(exclude_unset=True).items():
+        if value is None and field != "digest_window_seconds":
+            raise HTTPException(status_code=400, detail=f"{field} cannot be null")
+        setattr(preference, field, value)
+    
+    await db.commit()
+    await db.refresh(preference)
+    return preference
+
 @router.get("/{notification_id}", response_model=NotificationSchema)
 async def get_notification(
     notification_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get notification by ID"""
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id,
-        Notification.user_id == current_user.id
-    ).first()
-    if not notification:
-        raise HTTPException(status_code=404, detail="Notification not found")
+    notification = await get_or_404(db, Notification, notification_id, "Notification not found", user_id=current_user.id)
     return notification
 
 @router.post("/", response_model=NotificationSchema)
 async def create_notification(
     notification: NotificationCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Create a new notification"""
     # Only admins and system can create notifications
@@ -81,131 +156,139 @@ async def create_notification(
     
     db_notification = Notification(**notification_data)
     db.add(db_notification)
-    db.commit()
-    db.refresh(db_notification)
+    await db.commit()
+    await db.refresh(db_notification)
     return db_notification
 
 @router.patch("/{notification_id}/read")
 async def mark_notification_read(
     notification_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Mark notification as read"""
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id,
-        Notification.user_id == current_user.id
-    ).first()
-    if not notification:
-        raise HTTPException(status_code=404, detail="Notification not found")
+    notification = await get_or_404(db, Notification, notification_id, "Notification not found", user_id=current_user.id)
     
     notification.status = NotificationStatus.READ
     notification.read_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(notification)
+    await db.commit()
+    await db.refresh(notification)
     
     return {"message": "Notification marked as read"}
 
 @router.patch("/{notification_id}/unread")
 async def mark_notification_unread(
     notification_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Mark notification as unread"""
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id,
-        Notification.user_id == current_user.id
-    ).first()
-    if not notification:
-        raise HTTPException(status_code=404, detail="Notification not found")
+    notification = await get_or_404(db, Notification, notification_id, "Notification not found", user_id=current_user.id)
     
     notification.status = NotificationStatus.DELIVERED
     notification.read_at = None
     
-    db.commit()
-    db.refresh(notification)
+    await db.commit()
+    await db.refresh(notification)
     
     return {"message": "Notification marked as unread"}
 
+async def _mark_read(db: AsyncSession, user_id: int, *conditions) -> int:
+    """Mark the user's unread notifications matching conditions as read in one statement"""
+    result = await db.execute(
+        update(Notification)
+        .where(Notification.user_id == user_id, Notification.status.in_(UNREAD_STATUSES), *conditions)
+        .values(status=NotificationStatus.READ, read_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
+
+async def _delete(db: AsyncSession, user_id: int, *conditions) -> int:
+    """Delete the user's notifications matching conditions in one statement"""
+    result = await db.execute(
+        delete(Notification)
+        .where(Notification.user_id == user_id, *conditions)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
+
+def _selection_conditions(selection: NotificationSelection) -> list:
+    if selection.ids is None and selection.before is None:
+        raise HTTPException(status_code=400, detail="Provide ids or before")
+    conditions = []
+    if selection.ids is not None:
+        conditions.append(Notification.id.in_(selection.ids))
+    if selection.before is not None:
+        conditions.append(Notification.created_at < selection.before)
+    return conditions
+
 @router.patch("/read-all")
 async def mark_all_notifications_read(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Mark all notifications as read for the current user"""
-    notifications = db.query(Notification).filter(
-        Notification.user_id == current_user.id,
-        Notification.status.in_([NotificationStatus.PENDING, NotificationStatus.SENT, NotificationStatus.DELIVERED])
-    ).all()
-    
-    for notification in notifications:
-        notification.status = NotificationStatus.READ
-        notification.read_at = datetime.utcnow()
-    
-    db.commit()
-    
-    return {"message": f"Marked {len(notifications)} notifications as read"}
+    count = await _mark_read(db, current_user.id)
+    return {"message": f"Marked {count} notifications as read", "count": count}
+
+@router.patch("/read-batch")
+async def mark_notifications_read(
+    selection: NotificationSelection,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Mark the selected notifications of the current user as read"""
+    count = await _mark_read(db, current_user.id, *_selection_conditions(selection))
+    return {"message": f"Marked {count} notifications as read", "count": count}
 
 @router.delete("/{notification_id}")
 async def delete_notification(
     notification_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Delete notification by ID"""
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id,
-        Notification.user_id == current_user.id
-    ).first()
-    if not notification:
-        raise HTTPException(status_code=404, detail="Notification not found")
+    notification = await get_or_404(db, Notification, notification_id, "Notification not found", user_id=current_user.id)
     
-    db.delete(notification)
-    db.commit()
+    await db.delete(notification)
+    await db.commit()
     
     return {"message": "Notification deleted successfully"}
 
 @router.delete("/")
 async def delete_all_notifications(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Delete all notifications for the current user"""
-    notifications = db.query(Notification).filter(Notification.user_id == current_user.id).all()
-    
-    for notification in notifications:
-        db.delete(notification)
-    
-    db.commit()
-    
-    return {"message": f"Deleted {len(notifications)} notifications"}
+    count = await _delete(db, current_user.id)
+    return {"message": f"Deleted {count} notifications", "count": count}
 
-@router.get("/stats/summary")
-async def get_notification_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+@router.post("/delete-batch")
+async def delete_notifications(
+    selection: NotificationSelection,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    """Get notification statistics for the current user"""
-    total_notifications = db.query(Notification).filter(Notification.user_id == current_user.id).count()
-    unread_notifications = db.query(Notification).filter(
-        Notification.user_id == current_user.id,
-        Notification.status.in_([NotificationStatus.PENDING, NotificationStatus.SENT, NotificationStatus.DELIVERED])
-    ).count()
-    read_notifications = db.query(Notification).filter(
-        Notification.user_id == current_user.id,
-        Notification.status == NotificationStatus.READ
-    ).count()
-    
-    # Get notifications by type
-    type_stats = {}
-    for notification_type in NotificationType:
-        count = db.query(Notification).filter(
-            Notification.user_id == current_user.id,
-            Notification.notification_type == notification_type
-        ).count()
-        type_stats[notification_type.value] = count
+    """Delete the selected notifications of the current user"""
+    count = await _delete(db, current_user.id, *_selection_conditions(selection))
+    return {"message": f"Deleted {count} notifications", "count": count}
+
+def _summarize_counts(rows) -> dict:
+    """Statistics from (status, notification_type, count) rows"""
+    total_notifications = unread_notifications = read_notifications = 0
+    type_stats = {notification_type.value: 0 for notification_type in NotificationType}
+    for notification_status, notification_type, count in rows:
+        total_notifications += count
+        if notification_status in UNREAD_STATUSES:
+            unread_notifications += count
+        elif notification_status == NotificationStatus.READ:
+            read_notifications += count
+        if notification_type is not None:
+            type_stats[notification_type.value] += count
     
     return {
         "total_notifications": total_notifications,
@@ -214,59 +297,120 @@ async def get_notification_stats(
         "by_type": type_stats
     }
 
-@router.post("/send/bulk")
+@router.get("/stats/summary")
+@query_budget(2)
+@statement_timeout("report")
+async def get_notification_stats(
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Get notification statistics for the current user"""
+    result = await db.execute(
+        select(Notification.status, Notification.notification_type, func.count())
+        .where(Notification.user_id == current_user.id)
+        .group_by(Notification.status, Notification.notification_type)
+    )
+    return _summarize_counts(result.all())
+
+@router.get("/stats/counts")
+@query_budget(2)
+async def get_notification_counts(
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Total and unread notification counts for the current user, for badges"""
+    counter = await db.get(NotificationCounter, current_user.id)
+    return {
+        "total_notifications": counter.total if counter else 0,
+        "unread_notifications": counter.unread if counter else 0
+    }
+
+async def _notification_texts(
+    db: AsyncSession,
+    recipients: List[User],
+    title: Optional[str],
+    message: Optional[str],
+    template_id: Optional[int],
+    data: Optional[dict]
+) -> List[Tuple[str, str]]:
+    """(title, message) for each recipient: rendered from a template, or as given"""
+    if template_id is None:
+        if title is None or message is None:
+            raise HTTPException(status_code=400, detail="Provide title and message, or a template_id")
+        return [(title, message)] * len(recipients)
+    
+    template = await get_or_404(db, NotificationTemplate, template_id, "Notification template not found")
+    if not template.is_active:
+        raise HTTPException(status_code=400, detail="Notification template is inactive")
+    try:
+        return template_renderer.render_batch(template, [recipient_context(user, data) for user in recipients])
+    except TemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/send/bulk", response_model=NotificationJobSchema, status_code=status.HTTP_202_ACCEPTED)
 async def send_bulk_notifications(
-    user_ids: List[int],
     notification_type: NotificationType,
     channel: NotificationChannel,
-    title: str,
-    message: str,
+    user_ids: Optional[List[int]] = None,
+    audience: Optional[NotificationAudience] = None,
+    title: Optional[str] = None,
+    message: Optional[str] = None,
+    template_id: Optional[int] = None,
     data: Optional[dict] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    """Send bulk notifications to multiple users"""
+    """Queue a notification to an audience of users; returns the job to poll for progress"""
     # Only admins can send bulk notifications
     if current_user.user_type.value != "admin":
         raise HTTPException(status_code=403, detail="Not authorized to send bulk notifications")
     
-    notifications = []
-    for user_id in user_ids:
-        # Verify user exists
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            continue
-        
-        notification = Notification(
-            title=title,
-            message=message,
-            notification_type=notification_type,
-            channel=channel,
-            user_id=user_id,
-            data=data or {},
-            created_by=current_user.id
-        )
-        notifications.append(notification)
+    audience = audience or NotificationAudience()
+    if user_ids:
+        audience.user_ids = (audience.user_ids or []) + user_ids
+    if not (audience.all_users or audience.user_ids or audience.user_types or audience.project_ids or audience.parcel_ids):
+        raise HTTPException(status_code=400, detail="Provide user_ids or an audience")
     
-    db.add_all(notifications)
-    db.commit()
+    # Dry run against a blank recipient, so a bad template fails the request rather than the job
+    await _notification_texts(db, [User(name="", email="")], title, message, template_id, data)
     
-    return {
-        "message": f"Sent {len(notifications)} notifications",
-        "sent_count": len(notifications),
-        "requested_count": len(user_ids)
-    }
+    job = NotificationJob(
+        audience=audience.model_dump(mode="json", exclude_none=True),
+        notification_type=notification_type,
+        channel=channel,
+        title=title,
+        message=message,
+        template_id=template_id,
+        data=data or {},
+        created_by=current_user.id
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+@router.get("/send/jobs/{job_id}", response_model=NotificationJobSchema)
+async def get_notification_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Get the status and progress of a bulk send"""
+    if current_user.user_type.value != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized to view notification jobs")
+    return await get_or_404(db, NotificationJob, job_id, "Notification job not found")
 
 @router.post("/send/user/{user_id}")
 async def send_notification_to_user(
     user_id: int,
     notification_type: NotificationType,
     channel: NotificationChannel,
-    title: str,
-    message: str,
+    title: Optional[str] = None,
+    message: Optional[str] = None,
+    template_id: Optional[int] = None,
     data: Optional[dict] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Send notification to a specific user"""
     # Only admins can send notifications
@@ -274,9 +418,8 @@ async def send_notification_to_user(
         raise HTTPException(status_code=403, detail="Not authorized to send notifications")
     
     # Verify user exists
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = await get_or_404(db, User, user_id, "User not found")
+    [(title, message)] = await _notification_texts(db, [user], title, message, template_id, data)
     
     notification = Notification(
         title=title,
@@ -289,8 +432,8 @@ async def send_notification_to_user(
     )
     
     db.add(notification)
-    db.commit()
-    db.refresh(notification)
+    await db.commit()
+    await db.refresh(notification)
     
     return {
         "message": "Notification sent successfully",
@@ -1,59 +1,66 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 
 from app.db.database import get_db
-from app.models.user import User
+from app.db.pagination import Keyset, paginate
+from app.db.repository import get_or_404, list_filtered, select_filtered
+from app.db.search import fuzzy_match, fuzzy_search, ranked_page
+from app.db.instrumentation import query_budget
+from app.db.timeouts import statement_timeout
 from app.models.investment import InvestmentOpportunity, OpportunityStatus
 from app.schemas.investment import InvestmentOpportunity as OpportunitySchema, InvestmentOpportunityCreate, InvestmentOpportunityUpdate
-from app.api.endpoints.auth import get_current_user
+from app.core.principal import Principal
+from app.api.endpoints.auth import get_current_principal
 
 router = APIRouter()
 
 @router.get("/", response_model=List[OpportunitySchema])
+@query_budget(2)
+@statement_timeout("list")
 async def get_opportunities(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     status: Optional[OpportunityStatus] = None,
     investor_id: Optional[int] = None,
     advisor_id: Optional[int] = None,
     region: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    search: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get all investment opportunities with optional filtering"""
-    query = db.query(InvestmentOpportunity)
+    query = select_filtered(InvestmentOpportunity, status=status, investor_id=investor_id, advisor_id=advisor_id)
     
-    if status:
-        query = query.filter(InvestmentOpportunity.status == status)
-    if investor_id:
-        query = query.filter(InvestmentOpportunity.investor_id == investor_id)
-    if advisor_id:
-        query = query.filter(InvestmentOpportunity.advisor_id == advisor_id)
     if region:
-        query = query.filter(InvestmentOpportunity.target_region.ilike(f"%{region}%"))
+        query = query.where(fuzzy_match(InvestmentOpportunity.target_region, region))
+    if search:
+        # Best matches first, so a typo still finds its opportunity on the first page
+        return await ranked_page(db, query, InvestmentOpportunity.title, search, skip, limit, cursor)
     
-    opportunities = query.offset(skip).limit(limit).all()
+    opportunities = await paginate(db, query, Keyset(InvestmentOpportunity.id), request, response, skip, limit, cursor)
     return opportunities
 
 @router.get("/{opportunity_id}", response_model=OpportunitySchema)
 async def get_opportunity(
     opportunity_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get investment opportunity by ID"""
-    opportunity = db.query(InvestmentOpportunity).filter(InvestmentOpportunity.id == opportunity_id).first()
-    if not opportunity:
-        raise HTTPException(status_code=404, detail="Investment opportunity not found")
+    opportunity = await get_or_404(db, InvestmentOpportunity, opportunity_id, "Investment opportunity not found")
     return opportunity
 
 @router.post("/", response_model=OpportunitySchema)
 async def create_opportunity(
     opportunity: InvestmentOpportunityCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Create a new investment opportunity"""
     # Only advisors and admins can create opportunities
@@ -62,21 +69,19 @@ async def create_opportunity(
     
     db_opportunity = InvestmentOpportunity(**opportunity.dict())
     db.add(db_opportunity)
-    db.commit()
-    db.refresh(db_opportunity)
+    await db.commit()
+    await db.refresh(db_opportunity)
     return db_opportunity
 
 @router.put("/{opportunity_id}", response_model=OpportunitySchema)
 async def update_opportunity(
     opportunity_id: int,
     opportunity_update: InvestmentOpportunityUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Update investment opportunity by ID"""
-    opportunity = db.query(InvestmentOpportunity).filter(InvestmentOpportunity.id == opportunity_id).first()
-    if not opportunity:
-        raise HTTPException(status_code=404, detail="Investment opportunity not found")
+    opportunity = await get_or_404(db, InvestmentOpportunity, opportunity_id, "Investment opportunity not found")
     
     # Check authorization
     if (opportunity.advisor_id != current_user.id and 
@@ -86,8 +91,8 @@ async def update_opportunity(
     for field, value in opportunity_update.dict(exclude_unset=True).items():
         setattr(opportunity, field, value)
     
-    db.commit()
-    db.refresh(opportunity)
+    await db.commit()
+    await db.refresh(opportunity)
     return opportunity
 
 @router.patch("/{opportunity_id}/state")
@@ -95,13 +100,11 @@ async def update_opportunity_status(
     opportunity_id: int,
     new_status: OpportunityStatus,
     comments: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Update opportunity status"""
-    opportunity = db.query(InvestmentOpportunity).filter(InvestmentOpportunity.id == opportunity_id).first()
-    if not opportunity:
-        raise HTTPException(status_code=404, detail="Investment opportunity not found")
+    opportunity = await get_or_404(db, InvestmentOpportunity, opportunity_id, "Investment opportunity not found")
     
     # Check authorization
     if (opportunity.advisor_id != current_user.id and 
@@ -128,8 +131,8 @@ async def update_opportunity_status(
     if comments:
         opportunity.description += f"\n\nStatus Update: {comments}"
     
-    db.commit()
-    db.refresh(opportunity)
+    await db.commit()
+    await db.refresh(opportunity)
     
     return {
         "message": f"Opportunity status updated to {new_status}",
@@ -139,13 +142,11 @@ async def update_opportunity_status(
 @router.delete("/{opportunity_id}")
 async def delete_opportunity(
     opportunity_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Delete investment opportunity by ID"""
-    opportunity = db.query(InvestmentOpportunity).filter(InvestmentOpportunity.id == opportunity_id).first()
-    if not opportunity:
-        raise HTTPException(status_code=404, detail="Investment opportunity not found")
+    opportunity = await get_or_404(db, InvestmentOpportunity, opportunity_id, "Investment opportunity not found")
     
     # Check authorization
     if (opportunity.advisor_id != current_user.id and 
@@ -156,55 +157,50 @@ async def delete_opportunity(
     if opportunity.status != OpportunityStatus.DRAFT:
         raise HTTPException(status_code=400, detail="Only draft opportunities can be deleted")
     
-    db.delete(opportunity)
-    db.commit()
+    await db.delete(opportunity)
+    await db.commit()
     
     return {"message": "Investment opportunity deleted successfully"}
 
 @router.get("/investor/{investor_id}", response_model=List[OpportunitySchema])
+@statement_timeout("list")
 async def get_investor_opportunities(
     investor_id: int,
     status: Optional[OpportunityStatus] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get opportunities for a specific investor"""
-    query = db.query(InvestmentOpportunity).filter(InvestmentOpportunity.investor_id == investor_id)
-    
-    if status:
-        query = query.filter(InvestmentOpportunity.status == status)
-    
-    opportunities = query.all()
+    opportunities = await list_filtered(db, InvestmentOpportunity, investor_id=investor_id, status=status)
     return opportunities
 
 @router.get("/advisor/{advisor_id}", response_model=List[OpportunitySchema])
+@statement_timeout("list")
 async def get_advisor_opportunities(
     advisor_id: int,
     status: Optional[OpportunityStatus] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get opportunities created by a specific advisor"""
-    query = db.query(InvestmentOpportunity).filter(InvestmentOpportunity.advisor_id == advisor_id)
-    
-    if status:
-        query = query.filter(InvestmentOpportunity.status == status)
-    
-    opportunities = query.all()
+    opportunities = await list_filtered(db, InvestmentOpportunity, advisor_id=advisor_id, status=status)
     return opportunities
 
 @router.get("/region/{region}", response_model=List[OpportunitySchema])
+@statement_timeout("list")
 async def get_opportunities_by_region(
     region: str,
     status: Optional[OpportunityStatus] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    limit: int = 100,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    """Get opportunities by region"""
-    query = db.query(InvestmentOpportunity).filter(InvestmentOpportunity.target_region.ilike(f"%{region}%"))
+    """Get opportunities by region, closest region matches first"""
+    query = fuzzy_search(select(InvestmentOpportunity), InvestmentOpportunity.target_region, region)
     
     if status:
-        query = query.filter(InvestmentOpportunity.status == status)
+        query = query.where(InvestmentOpportunity.status == status)
     
-    opportunities = query.all()
+    result = await db.execute(query.order_by(InvestmentOpportunity.id).limit(limit))
+    opportunities = result.scalars().all()
     return opportunities
@@ -1,12 +1,16 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime, timedelta
 
 from app.db.database import get_db
-from app.models.user import User
+from app.db.pagination import Keyset, paginate
+from app.db.repository import get_by_id, get_or_404, list_filtered, select_filtered
+from app.db.instrumentation import query_budget
+from app.db.timeouts import statement_timeout
 from app.models.project import DevelopmentProject, ProjectStatus, ProjectType
-from app.models.land_parcel import Milestone
+from app.models.investment import InvestmentProposal, ProposalStatus
+from app.models.land_parcel import Milestone, MilestoneStatus
 from app.models.land_parcel import Task, TaskStatus
 from app.schemas.project import (
     DevelopmentProject as ProjectSchema, 
@@ -19,50 +23,48 @@ from app.schemas.land_parcel import (
     Task as TaskSchema,
     TaskCreate
 )
-from app.api.endpoints.auth import get_current_user
+from app.core.principal import Principal
+from app.api.endpoints.auth import get_current_principal
+from app.api.endpoints.tasks import notify_task_assigned
 
 router = APIRouter()
 
 @router.get("/", response_model=List[ProjectSchema])
+@query_budget(2)
+@statement_timeout("list")
 async def get_projects(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     status: Optional[ProjectStatus] = None,
     project_type: Optional[ProjectType] = None,
     project_manager_id: Optional[int] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get all development projects with optional filtering"""
-    query = db.query(DevelopmentProject)
+    query = select_filtered(DevelopmentProject, status=status, project_type=project_type, project_manager_id=project_manager_id)
     
-    if status:
-        query = query.filter(DevelopmentProject.status == status)
-    if project_type:
-        query = query.filter(DevelopmentProject.project_type == project_type)
-    if project_manager_id:
-        query = query.filter(DevelopmentProject.project_manager_id == project_manager_id)
-    
-    projects = query.offset(skip).limit(limit).all()
+    projects = await paginate(db, query, Keyset(DevelopmentProject.id), request, response, skip, limit, cursor)
     return projects
 
 @router.get("/{project_id}", response_model=ProjectSchema)
 async def get_project(
     project_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get development project by ID"""
-    project = db.query(DevelopmentProject).filter(DevelopmentProject.id == project_id).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Development project not found")
+    project = await get_or_404(db, DevelopmentProject, project_id, "Development project not found")
     return project
 
 @router.post("/", response_model=ProjectSchema)
 async def create_project(
     project: DevelopmentProjectCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Create a new development project"""
     # Only project managers and admins can create projects
@@ -71,22 +73,20 @@ async def create_project(
     
     db_project = DevelopmentProject(**project.dict())
     db.add(db_project)
-    db.commit()
-    db.refresh(db_project)
+    await db.commit()
+    await db.refresh(db_project)
     return db_project
 
 @router.post("/proposals/{proposal_id}/projects", response_model=ProjectSchema)
 async def create_project_from_proposal(
     proposal_id: int,
     project: DevelopmentProjectCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Create a development project from an approved proposal"""
     # Verify proposal exists and is approved
-    proposal = db.query(InvestmentProposal).filter(InvestmentProposal.id == proposal_id).first()
-    if not proposal:
-        raise HTTPException(status_code=404, detail="Investment proposal not found")
+    proposal = await get_or_404(db, InvestmentProposal, proposal_id, "Investment proposal not found")
     
     if proposal.status != ProposalStatus.AGREEMENT_SIGNED:
         raise HTTPException(status_code=400, detail="Only proposals with signed agreements can create projects")
@@ -100,8 +100,8 @@ async def create_project_from_proposal(
     
     db_project = DevelopmentProject(**project_data)
     db.add(db_project)
-    db.commit()
-    db.refresh(db_project)
+    await db.commit()
+    await db.refresh(db_project)
     
     # Auto-create initial milestones based on project type
     await create_initial_milestones(db_project.id, db)
@@ -112,13 +112,11 @@ async def create_project_from_proposal(
 async def update_project(
     project_id: int,
     project_update: DevelopmentProjectUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Update development project by ID"""
-    project = db.query(DevelopmentProject).filter(DevelopmentProject.id == project_id).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Development project not found")
+    project = await get_or_404(db, DevelopmentProject, project_id, "Development project not found")
     
     # Check authorization
     if (project.project_manager_id != current_user.id and 
@@ -128,8 +126,8 @@ async def update_project(
     for field, value in project_update.dict(exclude_unset=True).items():
         setattr(project, field, value)
     
-    db.commit()
-    db.refresh(project)
+    await db.commit()
+    await db.refresh(project)
     return project
 
 @router.patch("/{project_id}/status")
@@ -137,13 +135,11 @@ async def update_project_status(
     project_id: int,
     new_status: ProjectStatus,
     comments: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Update project status"""
-    project = db.query(DevelopmentProject).filter(DevelopmentProject.id == project_id).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Development project not found")
+    project = await get_or_404(db, DevelopmentProject, project_id, "Development project not found")
     
     # Check authorization
     if (project.project_manager_id != current_user.id and 
@@ -173,8 +169,8 @@ async def update_project_status(
     if comments:
         project.description += f"\n\nStatus Update: {comments}"
     
-    db.commit()
-    db.refresh(project)
+    await db.commit()
+    await db.refresh(project)
     
     return {
         "message": f"Project status updated to {new_status}",
@@ -182,27 +178,26 @@ async def update_project_status(
     }
 
 @router.get("/{project_id}/milestones", response_model=List[MilestoneSchema])
+@statement_timeout("list")
 async def get_project_milestones(
     project_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get milestones for a project"""
-    milestones = db.query(Milestone).filter(Milestone.project_id == project_id).all()
+    milestones = await list_filtered(db, Milestone, project_id=project_id)
     return milestones
 
 @router.post("/{project_id}/milestones", response_model=MilestoneSchema)
 async def create_project_milestone(
     project_id: int,
     milestone: MilestoneCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Create a milestone for a project"""
     # Verify project exists
-    project = db.query(DevelopmentProject).filter(DevelopmentProject.id == project_id).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Development project not found")
+    project = await get_or_404(db, DevelopmentProject, project_id, "Development project not found")
     
     # Check authorization
     if (project.project_manager_id != current_user.id and 
@@ -214,8 +209,8 @@ async def create_project_milestone(
     
     db_milestone = Milestone(**milestone_data)
     db.add(db_milestone)
-    db.commit()
-    db.refresh(db_milestone)
+    await db.commit()
+    await db.refresh(db_milestone)
     return db_milestone
 
 @router.post("/{project_id}/milestones/{milestone_id}/submit")
@@ -223,20 +218,14 @@ async def submit_milestone(
     project_id: int,
     milestone_id: int,
     submission_notes: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Submit milestone for approval"""
-    milestone = db.query(Milestone).filter(
-        Milestone.id == milestone_id,
-        Milestone.project_id == project_id
-    ).first()
-    
-    if not milestone:
-        raise HTTPException(status_code=404, detail="Milestone not found")
+    milestone = await get_or_404(db, Milestone, milestone_id, "Milestone not found", project_id=project_id)
     
     # Check authorization
-    project = db.query(DevelopmentProject).filter(DevelopmentProject.id == project_id).first()
+    project = await get_by_id(db, DevelopmentProject, project_id)
     if (project.project_manager_id != current_user.id and 
         current_user.user_type.value not in ["admin"]):
         raise HTTPException(status_code=403, detail="Not authorized to submit this milestone")
@@ -245,8 +234,8 @@ async def submit_milestone(
     if submission_notes:
         milestone.description += f"\n\nSubmission Notes: {submission_notes}"
     
-    db.commit()
-    db.refresh(milestone)
+    await db.commit()
+    await db.refresh(milestone)
     
     return {
         "message": "Milestone submitted for approval",
@@ -254,33 +243,27 @@ async def submit_milestone(
     }
 
 @router.get("/{project_id}/tasks", response_model=List[TaskSchema])
+@statement_timeout("list")
 async def get_project_tasks(
     project_id: int,
     status: Optional[TaskStatus] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get tasks for a project"""
-    query = db.query(Task).filter(Task.project_id == project_id)
-    
-    if status:
-        query = query.filter(Task.status == status)
-    
-    tasks = query.all()
+    tasks = await list_filtered(db, Task, project_id=project_id, status=status)
     return tasks
 
 @router.post("/{project_id}/tasks/assign", response_model=TaskSchema)
 async def assign_task_to_project(
     project_id: int,
     task: TaskCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Assign a task to a project"""
     # Verify project exists
-    project = db.query(DevelopmentProject).filter(DevelopmentProject.id == project_id).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Development project not found")
+    project = await get_or_404(db, DevelopmentProject, project_id, "Development project not found")
     
     # Check authorization
     if (project.project_manager_id != current_user.id and 
@@ -292,20 +275,21 @@ async def assign_task_to_project(
     
     db_task = Task(**task_data)
     db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
+    if db_task.assigned_to is not None and db_task.assigned_to != current_user.id:
+        await db.flush()
+        await notify_task_assigned(db, db_task, current_user.id)
+    await db.commit()
+    await db.refresh(db_task)
     return db_task
 
 @router.delete("/{project_id}")
 async def delete_project(
     project_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Delete development project by ID"""
-    project = db.query(DevelopmentProject).filter(DevelopmentProject.id == project_id).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Development project not found")
+    project = await get_or_404(db, DevelopmentProject, project_id, "Development project not found")
     
     # Check authorization
     if (project.project_manager_id != current_user.id and 
@@ -316,14 +300,14 @@ async def delete_project(
     if project.status != ProjectStatus.INITIATED:
         raise HTTPException(status_code=400, detail="Only initiated projects can be deleted")
     
-    db.delete(project)
-    db.commit()
+    await db.delete(project)
+    await db.commit()
     
     return {"message": "Development project deleted successfully"}
 
-async def create_initial_milestones(project_id: int, db: Session):
+async def create_initial_milestones(project_id: int, db: AsyncSession):
     """Create initial milestones for a project based on its type"""
-    project = db.query(DevelopmentProject).filter(DevelopmentProject.id == project_id).first()
+    project = await get_by_id(db, DevelopmentProject, project_id)
     if not project:
         return
     
@@ -356,4 +340,4 @@ async def create_initial_milestones(project_id: int, db: Session):
         )
         db.add(milestone)
     
-    db.commit()
+    await db.commit()
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 
 from app.db.database import get_db
-from app.models.user import User
-from app.models.investment import InvestmentProposal, ProposalStatus, ProposalParcel
+from app.db.pagination import Keyset, paginate
+from app.db.repository import get_or_404, list_filtered, select_filtered
+from app.db.instrumentation import query_budget
+from app.db.timeouts import statement_timeout
+from app.models.investment import InvestmentOpportunity, InvestmentProposal, ProposalStatus, ProposalParcel
 from app.schemas.investment import (
     InvestmentProposal as ProposalSchema, 
     InvestmentProposalCreate, 
@@ -13,50 +16,47 @@ from app.schemas.investment import (
     ProposalParcel as ProposalParcelSchema,
     ProposalParcelCreate
 )
-from app.api.endpoints.auth import get_current_user
+from app.core.principal import Principal
+from app.api.endpoints.auth import get_current_principal
 
 router = APIRouter()
 
 @router.get("/", response_model=List[ProposalSchema])
+@query_budget(2)
+@statement_timeout("list")
 async def get_proposals(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     status: Optional[ProposalStatus] = None,
     opportunity_id: Optional[int] = None,
     advisor_id: Optional[int] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get all investment proposals with optional filtering"""
-    query = db.query(InvestmentProposal)
+    query = select_filtered(InvestmentProposal, status=status, opportunity_id=opportunity_id, advisor_id=advisor_id)
     
-    if status:
-        query = query.filter(InvestmentProposal.status == status)
-    if opportunity_id:
-        query = query.filter(InvestmentProposal.opportunity_id == opportunity_id)
-    if advisor_id:
-        query = query.filter(InvestmentProposal.advisor_id == advisor_id)
-    
-    proposals = query.offset(skip).limit(limit).all()
+    proposals = await paginate(db, query, Keyset(InvestmentProposal.id), request, response, skip, limit, cursor)
     return proposals
 
 @router.get("/{proposal_id}", response_model=ProposalSchema)
 async def get_proposal(
     proposal_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get investment proposal by ID"""
-    proposal = db.query(InvestmentProposal).filter(InvestmentProposal.id == proposal_id).first()
-    if not proposal:
-        raise HTTPException(status_code=404, detail="Investment proposal not found")
+    proposal = await get_or_404(db, InvestmentProposal, proposal_id, "Investment proposal not found")
     return proposal
 
 @router.post("/", response_model=ProposalSchema)
 async def create_proposal(
     proposal: InvestmentProposalCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Create a new investment proposal"""
     # Only advisors and admins can create proposals
@@ -65,22 +65,20 @@ async def create_proposal(
     
     db_proposal = InvestmentProposal(**proposal.dict())
     db.add(db_proposal)
-    db.commit()
-    db.refresh(db_proposal)
+    await db.commit()
+    await db.refresh(db_proposal)
     return db_proposal
 
 @router.post("/opportunities/{opportunity_id}/proposals", response_model=ProposalSchema)
 async def create_proposal_for_opportunity(
     opportunity_id: int,
     proposal: InvestmentProposalCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Create a proposal for a specific opportunity"""
     # Verify opportunity exists
-    opportunity = db.query(InvestmentOpportunity).filter(InvestmentOpportunity.id == opportunity_id).first()
-    if not opportunity:
-        raise HTTPException(status_code=404, detail="Investment opportunity not found")
+    await get_or_404(db, InvestmentOpportunity, opportunity_id, "Investment opportunity not found")
     
     # Only advisors and admins can create proposals
     if current_user.user_type.value not in ["advisor", "admin"]:
@@ -91,21 +89,19 @@ async def create_proposal_for_opportunity(
     
     db_proposal = InvestmentProposal(**proposal_data)
     db.add(db_proposal)
-    db.commit()
-    db.refresh(db_proposal)
+    await db.commit()
+    await db.refresh(db_proposal)
     return db_proposal
 
 @router.put("/{proposal_id}", response_model=ProposalSchema)
 async def update_proposal(
     proposal_id: int,
     proposal_update: InvestmentProposalUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Update investment proposal by ID"""
-    proposal = db.query(InvestmentProposal).filter(InvestmentProposal.id == proposal_id).first()
-    if not proposal:
-        raise HTTPException(status_code=404, detail="Investment proposal not found")
+    proposal = await get_or_404(db, InvestmentProposal, proposal_id, "Investment proposal not found")
     
     # Check authorization
     if (proposal.advisor_id != current_user.id and 
@@ -115,21 +111,19 @@ async def update_proposal(
     for field, value in proposal_update.dict(exclude_unset=True).items():
         setattr(proposal, field, value)
     
-    db.commit()
-    db.refresh(proposal)
+    await db.commit()
+    await db.refresh(proposal)
     return proposal
 
 @router.post("/{proposal_id}/approve")
 async def approve_proposal(
     proposal_id: int,
     comments: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Approve investment proposal"""
-    proposal = db.query(InvestmentProposal).filter(InvestmentProposal.id == proposal_id).first()
-    if not proposal:
-        raise HTTPException(status_code=404, detail="Investment proposal not found")
+    proposal = await get_or_404(db, InvestmentProposal, proposal_id, "Investment proposal not found")
     
     # Check authorization (investors and governance can approve)
     if current_user.user_type.value not in ["investor", "governance", "admin"]:
@@ -142,8 +136,8 @@ async def approve_proposal(
     if comments:
         proposal.description += f"\n\nApproval Comments: {comments}"
     
-    db.commit()
-    db.refresh(proposal)
+    await db.commit()
+    await db.refresh(proposal)
     
     return {
         "message": "Proposal approved successfully",
@@ -154,13 +148,11 @@ async def approve_proposal(
 async def reject_proposal(
     proposal_id: int,
     rejection_reason: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Reject investment proposal"""
-    proposal = db.query(InvestmentProposal).filter(InvestmentProposal.id == proposal_id).first()
-    if not proposal:
-        raise HTTPException(status_code=404, detail="Investment proposal not found")
+    proposal = await get_or_404(db, InvestmentProposal, proposal_id, "Investment proposal not found")
     
     # Check authorization (investors and governance can reject)
     if current_user.user_type.value not in ["investor", "governance", "admin"]:
@@ -172,8 +164,8 @@ async def reject_proposal(
     proposal.status = ProposalStatus.REJECTED
     proposal.description += f"\n\nRejection Reason: {rejection_reason}"
     
-    db.commit()
-    db.refresh(proposal)
+    await db.commit()
+    await db.refresh(proposal)
     
     return {
         "message": "Proposal rejected",
@@ -184,13 +176,11 @@ async def reject_proposal(
 async def create_development_service_agreement(
     proposal_id: int,
     agreement_content: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Create Development Service Agreement (DSA) for approved proposal"""
-    proposal = db.query(InvestmentProposal).filter(InvestmentProposal.id == proposal_id).first()
-    if not proposal:
-        raise HTTPException(status_code=404, detail="Investment proposal not found")
+    proposal = await get_or_404(db, InvestmentProposal, proposal_id, "Investment proposal not found")
     
     if proposal.status != ProposalStatus.APPROVED:
         raise HTTPException(status_code=400, detail="Only approved proposals can have DSAs created")
@@ -203,8 +193,8 @@ async def create_development_service_agreement(
     proposal.status = ProposalStatus.AGREEMENT_SIGNED
     proposal.description += f"\n\nDSA Created: {agreement_content}"
     
-    db.commit()
-    db.refresh(proposal)
+    await db.commit()
+    await db.refresh(proposal)
     
     return {
         "message": "Development Service Agreement created successfully",
@@ -212,27 +202,26 @@ async def create_development_service_agreement(
     }
 
 @router.get("/{proposal_id}/parcels", response_model=List[ProposalParcelSchema])
+@statement_timeout("list")
 async def get_proposal_parcels(
     proposal_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get parcels associated with a proposal"""
-    parcels = db.query(ProposalParcel).filter(ProposalParcel.proposal_id == proposal_id).all()
+    parcels = await list_filtered(db, ProposalParcel, proposal_id=proposal_id)
     return parcels
 
 @router.post("/{proposal_id}/parcels", response_model=ProposalParcelSchema)
 async def add_parcel_to_proposal(
     proposal_id: int,
     parcel: ProposalParcelCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Add a land parcel to a proposal"""
     # Verify proposal exists
-    proposal = db.query(InvestmentProposal).filter(InvestmentProposal.id == proposal_id).first()
-    if not proposal:
-        raise HTTPException(status_code=404, detail="Investment proposal not found")
+    proposal = await get_or_404(db, InvestmentProposal, proposal_id, "Investment proposal not found")
     
     # Check authorization
     if (proposal.advisor_id != current_user.id and 
@@ -244,20 +233,18 @@ async def add_parcel_to_proposal(
     
     db_parcel = ProposalParcel(**parcel_data)
     db.add(db_parcel)
-    db.commit()
-    db.refresh(db_parcel)
+    await db.commit()
+    await db.refresh(db_parcel)
     return db_parcel
 
 @router.delete("/{proposal_id}")
 async def delete_proposal(
     proposal_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Delete investment proposal by ID"""
-    proposal = db.query(InvestmentProposal).filter(InvestmentProposal.id == proposal_id).first()
-    if not proposal:
-        raise HTTPException(status_code=404, detail="Investment proposal not found")
+    proposal = await get_or_404(db, InvestmentProposal, proposal_id, "Investment proposal not found")
     
     # Check authorization
     if (proposal.advisor_id != current_user.id and 
@@ -268,7 +255,7 @@ async def delete_proposal(
     if proposal.status != ProposalStatus.DRAFT:
         raise HTTPException(status_code=400, detail="Only draft proposals can be deleted")
     
-    db.delete(proposal)
-    db.commit()
+    await db.delete(proposal)
+    await db.commit()
     
     return {"message": "Investment proposal deleted successfully"}
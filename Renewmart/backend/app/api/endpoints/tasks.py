@@ -1,119 +1,137 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 
 from app.db.database import get_db
+from app.db.pagination import Keyset, paginate
+from app.db.repository import get_or_404, list_filtered, select_filtered
+from app.db.instrumentation import query_budget
+from app.db.timeouts import statement_timeout
 from app.models.user import User
 from app.models.land_parcel import Task, TaskStatus
+from app.models.notification import NotificationType
 from app.schemas.land_parcel import Task as TaskSchema, TaskCreate, TaskUpdate
-from app.api.endpoints.auth import get_current_user
+from app.core.principal import Principal
+from app.api.endpoints.auth import get_current_principal
+from app.services.notification_digest import queue_notification
 
 router = APIRouter()
 
 @router.get("/", response_model=List[TaskSchema])
+@query_budget(2)
+@statement_timeout("list")
 async def get_tasks(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     status: Optional[TaskStatus] = None,
     assignee_id: Optional[int] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get all tasks with optional filtering"""
-    query = db.query(Task)
+    query = select_filtered(Task, status=status, assigned_to=assignee_id)
     
-    if status:
-        query = query.filter(Task.status == status)
-    if assignee_id:
-        query = query.filter(Task.assigned_to == assignee_id)
-    
-    tasks = query.offset(skip).limit(limit).all()
+    tasks = await paginate(db, query, Keyset(Task.id), request, response, skip, limit, cursor)
     return tasks
 
 @router.get("/{task_id}", response_model=TaskSchema)
 async def get_task(
     task_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get task by ID"""
-    task = db.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
+    task = await get_or_404(db, Task, task_id, "Task not found")
     return task
 
 @router.post("/", response_model=TaskSchema)
 async def create_task(
     task: TaskCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Create a new task"""
     db_task = Task(**task.dict())
     db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
+    await db.commit()
+    await db.refresh(db_task)
     return db_task
 
 @router.put("/{task_id}", response_model=TaskSchema)
 async def update_task(
     task_id: int,
     task_update: TaskUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Update task by ID"""
-    task = db.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
+    task = await get_or_404(db, Task, task_id, "Task not found")
     
     for field, value in task_update.dict(exclude_unset=True).items():
         setattr(task, field, value)
     
-    db.commit()
-    db.refresh(task)
+    await db.commit()
+    await db.refresh(task)
     return task
 
+async def notify_task_assigned(db: AsyncSession, task: Task, assigned_by: int):
+    """Notify the assignee of a task; assignments within a project are
+    coalesced into one digest"""
+    if task.project_id is not None:
+        related_entity_type, related_entity_id = "project", task.project_id
+    else:
+        related_entity_type, related_entity_id = "task", task.id
+    await queue_notification(
+        db,
+        user_id=task.assigned_to,
+        notification_type=NotificationType.TASK_ASSIGNED,
+        title="New task assigned",
+        message=f"You have been assigned the task \"{task.title}\"",
+        created_by=assigned_by,
+        related_entity_type=related_entity_type,
+        related_entity_id=related_entity_id,
+        data={"task_id": task.id}
+    )
+
 @router.patch("/{task_id}/assign")
 async def assign_task(
     task_id: int,
     assignee_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Assign task to a user"""
-    task = db.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
+    task = await get_or_404(db, Task, task_id, "Task not found")
     
     # Verify assignee exists
-    assignee = db.query(User).filter(User.id == assignee_id).first()
-    if not assignee:
-        raise HTTPException(status_code=404, detail="Assignee not found")
+    assignee = await get_or_404(db, User, assignee_id, "Assignee not found")
     
     task.assigned_to = assignee_id
     task.status = TaskStatus.ASSIGNED
-    db.commit()
+    if assignee_id != current_user.id:
+        await notify_task_assigned(db, task, current_user.id)
+    await db.commit()
     
     return {"message": f"Task assigned to {assignee.name}"}
 
 @router.patch("/{task_id}/accept")
 async def accept_task(
     task_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Accept task assignment"""
-    task = db.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
+    task = await get_or_404(db, Task, task_id, "Task not found")
     
     if task.assigned_to != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to accept this task")
     
     task.status = TaskStatus.IN_PROGRESS
-    db.commit()
+    await db.commit()
     
     return {"message": "Task accepted and started"}
 
@@ -121,13 +139,11 @@ async def accept_task(
 async def complete_task(
     task_id: int,
     completion_notes: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Mark task as completed"""
-    task = db.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
+    task = await get_or_404(db, Task, task_id, "Task not found")
     
     if task.assigned_to != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to complete this task")
@@ -137,7 +153,7 @@ async def complete_task(
     if completion_notes:
         task.description += f"\n\nCompletion Notes: {completion_notes}"
     
-    db.commit()
+    await db.commit()
     
     return {"message": "Task completed successfully"}
 
@@ -145,51 +161,43 @@ async def complete_task(
 async def reject_task(
     task_id: int,
     rejection_reason: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Reject task assignment"""
-    task = db.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
+    task = await get_or_404(db, Task, task_id, "Task not found")
     
     if task.assigned_to != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to reject this task")
     
     task.status = TaskStatus.REJECTED
     task.description += f"\n\nRejection Reason: {rejection_reason}"
-    db.commit()
+    await db.commit()
     
     return {"message": "Task rejected"}
 
 @router.get("/assignee/{user_id}", response_model=List[TaskSchema])
+@statement_timeout("list")
 async def get_user_tasks(
     user_id: int,
     status: Optional[TaskStatus] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get tasks assigned to a specific user"""
-    query = db.query(Task).filter(Task.assigned_to == user_id)
-    
-    if status:
-        query = query.filter(Task.status == status)
-    
-    tasks = query.all()
+    tasks = await list_filtered(db, Task, assigned_to=user_id, status=status)
     return tasks
 
 @router.delete("/{task_id}")
 async def delete_task(
     task_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Delete task by ID"""
-    task = db.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
+    task = await get_or_404(db, Task, task_id, "Task not found")
     
-    db.delete(task)
-    db.commit()
+    await db.delete(task)
+    await db.commit()
     
     return {"message": "Task deleted successfully"}
@@ -1,50 +1,55 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from passlib.context import CryptContext
 
 from app.db.database import get_db
+from app.db.pagination import Keyset, paginate
+from app.db.repository import get_or_404, select_filtered
+from app.db.instrumentation import query_budget
+from app.db.timeouts import statement_timeout
 from app.models.user import User
 from app.schemas.user import User as UserSchema, UserCreate, UserUpdate
-from app.api.endpoints.auth import get_current_user
+from app.core.principal import Principal
+from app.core.security import hash_password
+from app.api.endpoints.auth import get_current_principal
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 @router.get("/", response_model=List[UserSchema])
+@query_budget(2)
+@statement_timeout("list")
 async def get_users(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     user_type: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get all users"""
-    query = db.query(User)
+    query = select_filtered(User, user_type=user_type)
     
-    if user_type:
-        query = query.filter(User.user_type == user_type)
-    
-    users = query.offset(skip).limit(limit).all()
+    users = await paginate(db, query, Keyset(User.id), request, response, skip, limit, cursor)
     return users
 
 @router.get("/{user_id}", response_model=UserSchema)
 async def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get user by ID"""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = await get_or_404(db, User, user_id, "User not found")
     return user
 
 @router.post("/", response_model=UserSchema)
 async def create_user(
     user: UserCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Create a new user"""
     # Only admins can create users
@@ -52,12 +57,13 @@ async def create_user(
         raise HTTPException(status_code=403, detail="Not authorized to create users")
     
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user.email).first()
+    result = await db.execute(select(User).where(User.email == user.email))
+    existing_user = result.scalar_one_or_none()
     if existing_user:
         raise HTTPException(status_code=400, detail="User with this email already exists")
     
     # Hash password
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = await hash_password(user.password)
     
     # Create user
     db_user = User(
@@ -71,49 +77,45 @@ async def create_user(
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.put("/{user_id}", response_model=UserSchema)
 async def update_user(
     user_id: int,
     user_update: UserUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Update user by ID"""
     # Only admins or the user themselves can update
     if current_user.user_type.value != "admin" and current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to update this user")
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = await get_or_404(db, User, user_id, "User not found")
     
     for field, value in user_update.dict(exclude_unset=True).items():
         setattr(user, field, value)
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 @router.delete("/{user_id}")
 async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Delete user by ID"""
     # Only admins can delete users
     if current_user.user_type.value != "admin":
         raise HTTPException(status_code=403, detail="Not authorized to delete users")
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = await get_or_404(db, User, user_id, "User not found")
     
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
     
     return {"message": "User deleted successfully"}
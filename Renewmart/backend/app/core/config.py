@@ -9,6 +9,85 @@ class Settings(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     
+    # Database connection pool
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30.0  # seconds to wait for a pooled connection
+    db_pool_pre_ping: bool = True
+    db_pool_recycle: int = 1800  # seconds before a connection is replaced
+    
+    # Read replicas (comma-separated URLs); empty sends every query to the primary
+    database_replica_urls: str = ""
+    replica_max_lag_seconds: float = 5.0
+    replica_lag_check_interval: float = 5.0
+    
+    # Query instrumentation
+    slow_query_threshold_ms: float = 200.0
+    
+    # Statement timeouts (milliseconds) by route class; 0 disables
+    statement_timeout_detail_ms: int = 2000
+    statement_timeout_list_ms: int = 5000
+    statement_timeout_report_ms: int = 30000
+    
+    # Authenticated-user cache (per process); 0 disables
+    principal_cache_size: int = 10000
+    principal_cache_ttl_seconds: float = 60.0
+    
+    # Password hashing: bcrypt work factor and the worker pool running it
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 4
+    password_hash_max_pending: int = 64  # queued hashes beyond this answer 503
+    
+    # Sliding-window throttling of sign-in endpoints; 0 disables a limit
+    rate_limit_backend: str = ""  # "module:factory" of a shared backend; empty counts per process
+    login_attempts_per_ip: int = 20
+    login_attempts_per_account: int = 10
+    login_window_seconds: int = 300
+    password_reset_requests_per_ip: int = 5
+    password_reset_requests_per_account: int = 3
+    password_reset_window_seconds: int = 3600
+    
+    # Revoked access tokens: Bloom filter sizing and rebuild/prune interval
+    revocation_bloom_capacity: int = 100000
+    revocation_refresh_seconds: float = 30.0
+    
+    # Lifetime of rotating refresh tokens
+    refresh_token_expire_days: int = 30
+    
+    # Email outbox sender; EMAIL_TRANSPORT=memory keeps messages in process instead of using SMTP
+    email_transport: str = "smtp"
+    email_batch_size: int = 50
+    email_poll_seconds: float = 5.0
+    email_max_attempts: int = 8
+    email_retry_base_seconds: float = 30.0
+    email_retry_max_seconds: float = 3600.0
+    
+    # Notification delivery worker
+    run_delivery_workers: bool = True  # false when running python -m app.services.notification_delivery instead
+    notification_batch_size: int = 100
+    notification_poll_seconds: float = 5.0
+    notification_retry_base_seconds: float = 60.0
+    notification_retry_max_seconds: float = 3600.0
+    notification_job_chunk_size: int = 1000  # recipients inserted per transaction by bulk send jobs
+    
+    # Digests: notifications of one type about one entity within the window
+    # are merged into one row, delivered when the window closes
+    notification_digest_window_seconds: int = 300  # default for users without a preference; 0 disables
+    notification_digest_max_items: int = 20  # events listed in a digest's message
+    
+    # Monthly partitions of notifications: created ahead, archived once past retention
+    notification_partitions_ahead: int = 3
+    notification_retention_months: int = 12  # 0 keeps every partition
+    notification_archive_dir: str = "archives/notifications"
+    notification_partition_check_seconds: float = 3600.0
+
+    # Server-sent notification streams
+    notification_stream_heartbeat_seconds: float = 15.0
+    notification_stream_reconnect_seconds: float = 5.0  # LISTEN connection retry interval
+    # Changes are re-read this far back, so one committed late by a transaction
+    # that started earlier is still sent; longer than any notification write
+    notification_stream_lookback_seconds: float = 30.0
+    
     class Config:
         env_file = None  # Disable .env file loading
 
@@ -0,0 +1,61 @@
+from dataclasses import dataclass
+from sqlalchemy import event, inspect
+
+from app.models.user import User, UserType
+
+# Changing any of these invalidates every token issued to the user
+TOKEN_BOUND_ATTRIBUTES = ("email", "user_type", "is_active", "hashed_password")
+
+@dataclass(frozen=True)
+class Principal:
+    """The caller as described by the claims of their access token.
+
+    Carries what authorization checks need (id, user_type, is_active) so
+    endpoints that only check roles or ownership never load the User row.
+    """
+    id: int
+    email: str
+    user_type: UserType
+    is_active: bool
+    token_version: int
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            user_type=user.user_type,
+            is_active=user.is_active,
+            token_version=user.token_version or 0
+        )
+
+    @classmethod
+    def from_claims(cls, payload: dict) -> "Principal":
+        """Build a principal from a decoded token; raises KeyError or ValueError
+        when a claim is missing or malformed"""
+        return cls(
+            id=int(payload["uid"]),
+            email=payload["sub"],
+            user_type=UserType(payload["user_type"]),
+            is_active=bool(payload["active"]),
+            token_version=int(payload["ver"])
+        )
+
+    def claims(self) -> dict:
+        return {
+            "sub": self.email,
+            "uid": self.id,
+            "user_type": self.user_type.value,
+            "active": self.is_active,
+            "ver": self.token_version,
+        }
+
+def token_claims(user: User) -> dict:
+    """Claims of an access token issued to user"""
+    return Principal.from_user(user).claims()
+
+@event.listens_for(User, "before_update")
+def _bump_token_version(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in TOKEN_BOUND_ATTRIBUTES):
+        target.token_version = (target.token_version or 0) + 1
@@ -0,0 +1,158 @@
+from collections import OrderedDict
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+from threading import Lock
+from typing import Optional, Set
+import time
+
+from app.core.config import settings
+from app.db.routing import primary_reads
+from app.models.user import User
+
+class PrincipalCache:
+    """Bounded LRU cache of authenticated users keyed by access token.
+
+    Entries expire after ttl_seconds or when the token itself expires,
+    whichever comes first. Cached users are detached snapshots; callers merge
+    them into their session with load=False, which costs no query.
+
+    Entries for a user are dropped as soon as a transaction that updates or
+    deletes that user commits (profile edits, deactivation, password resets).
+    The cache is per process, so other workers notice such changes within
+    ttl_seconds at the latest.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, token: str) -> Optional[User]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return user
+
+    def put(self, token: str, user: User, token_expires_at: Optional[float] = None):
+        if self.max_size <= 0 or self.ttl_seconds <= 0:
+            return
+        lifetime = self.ttl_seconds
+        if token_expires_at is not None:
+            lifetime = min(lifetime, token_expires_at - time.time())
+        if lifetime <= 0:
+            return
+
+        snapshot = User(**{attr.key: getattr(user, attr.key) for attr in User.__mapper__.column_attrs})
+        make_transient_to_detached(snapshot)
+
+        with self._lock:
+            self._entries[token] = (snapshot, time.monotonic() + lifetime)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_users(self, user_ids: Set[int]):
+        with self._lock:
+            for token in [token for token, (user, _) in self._entries.items() if user.id in user_ids]:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class TokenVersionCache:
+    """Current token_version of users, so claims-based tokens can be checked
+    for revocation without reading the users table on every request.
+
+    Same bounds and invalidation as PrincipalCache: a revocation committed by
+    this process takes effect immediately, other workers see it within
+    ttl_seconds.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = Lock()
+
+    def _cached(self, user_id: int):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry
+
+    def _remember(self, user_id: int, version: Optional[int]):
+        if self.max_size <= 0 or self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (version, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    async def is_current(self, db: AsyncSession, user_id: int, token_version: int) -> bool:
+        """Whether a token with this version is still valid for the user"""
+        entry = self._cached(user_id)
+        if entry is not None:
+            version = entry[0]
+        else:
+            # Read on the primary: a replica may not have the bumped version yet
+            with primary_reads(db):
+                result = await db.execute(select(User.token_version).where(User.id == user_id))
+                row = result.first()
+            # None marks a deleted user
+            version = (row[0] or 0) if row is not None else None
+            self._remember(user_id, version)
+        return version is not None and version == token_version
+
+    def invalidate_users(self, user_ids: Set[int]):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+principal_cache = PrincipalCache(
+    max_size=settings.principal_cache_size,
+    ttl_seconds=settings.principal_cache_ttl_seconds
+)
+
+token_versions = TokenVersionCache(
+    max_size=settings.principal_cache_size,
+    ttl_seconds=settings.principal_cache_ttl_seconds
+)
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    changed = {
+        instance.id for instance in list(session.dirty) + list(session.deleted)
+        if isinstance(instance, User) and instance.id is not None
+    }
+    if changed:
+        session.info.setdefault("changed_user_ids", set()).update(changed)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    changed = session.info.pop("changed_user_ids", None)
+    if changed:
+        principal_cache.invalidate_users(changed)
+        token_versions.invalidate_users(changed)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session):
+    session.info.pop("changed_user_ids", None)
@@ -0,0 +1,150 @@
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from fastapi import HTTPException, Request, status
+from importlib import import_module
+from typing import Optional
+import logging
+import math
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class RateLimitBackend(ABC):
+    """Storage for sliding-window counters.
+
+    The default MemoryBackend counts per process. Multi-worker deployments
+    can plug in a shared store (e.g. Redis INCR + EXPIRE on the two window
+    keys) through the RATE_LIMIT_BACKEND setting.
+    """
+
+    @abstractmethod
+    async def hit(self, key: str, window_seconds: int, now: float) -> float:
+        """Record one event and return the sliding-window estimate of events
+        in the last window_seconds, including this one"""
+
+class MemoryBackend(RateLimitBackend):
+    """Sliding-window counters kept in process, evicting the least recently
+    used keys beyond max_keys"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # key -> [window index, events in that window, events in the one before]
+        self._windows: "OrderedDict[str, list]" = OrderedDict()
+
+    async def hit(self, key: str, window_seconds: int, now: float) -> float:
+        index, offset = divmod(now, window_seconds)
+        entry = self._windows.get(key)
+        if entry is None or entry[0] < index - 1:
+            entry = [index, 0, 0]
+        elif entry[0] == index - 1:
+            entry = [index, 0, entry[1]]
+        entry[1] += 1
+
+        self._windows[key] = entry
+        self._windows.move_to_end(key)
+        while len(self._windows) > self.max_keys:
+            self._windows.popitem(last=False)
+
+        # The previous window counts in proportion to how much of it still
+        # overlaps the sliding window
+        return entry[2] * (1 - offset / window_seconds) + entry[1]
+
+_backend: Optional[RateLimitBackend] = None
+
+def get_backend() -> RateLimitBackend:
+    """The configured backend: RATE_LIMIT_BACKEND ("module:factory") or in process"""
+    global _backend
+    if _backend is None:
+        if settings.rate_limit_backend:
+            module_name, _, factory = settings.rate_limit_backend.partition(":")
+            _backend = getattr(import_module(module_name), factory)()
+        else:
+            _backend = MemoryBackend()
+    return _backend
+
+def set_backend(backend: Optional[RateLimitBackend]):
+    global _backend
+    _backend = backend
+
+# Rejected requests by (limiter, key kind), e.g. ("login", "ip")
+rejections: Counter = Counter()
+
+def rate_limit_status() -> dict:
+    return {
+        "backend": type(get_backend()).__name__,
+        "rejections": [
+            {"limiter": name, "key": kind, "count": count}
+            for (name, kind), count in sorted(rejections.items())
+        ]
+    }
+
+class RateLimit:
+    """Route dependency throttling a sensitive endpoint per client IP and per account.
+
+    Declared in the route's dependencies, so it runs before the endpoint's
+    own dependencies: rejected requests never open a DB session or reach
+    bcrypt. account_field names the form or JSON body field identifying the
+    account (FastAPI has already parsed the body, so reading it is free).
+    A limit of 0 disables that key.
+    """
+
+    def __init__(self, name: str, per_ip: int, per_account: int, window_seconds: int, account_field: Optional[str] = None):
+        self.name = name
+        self.per_ip = per_ip
+        self.per_account = per_account
+        self.window_seconds = window_seconds
+        self.account_field = account_field
+
+    async def _account(self, request: Request) -> Optional[str]:
+        if self.account_field is None:
+            return None
+        if request.headers.get("content-type", "").startswith("application/json"):
+            body = await request.json()
+            value = body.get(self.account_field) if isinstance(body, dict) else None
+        else:
+            value = (await request.form()).get(self.account_field)
+        return value.strip().lower() if isinstance(value, str) and value.strip() else None
+
+    async def __call__(self, request: Request):
+        now = time.time()
+        keys = [("ip", request.client.host if request.client else "unknown", self.per_ip)]
+        account = await self._account(request)
+        if account is not None:
+            keys.append(("account", account, self.per_account))
+
+        for kind, value, limit in keys:
+            if limit <= 0:
+                continue
+            try:
+                count = await get_backend().hit(f"{self.name}:{kind}:{value}", self.window_seconds, now)
+            except Exception:
+                # Fail open: a broken shared store must not lock everyone out
+                logger.exception("Rate limit backend failed for %s", self.name)
+                return
+            if count > limit:
+                rejections[(self.name, kind)] += 1
+                logger.warning("Rate limited %s by %s %s (%.0f in %ds)", self.name, kind, value, count, self.window_seconds)
+                retry_after = math.ceil(self.window_seconds - now % self.window_seconds)
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many attempts, please try again later",
+                    headers={"Retry-After": str(retry_after)}
+                )
+
+login_rate_limit = RateLimit(
+    "login",
+    per_ip=settings.login_attempts_per_ip,
+    per_account=settings.login_attempts_per_account,
+    window_seconds=settings.login_window_seconds,
+    account_field="username"
+)
+
+password_reset_rate_limit = RateLimit(
+    "password_reset",
+    per_ip=settings.password_reset_requests_per_ip,
+    per_account=settings.password_reset_requests_per_account,
+    window_seconds=settings.password_reset_window_seconds,
+    account_field="email"
+)
@@ -0,0 +1,117 @@
+from datetime import datetime, timezone
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Iterable, List, Optional
+import asyncio
+import hashlib
+import logging
+import math
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.db.routing import primary_reads
+from app.models.user import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings: no false negatives, roughly
+    error_rate false positives once capacity items have been added"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class RevocationList:
+    """Revoked access tokens (by jti), stored in revoked_tokens and fronted by
+    a Bloom filter.
+
+    Checking a token costs a hash unless the filter reports a probable hit,
+    in which case one primary-key lookup confirms it. Revocations made by this
+    process are visible immediately; the filter is rebuilt from the table
+    every refresh_interval seconds to pick up other workers' revocations,
+    and expired rows are pruned on the same schedule.
+    """
+
+    def __init__(self, capacity: int, refresh_interval: float):
+        self.capacity = capacity
+        self.refresh_interval = refresh_interval
+        # None until the first refresh: every check goes to the table meanwhile
+        self._filter: Optional[BloomFilter] = None
+        self._revoked_since_refresh: List[str] = []
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def _rebuild(self, jtis: Iterable[str], count: int):
+        # Grow instead of degrading once the table outgrows the filter
+        bloom = BloomFilter(max(self.capacity, 2 * count))
+        for jti in jtis:
+            bloom.add(jti)
+        self._filter = bloom
+
+    async def is_revoked(self, db: AsyncSession, jti: str) -> bool:
+        if self._filter is not None and jti not in self._filter:
+            return False
+        # Read on the primary: a replica may not have the revocation yet
+        with primary_reads(db):
+            return await db.get(RevokedToken, jti) is not None
+
+    async def revoke(self, db: AsyncSession, jti: str, user_id: Optional[int], expires_at: datetime):
+        """Revoke a token; commits the session"""
+        if await db.get(RevokedToken, jti) is None:
+            db.add(RevokedToken(jti=jti, user_id=user_id, expires_at=expires_at))
+            await db.commit()
+        if self._filter is not None:
+            self._filter.add(jti)
+        self._revoked_since_refresh.append(jti)
+
+    async def refresh(self):
+        """Prune expired rows and rebuild the filter from the table"""
+        self._revoked_since_refresh = []
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(RevokedToken).where(RevokedToken.expires_at < datetime.now(timezone.utc)))
+            await db.commit()
+            jtis = (await db.scalars(select(RevokedToken.jti))).all()
+        # Revocations committed while the table was being read may be missing
+        self._rebuild(list(jtis) + self._revoked_since_refresh, len(jtis))
+
+    async def _refresh_periodically(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                # Keep the current filter; it already holds every local revocation
+                logger.warning("Revocation list refresh failed: %s", e)
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+revocation_list = RevocationList(
+    capacity=settings.revocation_bloom_capacity,
+    refresh_interval=settings.revocation_refresh_seconds
+)
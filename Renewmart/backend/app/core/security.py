@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from typing import Optional, Tuple
+import asyncio
+import functools
+
+from app.core.config import settings
+
+# Hashes with a different work factor are upgraded on the next successful login
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
+
+# bcrypt releases the GIL, so a few threads hash in parallel without
+# blocking the event loop
+_executor = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="password-hash")
+_pending = 0
+
+async def _run(func, *args):
+    """Run a hashing call on the password pool, shedding load once
+    password_hash_max_pending calls are already queued or running"""
+    global _pending
+    if _pending >= settings.password_hash_max_pending:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent sign-ins, please retry",
+            headers={"Retry-After": "1"}
+        )
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, functools.partial(func, *args))
+    finally:
+        _pending -= 1
+
+async def hash_password(password: str) -> str:
+    """Hash a password"""
+    return await _run(pwd_context.hash, password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash"""
+    return await _run(pwd_context.verify, plain_password, hashed_password)
+
+async def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password; on success also return a new hash when the stored one
+    uses outdated parameters, else None"""
+    return await _run(pwd_context.verify_and_update, plain_password, hashed_password)
@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Tuple
+import hashlib
+import logging
+import secrets
+
+from app.core.config import settings
+from app.db.repository import get_by_id
+from app.models.user import User, UserSession
+
+logger = logging.getLogger(__name__)
+
+def hash_refresh_token(token: str) -> str:
+    # Refresh tokens are 256 random bits, so a fast unsalted hash is enough
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+def invalid_refresh_token() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def _new_session(user: User, family_id: str) -> Tuple[UserSession, str]:
+    token = secrets.token_urlsafe(32)
+    session = UserSession(
+        user_id=user.id,
+        family_id=family_id,
+        token_hash=hash_refresh_token(token),
+        token_version=user.token_version or 0,
+        expires_at=datetime.now(timezone.utc) + timedelta(days=settings.refresh_token_expire_days)
+    )
+    return session, token
+
+async def start_session(db: AsyncSession, user: User) -> str:
+    """Open a refresh session for a freshly authenticated user and return its
+    refresh token; commits the session. Expired sessions of the user are
+    dropped on the way."""
+    await db.execute(
+        delete(UserSession).where(
+            UserSession.user_id == user.id,
+            UserSession.expires_at < datetime.now(timezone.utc)
+        )
+    )
+    session, token = _new_session(user, family_id=secrets.token_hex(16))
+    db.add(session)
+    await db.commit()
+    return token
+
+async def _find(db: AsyncSession, token: str, for_update: bool = False) -> Optional[UserSession]:
+    query = select(UserSession).where(UserSession.token_hash == hash_refresh_token(token))
+    if for_update:
+        # Serializes concurrent refreshes of the same token
+        query = query.with_for_update()
+    result = await db.execute(query)
+    return result.scalar_one_or_none()
+
+async def _revoke_family(db: AsyncSession, family_id: str):
+    await db.execute(
+        update(UserSession)
+        .where(UserSession.family_id == family_id, UserSession.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+    )
+    await db.commit()
+
+async def rotate_session(db: AsyncSession, token: str) -> Tuple[User, str]:
+    """Exchange a refresh token for a new one and return the user it belongs to.
+
+    A token can be used once. Presenting an already rotated token means it
+    leaked (or a client retried a refresh it had lost the answer to): the
+    whole session family is revoked and the user has to log in again.
+    Sessions issued before the user's token_version changed are rejected.
+    """
+    session = await _find(db, token, for_update=True)
+    if session is None or session.revoked_at is not None:
+        raise invalid_refresh_token()
+    if session.rotated_at is not None:
+        logger.warning("Refresh token reuse for user %s, revoking session family %s", session.user_id, session.family_id)
+        await _revoke_family(db, session.family_id)
+        raise invalid_refresh_token()
+    if _as_utc(session.expires_at) <= datetime.now(timezone.utc):
+        raise invalid_refresh_token()
+
+    user = await get_by_id(db, User, session.user_id)
+    if user is None or (user.token_version or 0) != session.token_version:
+        raise invalid_refresh_token()
+
+    session.rotated_at = datetime.now(timezone.utc)
+    new_session, new_token = _new_session(user, session.family_id)
+    db.add(new_session)
+    await db.commit()
+    return user, new_token
+
+async def end_session(db: AsyncSession, token: str):
+    """Revoke the session family of a refresh token, if it exists"""
+    session = await _find(db, token)
+    if session is not None:
+        await _revoke_family(db, session.family_id)
@@ -0,0 +1,74 @@
+from sqlalchemy import event, inspect, lambda_stmt, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+class EntityCache:
+    """Primary-key lookups for one request, shared by every endpoint and helper.
+
+    Rows come from the request session's identity map whenever they were
+    already loaded earlier in the request, ids that turned out not to exist
+    are remembered until the next flush, and bulk_get fetches everything
+    still missing with a single IN query.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self._missing: Set[Tuple[type, Any]] = set()
+
+    def _loaded(self, model, id):
+        instance = self.db.sync_session.identity_map.get(identity_key(model, id))
+        # Expired attributes would need a lazy load, which async sessions cannot do
+        if instance is not None and not inspect(instance).expired_attributes:
+            return instance
+        return None
+
+    async def get(self, model, id) -> Optional[Any]:
+        if id is None or (model, id) in self._missing:
+            return None
+        instance = await self.db.get(model, id)
+        if instance is None:
+            self._missing.add((model, id))
+        return instance
+
+    async def bulk_get(self, model, ids: Iterable[Any]) -> Dict[Any, Any]:
+        found = {}
+        to_load = []
+        for id in dict.fromkeys(ids):
+            if id is None or (model, id) in self._missing:
+                continue
+            instance = self._loaded(model, id)
+            if instance is not None:
+                found[id] = instance
+            else:
+                to_load.append(id)
+
+        if to_load:
+            # A lambda statement: SQL and cache key are built once per model,
+            # the ids are bound as an expanding IN parameter
+            primary_key = model.__mapper__.primary_key[0]
+            stmt = lambda_stmt(lambda: select(model))
+            stmt += lambda s: s.where(primary_key.in_(to_load))
+            result = await self.db.execute(stmt)
+            for instance in result.scalars():
+                found[getattr(instance, primary_key.key)] = instance
+            self._missing.update((model, id) for id in to_load if id not in found)
+        return found
+
+    def clear_missing(self):
+        self._missing.clear()
+
+def entity_cache(db: AsyncSession) -> EntityCache:
+    """The EntityCache of a request session, created on first use"""
+    cache = db.info.get("entity_cache")
+    if cache is None:
+        cache = db.info["entity_cache"] = EntityCache(db)
+    return cache
+
+@event.listens_for(Session, "after_flush")
+def _forget_missing_after_flush(session, flush_context):
+    # A flush may have inserted rows for ids that were missing before
+    cache = session.info.get("entity_cache")
+    if cache is not None:
+        cache.clear_missing()
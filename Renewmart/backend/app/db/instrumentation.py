@@ -0,0 +1,114 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from typing import List, Optional
+import logging
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class QueryStats:
+    """Statements executed while serving one request (or inside a test block)"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.statements: List[str] = []
+
+    def record(self, statement: str, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.statements.append(statement)
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start_time"].pop()) * 1000
+
+    stats = _current_stats.get()
+    if stats is not None and (context is None or context.execution_options.get("query_stats", True)):
+        stats.record(statement, elapsed_ms)
+
+    if elapsed_ms >= settings.slow_query_threshold_ms:
+        logger.warning("Slow query (%.1f ms): %s; parameters=%r", elapsed_ms, statement, parameters)
+
+def instrument_engine(engine):
+    """Attach query counting and slow-query logging to a (sync) Engine"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+class QueryStatsMiddleware:
+    """ASGI middleware counting statements and DB time per request.
+
+    In debug mode the totals are returned as X-DB-Query-Count / X-DB-Time (ms)
+    headers, and requests exceeding their endpoint's declared query budget are logged.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and settings.debug:
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-query-count", str(stats.count).encode()))
+                headers.append((b"x-db-time", f"{stats.total_ms:.2f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current_stats.reset(token)
+            budget = getattr(scope.get("endpoint"), "query_budget", None)
+            if settings.debug and budget is not None and stats.count > budget:
+                logger.warning(
+                    "%s %s issued %d queries (budget %d)",
+                    scope["method"], scope["path"], stats.count, budget
+                )
+
+def query_budget(max_queries: int):
+    """Declare the maximum number of statements an endpoint may issue per request"""
+    def decorator(func):
+        func.query_budget = max_queries
+        return func
+    return decorator
+
+@contextmanager
+def capture_queries():
+    """Collect the statements executed inside the block"""
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+@contextmanager
+def assert_query_budget(endpoint_or_max):
+    """Test helper: fail if the block issues more queries than the endpoint's declared budget"""
+    if isinstance(endpoint_or_max, int):
+        max_queries, name = endpoint_or_max, "block"
+    else:
+        max_queries, name = endpoint_or_max.query_budget, endpoint_or_max.__name__
+
+    with capture_queries() as stats:
+        yield stats
+
+    if stats.count > max_queries:
+        raise AssertionError(
+            f"{name} issued {stats.count} queries, budget is {max_queries}:\n"
+            + "\n".join(stats.statements)
+        )
@@ -0,0 +1,85 @@
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import Any, List, Optional
+import base64
+import json
+
+class Keyset:
+    """Ordering used for keyset pagination, e.g. Keyset(Model.created_at, Model.id, descending=True).
+
+    The last column must be unique so every row has a distinct position.
+    """
+
+    def __init__(self, *columns, descending: bool = False):
+        self.columns = columns
+        self.descending = descending
+
+    def order_by(self) -> list:
+        return [column.desc() if self.descending else column.asc() for column in self.columns]
+
+    def after(self, values: List[Any]):
+        """Filter for rows positioned after the given key values"""
+        if len(self.columns) == 1:
+            left, right = self.columns[0], values[0]
+        else:
+            left, right = tuple_(*self.columns), tuple_(*values)
+        return left < right if self.descending else left > right
+
+    def key_of(self, row) -> List[Any]:
+        return [getattr(row, column.key) for column in self.columns]
+
+    def encode(self, values: List[Any]) -> str:
+        payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode(self, cursor: str) -> List[Any]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            payload = json.loads(raw)
+            if not isinstance(payload, list) or len(payload) != len(self.columns):
+                raise ValueError("cursor does not match the ordering")
+            return [
+                datetime.fromisoformat(value) if column.type.python_type is datetime else value
+                for column, value in zip(self.columns, payload)
+            ]
+        except (ValueError, TypeError, NotImplementedError):
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+async def paginate(
+    db: AsyncSession,
+    query,
+    keyset: Keyset,
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> list:
+    """Run a list query one page at a time.
+
+    With a cursor the page starts right after the cursor position (keyset
+    pagination), so deep pages cost the same as the first one. Without a cursor
+    the legacy skip/offset behaviour is kept. When another page exists its cursor
+    is returned in the X-Next-Cursor header and as a Link rel="next" URL.
+    """
+    query = query.order_by(*keyset.order_by())
+    if cursor:
+        query = query.where(keyset.after(keyset.decode(cursor)))
+    elif skip:
+        query = query.offset(skip)
+
+    # Fetch one extra row to learn whether there is a next page
+    result = await db.execute(query.limit(limit + 1))
+    rows = result.scalars().all()
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+
+    if has_next and rows:
+        next_cursor = keyset.encode(keyset.key_of(rows[-1]))
+        next_url = request.url.remove_query_params("skip").include_query_params(cursor=next_cursor)
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return rows
@@ -0,0 +1,84 @@
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from typing import List
+import time
+
+# Upper bounds (milliseconds) of the checkout wait-time histogram buckets
+CHECKOUT_WAIT_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is the +Inf bucket
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def snapshot(self) -> dict:
+        bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+        return {
+            "count": self.count,
+            "sum": round(self.total, 3),
+            "max": round(self.max, 3),
+            "buckets": [{"le": bound, "count": count} for bound, count in zip(bounds, self.counts)]
+        }
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long each checkout waits"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_wait_ms = Histogram(CHECKOUT_WAIT_BUCKETS_MS)
+        self.checkout_timeouts = 0
+
+    def connect(self):
+        # Covers queue wait, new connection setup and pre-ping
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.checkout_timeouts += 1
+            raise
+        finally:
+            self.checkout_wait_ms.observe((time.perf_counter() - start) * 1000)
+
+    def recreate(self):
+        # Keep the collected metrics when the pool is recreated (e.g. after a failover)
+        pool = super().recreate()
+        pool.checkout_wait_ms = self.checkout_wait_ms
+        pool.checkout_timeouts = self.checkout_timeouts
+        return pool
+
+def pool_status(engine) -> dict:
+    """Live connection counts and checkout metrics for an engine's pool"""
+    pool = getattr(engine, "sync_engine", engine).pool
+    status = {"pool_class": type(pool).__name__}
+
+    if hasattr(pool, "checkedout"):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            # overflow() is negative while fewer than pool_size connections are open
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+        })
+    if isinstance(pool, InstrumentedAsyncQueuePool):
+        status.update({
+            "checkout_timeouts": pool.checkout_timeouts,
+            "checkout_wait_ms": pool.checkout_wait_ms.snapshot(),
+        })
+    return status
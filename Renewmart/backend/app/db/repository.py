@@ -0,0 +1,38 @@
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, Iterable, List, Optional, Type, TypeVar
+
+from app.db.entity_cache import entity_cache
+
+ModelT = TypeVar("ModelT")
+
+async def get_by_id(db: AsyncSession, model: Type[ModelT], id: Any) -> Optional[ModelT]:
+    """Load a row by primary key through the request's entity cache, or None"""
+    return await entity_cache(db).get(model, id)
+
+async def get_or_404(db: AsyncSession, model: Type[ModelT], id: Any, detail: Optional[str] = None, **scope) -> ModelT:
+    """Load a row by primary key or raise a 404.
+
+    Keyword arguments scope the lookup, e.g. user_id=current_user.id; a row
+    whose attributes do not match is treated as missing. Rows already loaded
+    in this request are returned without a query.
+    """
+    instance = await get_by_id(db, model, id)
+    if instance is None or any(getattr(instance, name) != value for name, value in scope.items()):
+        raise HTTPException(status_code=404, detail=detail or f"{model.__name__} not found")
+    return instance
+
+def select_filtered(model: Type[ModelT], **filters):
+    """select(model) with an equality filter for every non-None keyword"""
+    return select(model).filter_by(**{name: value for name, value in filters.items() if value is not None})
+
+async def list_filtered(db: AsyncSession, model: Type[ModelT], **filters) -> List[ModelT]:
+    """All rows of model matching the non-None equality filters"""
+    result = await db.execute(select_filtered(model, **filters))
+    return result.scalars().all()
+
+async def bulk_get(db: AsyncSession, model: Type[ModelT], ids: Iterable[Any]) -> Dict[Any, ModelT]:
+    """Load rows by primary key; rows not yet loaded in this request are fetched
+    with one IN query. Missing ids are left out."""
+    return await entity_cache(db).bulk_get(model, ids)
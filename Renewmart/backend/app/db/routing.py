@@ -0,0 +1,122 @@
+from contextlib import contextmanager
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+from typing import List, Optional
+import asyncio
+import itertools
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind the primary; 0 when it has replayed everything it received
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+class Replica:
+    def __init__(self, engine):
+        self.engine = engine
+        self.healthy = False  # until the first lag check succeeds
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+class ReplicaSet:
+    """Read replicas with periodic lag checks; lagging or unreachable replicas are skipped"""
+
+    def __init__(self, engines: List, max_lag_seconds: float, check_interval: float):
+        self.replicas = [Replica(engine) for engine in engines]
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self._cycle = itertools.cycle(self.replicas) if self.replicas else None
+        self._monitor_task: Optional[asyncio.Task] = None
+
+    def choose(self):
+        """Round-robin over healthy replicas; returns a sync Engine or None"""
+        for _ in range(len(self.replicas)):
+            replica = next(self._cycle)
+            if replica.healthy:
+                return replica.engine.sync_engine
+        return None
+
+    async def check_lag(self):
+        for replica in self.replicas:
+            try:
+                async with replica.engine.connect() as conn:
+                    lag = await conn.scalar(REPLICA_LAG_SQL)
+                replica.lag_seconds = float(lag)
+                replica.healthy = replica.lag_seconds <= self.max_lag_seconds
+                replica.last_error = None
+            except Exception as e:
+                replica.healthy = False
+                replica.lag_seconds = None
+                replica.last_error = str(e)
+                logger.warning("Replica %s unavailable: %s", replica.engine.url.host, e)
+
+    async def _monitor(self):
+        while True:
+            await self.check_lag()
+            await asyncio.sleep(self.check_interval)
+
+    def start(self):
+        if self.replicas and self._monitor_task is None:
+            self._monitor_task = asyncio.create_task(self._monitor())
+
+    async def stop(self):
+        if self._monitor_task is not None:
+            self._monitor_task.cancel()
+            try:
+                await self._monitor_task
+            except asyncio.CancelledError:
+                pass
+            self._monitor_task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def status(self) -> List[dict]:
+        return [
+            {
+                "host": replica.engine.url.host,
+                "healthy": replica.healthy,
+                "lag_seconds": replica.lag_seconds,
+                "last_error": replica.last_error
+            }
+            for replica in self.replicas
+        ]
+
+def _is_read(clause) -> bool:
+    return isinstance(clause, Select) and clause._for_update_arg is None
+
+class RoutingSession(Session):
+    """Session that sends reads to a replica when the request allows it.
+
+    Flushes, DML and locking selects go to the primary, and once a session has
+    written it stays on the primary so it reads its own writes.
+    """
+
+    replica_set: Optional[ReplicaSet] = None
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or not _is_read(clause):
+            self.info["use_primary"] = True
+        if (self.replica_set is not None and self.info.get("allow_replica")
+                and not self.info.get("use_primary")):
+            replica = self.replica_set.choose()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+@contextmanager
+def primary_reads(db):
+    """Send the block's reads to the primary even where the request allows a
+    replica; for security checks that must not trail a revocation"""
+    allow_replica = db.info.pop("allow_replica", None)
+    try:
+        yield db
+    finally:
+        if allow_replica is not None:
+            db.info["allow_replica"] = allow_replica
@@ -0,0 +1,47 @@
+from fastapi import HTTPException
+from sqlalchemy import func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+def _escape_like(term: str) -> str:
+    return term.replace("/", "//").replace("%", "/%").replace("_", "/_")
+
+def fuzzy_match(column, term: str):
+    """Case-insensitive substring or trigram-similar match on a text column.
+
+    Both branches are served by a pg_trgm GIN index (gin_trgm_ops) on the
+    column, so this never needs a sequential scan. The similarity branch uses
+    pg_trgm.similarity_threshold (0.3 by default) and tolerates typos.
+    """
+    return or_(
+        column.ilike(f"%{_escape_like(term)}%", escape="/"),
+        column.op("%")(term)
+    )
+
+def by_similarity(column, term: str) -> list:
+    """ORDER BY clauses ranking the closest matches first"""
+    return [func.similarity(column, term).desc(), column]
+
+def fuzzy_search(query, column, term: str):
+    """Filter a select with fuzzy_match and rank the results by similarity"""
+    return query.where(fuzzy_match(column, term)).order_by(*by_similarity(column, term))
+
+async def ranked_page(
+    db: AsyncSession,
+    query,
+    column,
+    term: str,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> list:
+    """One page of fuzzy_search results, best match first.
+
+    Similarity ranks are not a stable position to resume from, so ranked
+    results are paged with skip/limit; list endpoints keep their keyset
+    cursors for unranked listing only.
+    """
+    if cursor:
+        raise HTTPException(status_code=400, detail="Cursors cannot be combined with search; page with skip")
+    result = await db.execute(fuzzy_search(query, column, term).offset(skip).limit(limit))
+    return result.scalars().all()
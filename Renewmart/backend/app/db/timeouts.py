@@ -0,0 +1,111 @@
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import event, exc
+from sqlalchemy.orm import Session
+from typing import Optional, Union
+import asyncio
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE of a statement cancelled by statement_timeout or a cancel request
+QUERY_CANCELED = "57014"
+
+def route_class_timeouts() -> dict:
+    return {
+        "detail": settings.statement_timeout_detail_ms,
+        "list": settings.statement_timeout_list_ms,
+        "report": settings.statement_timeout_report_ms,
+    }
+
+def statement_timeout(route_class_or_ms: Union[str, int]):
+    """Declare an endpoint's statement timeout: a route class ("detail", "list",
+    "report") or milliseconds. Undeclared endpoints get the "detail" timeout."""
+    if isinstance(route_class_or_ms, str) and route_class_or_ms not in route_class_timeouts():
+        raise ValueError(f"Unknown route class {route_class_or_ms!r}")
+
+    def decorator(func):
+        func.statement_timeout = route_class_or_ms
+        return func
+    return decorator
+
+def timeout_for_scope(scope) -> Optional[int]:
+    """Statement timeout in milliseconds for the endpoint serving a request"""
+    declared = getattr(scope.get("endpoint"), "statement_timeout", "detail")
+    timeout_ms = route_class_timeouts()[declared] if isinstance(declared, str) else declared
+    return int(timeout_ms) if timeout_ms else None
+
+@event.listens_for(Session, "after_begin")
+def _set_statement_timeout(session, transaction, connection):
+    timeout_ms = session.info.get("statement_timeout_ms")
+    if timeout_ms and connection.dialect.name == "postgresql":
+        # SET LOCAL only lasts until the end of this transaction
+        connection.exec_driver_sql(
+            f"SET LOCAL statement_timeout = {int(timeout_ms)}",
+            execution_options={"query_stats": False}
+        )
+
+async def database_error_handler(request: Request, error: Exception):
+    """Answer 503 when a query was cancelled or no pooled connection was free"""
+    if isinstance(error, exc.OperationalError) and getattr(error.orig, "sqlstate", None) == QUERY_CANCELED:
+        logger.warning("Query cancelled on %s %s: %s", request.method, request.url.path, error.orig)
+        detail = "Database query timed out"
+    elif isinstance(error, exc.TimeoutError):
+        logger.warning("Connection pool exhausted on %s %s", request.method, request.url.path)
+        detail = "Database is busy"
+    else:
+        raise error
+    return JSONResponse(status_code=503, content={"detail": detail}, headers={"Retry-After": "1"})
+
+class CancelOnDisconnectMiddleware:
+    """ASGI middleware that cancels request handling when the client disconnects.
+
+    Cancelling the handler interrupts the running query (psycopg sends a cancel
+    request to the server) and returns its connection to the pool. Background
+    tasks that run after the response has been sent are not affected.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        messages: asyncio.Queue = asyncio.Queue()
+        response_complete = asyncio.Event()
+
+        async def send_and_track(message):
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete.set()
+
+        handler = asyncio.create_task(self.app(scope, messages.get, send_and_track))
+        disconnected = False
+        try:
+            # Sole reader of the real receive channel; the app reads from the queue
+            while not handler.done():
+                receiving = asyncio.ensure_future(receive())
+                await asyncio.wait({handler, receiving}, return_when=asyncio.FIRST_COMPLETED)
+                if not receiving.done():
+                    receiving.cancel()
+                    break
+                message = receiving.result()
+                messages.put_nowait(message)
+                if message["type"] == "http.disconnect":
+                    if not response_complete.is_set():
+                        disconnected = True
+                        handler.cancel()
+                        logger.info("Client disconnected, cancelled %s %s", scope["method"], scope["path"])
+                    break
+
+            await handler
+        except asyncio.CancelledError:
+            if not disconnected:
+                raise
+        finally:
+            if not handler.done():
+                handler.cancel()
@@ -1,16 +1,51 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
+from sqlalchemy import exc
 import os
 from app.api import api_router
+from app.db.database import async_engine, replica_set
+from app.db.instrumentation import QueryStatsMiddleware
+from app.db.timeouts import CancelOnDisconnectMiddleware, database_error_handler
+from app.core.revocation import revocation_list
+from app.core.config import settings
+from app.services.email_outbox import email_sender
+from app.services.notification_delivery import delivery_worker
+from app.services.notification_jobs import job_runner
+from app.services.notification_partitions import partition_maintainer
+from app.services.notification_stream import notification_hub
 
 # Load environment variables from .env file
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start background workers
+    replica_set.start()
+    revocation_list.start()
+    notification_hub.start()
+    if settings.run_delivery_workers:
+        email_sender.start()
+        delivery_worker.start()
+        job_runner.start()
+        partition_maintainer.start()
+    yield
+    # Stop background workers and close pooled connections
+    await notification_hub.stop()
+    await partition_maintainer.stop()
+    await job_runner.stop()
+    await delivery_worker.stop()
+    await email_sender.stop()
+    await revocation_list.stop()
+    await replica_set.stop()
+    await async_engine.dispose()
+
 app = FastAPI(
     title="RenewMart API",
     description="Land Management System API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -21,8 +56,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination headers must be readable by the cross-origin frontend too
+    expose_headers=["X-DB-Query-Count", "X-DB-Time", "X-Next-Cursor", "Link"],
 )
 
+# Stop work (and running queries) for requests whose client went away
+app.add_middleware(CancelOnDisconnectMiddleware)
+
+# Per-request query count and DB time
+app.add_middleware(QueryStatsMiddleware)
+
+# Timed-out queries and pool exhaustion become fast 503s
+app.add_exception_handler(exc.OperationalError, database_error_handler)
+app.add_exception_handler(exc.TimeoutError, database_error_handler)
+
 # Include API routes
 app.include_router(api_router, prefix="/api/v1")
 
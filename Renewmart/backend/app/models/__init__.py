@@ -1,5 +1,5 @@
 # Import all models to ensure they are registered with SQLAlchemy
-from .user import User, Role, Permission, UserRole, RolePermission, UserType
+from .user import User, Role, Permission, UserRole, RolePermission, UserType, RevokedToken, UserSession
 from .land_parcel import (
     LandParcel, Document, Task, Approval, Milestone,
     ParcelStatus, TaskStatus, ApprovalStatus, MilestoneStatus
@@ -13,13 +13,13 @@ from .project import (
     ProjectStatus, ProjectType
 )
 from .notification import (
-    Notification, NotificationTemplate,
-    NotificationType, NotificationChannel, NotificationStatus
+    Notification, NotificationTemplate, EmailOutbox, NotificationCounter, NotificationJob, NotificationPreference,
+    NotificationType, NotificationChannel, NotificationStatus, EmailStatus, NotificationJobStatus
 )
 
 __all__ = [
     # User models
-    "User", "Role", "Permission", "UserRole", "RolePermission", "UserType",
+    "User", "Role", "Permission", "UserRole", "RolePermission", "UserType", "RevokedToken", "UserSession",
     
     # Land parcel models
     "LandParcel", "Document", "Task", "Approval", "Milestone",
@@ -34,6 +34,6 @@ __all__ = [
     "ProjectStatus", "ProjectType",
     
     # Notification models
-    "Notification", "NotificationTemplate",
-    "NotificationType", "NotificationChannel", "NotificationStatus",
+    "Notification", "NotificationTemplate", "EmailOutbox", "NotificationCounter", "NotificationJob", "NotificationPreference",
+    "NotificationType", "NotificationChannel", "NotificationStatus", "EmailStatus", "NotificationJobStatus",
 ]
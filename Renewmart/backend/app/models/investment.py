@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, JSON, Boolean, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, JSON, Boolean, ForeignKey, Enum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.database import Base
@@ -14,6 +14,11 @@ class OpportunityStatus(str, enum.Enum):
 
 class InvestmentOpportunity(Base):
     __tablename__ = "investment_opportunities"
+    __table_args__ = (
+        # Trigram indexes for fuzzy search (app.db.search)
+        Index("ix_investment_opportunities_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+        Index("ix_investment_opportunities_target_region_trgm", "target_region", postgresql_using="gin", postgresql_ops={"target_region": "gin_trgm_ops"}),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
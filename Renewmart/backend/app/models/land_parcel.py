@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, JSON, Boolean, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, JSON, Boolean, ForeignKey, Enum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.database import Base
@@ -47,6 +47,12 @@ class LandParcel(Base):
 
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        Index("ix_documents_land_parcel_id_id", "land_parcel_id", "id"),
+        Index("ix_documents_task_id_id", "task_id", "id"),
+        Index("ix_documents_project_id_id", "project_id", "id"),
+        Index("ix_documents_proposal_id_id", "proposal_id", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
@@ -82,6 +88,14 @@ class TaskStatus(str, enum.Enum):
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_status_id", "status", "id"),
+        Index("ix_tasks_assigned_to_status", "assigned_to", "status"),
+        Index("ix_tasks_land_parcel_id_id", "land_parcel_id", "id"),
+        Index("ix_tasks_project_id_id", "project_id", "id"),
+        Index("ix_tasks_milestone_id_id", "milestone_id", "id"),
+        Index("ix_tasks_due_date", "due_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String)
@@ -120,6 +134,12 @@ class ApprovalStatus(str, enum.Enum):
 
 class Approval(Base):
     __tablename__ = "approvals"
+    __table_args__ = (
+        Index("ix_approvals_status_id", "status", "id"),
+        Index("ix_approvals_approval_type_id", "approval_type", "id"),
+        Index("ix_approvals_approved_by_status", "approved_by", "status"),
+        Index("ix_approvals_created_by_status", "created_by", "status"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     approval_type = Column(String)  # e.g., "feasibility", "proposal", "milestone"
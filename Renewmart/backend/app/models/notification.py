@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Enum, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Enum, JSON, Index, DDL, event, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
+from app.core.config import settings
 from app.db.database import Base
 import enum
 
@@ -28,10 +29,41 @@ class NotificationStatus(str, enum.Enum):
     FAILED = "failed"
     READ = "read"
 
+# Statuses counted as unread
+UNREAD_STATUSES = (NotificationStatus.PENDING, NotificationStatus.SENT, NotificationStatus.DELIVERED)
+
+class EmailStatus(str, enum.Enum):
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
+class NotificationJobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        # Matches the (created_at, id) keyset ordering of a user's inbox
+        Index("ix_notifications_user_id_created_at_id", "user_id", "created_at", "id"),
+        # What changed in a user's inbox, as read by notification streams
+        Index("ix_notifications_user_id_changed_at", "user_id", "changed_at"),
+        Index(
+            "ix_notifications_user_id_unread", "user_id",
+            postgresql_where=text("status IN ('PENDING', 'SENT', 'DELIVERED')")
+        ),
+        # Due notifications, as scanned by the delivery worker
+        Index(
+            "ix_notifications_pending_next_attempt_at", "next_attempt_at",
+            postgresql_where=text("status = 'PENDING'")
+        ),
+        # Monthly partitions, named notifications_YYYY_MM; see app.services.notification_partitions
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     title = Column(String)
     message = Column(Text)
     notification_type = Column(Enum(NotificationType))
@@ -58,9 +90,160 @@ class Notification(Base):
     # Retry mechanism
     retry_count = Column(Integer, default=0)
     max_retries = Column(Integer, default=3)
+    # Earliest time of the next delivery attempt; also leases rows being delivered.
+    # NULL on rows that predate the delivery worker, which are never delivered.
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now())
+    # End of the digest window of a coalesced notification; until then (and
+    # while next_attempt_at equals it) later events are merged into the row
+    coalesce_until = Column(DateTime(timezone=True))
     
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # The partition key, so part of the table's primary key; rows are still identified by id
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), primary_key=True)
     created_by = Column(Integer, ForeignKey("users.id"))
+    # When the row was created or a digest last merged an event into it;
+    # notification streams send rows whose changed_at moves
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __mapper_args__ = {"primary_key": [id]}
+
+# create_all makes notifications a partitioned table without partitions,
+# which takes no rows: create this month's and notification_partitions_ahead
+# more (UTC months), as the migration does. The partition maintainer keeps
+# the window moving from there.
+event.listen(Notification.__table__, "after_create", DDL(f"""
+    DO $$
+    DECLARE
+        month timestamp;
+    BEGIN
+        FOR month IN
+            SELECT generate_series(
+                date_trunc('month', now() AT TIME ZONE 'UTC'),
+                date_trunc('month', now() AT TIME ZONE 'UTC') + interval '{settings.notification_partitions_ahead} months',
+                interval '1 month'
+            )
+        LOOP
+            EXECUTE format(
+                'CREATE TABLE %%I PARTITION OF notifications FOR VALUES FROM (%%L) TO (%%L)',
+                'notifications_' || to_char(month, 'YYYY_MM'),
+                (month AT TIME ZONE 'UTC'),
+                ((month + interval '1 month') AT TIME ZONE 'UTC')
+            );
+        END LOOP;
+    END
+    $$
+""").execute_if(dialect="postgresql"))
+
+# Every change to a user's inbox (a new, deleted or merged into notification
+# or a new status) sends NOTIFY notification_changes with the
+# user id as payload when its transaction commits; open notification streams
+# LISTEN for it. Migrations install the trigger, this covers create_all.
+NOTIFICATION_CHANGES_CHANNEL = "notification_changes"
+for _ddl in (
+    DDL("""
+        CREATE OR REPLACE FUNCTION notify_notification_change() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                PERFORM pg_notify('notification_changes', OLD.user_id::text);
+            ELSE
+                PERFORM pg_notify('notification_changes', NEW.user_id::text);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """),
+    DDL("""
+        CREATE TRIGGER notifications_notify_insert_delete
+        AFTER INSERT OR DELETE ON notifications
+        FOR EACH ROW EXECUTE FUNCTION notify_notification_change()
+    """),
+    DDL("""
+        CREATE TRIGGER notifications_notify_status
+        AFTER UPDATE OF status, changed_at ON notifications
+        FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status OR OLD.changed_at IS DISTINCT FROM NEW.changed_at)
+        EXECUTE FUNCTION notify_notification_change()
+    """),
+):
+    event.listen(Notification.__table__, "after_create", _ddl.execute_if(dialect="postgresql"))
+
+class NotificationPreference(Base):
+    """How a user wants event notifications delivered; users without a row
+    get the defaults"""
+    __tablename__ = "notification_preferences"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    digest_enabled = Column(Boolean, nullable=False, default=True, server_default=text("true"))
+    digest_window_seconds = Column(Integer)  # NULL uses NOTIFICATION_DIGEST_WINDOW_SECONDS
+    email_enabled = Column(Boolean, nullable=False, default=True, server_default=text("true"))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class NotificationCounter(Base):
+    """Per-user notification totals, kept current by statement triggers on
+    notifications in the transaction that changes them"""
+    __tablename__ = "notification_counters"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    total = Column(Integer, nullable=False, default=0, server_default="0")
+    unread = Column(Integer, nullable=False, default=0, server_default="0")
+
+# Each statement adds its per-user deltas in user_id order, so concurrent
+# statements touching several users lock counter rows in the same order.
+# Migrations install the triggers, this covers create_all.
+for _ddl in (
+    DDL("""
+        CREATE OR REPLACE FUNCTION count_notification_changes() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO notification_counters (user_id, total, unread)
+                SELECT user_id, count(*), count(*) FILTER (WHERE status IN ('PENDING', 'SENT', 'DELIVERED'))
+                FROM new_rows WHERE user_id IS NOT NULL
+                GROUP BY user_id ORDER BY user_id
+                ON CONFLICT (user_id) DO UPDATE SET
+                    total = notification_counters.total + EXCLUDED.total,
+                    unread = notification_counters.unread + EXCLUDED.unread;
+            ELSIF TG_OP = 'DELETE' THEN
+                INSERT INTO notification_counters (user_id, total, unread)
+                SELECT user_id, -count(*), -count(*) FILTER (WHERE status IN ('PENDING', 'SENT', 'DELIVERED'))
+                FROM old_rows WHERE user_id IS NOT NULL
+                GROUP BY user_id ORDER BY user_id
+                ON CONFLICT (user_id) DO UPDATE SET
+                    total = notification_counters.total + EXCLUDED.total,
+                    unread = notification_counters.unread + EXCLUDED.unread;
+            ELSE
+                INSERT INTO notification_counters (user_id, total, unread)
+                SELECT user_id, sum(total), sum(unread) FROM (
+                    SELECT user_id, 1 AS total, CASE WHEN status IN ('PENDING', 'SENT', 'DELIVERED') THEN 1 ELSE 0 END AS unread
+                    FROM new_rows
+                    UNION ALL
+                    SELECT user_id, -1, CASE WHEN status IN ('PENDING', 'SENT', 'DELIVERED') THEN -1 ELSE 0 END
+                    FROM old_rows
+                ) AS changes
+                WHERE user_id IS NOT NULL
+                GROUP BY user_id HAVING sum(total) <> 0 OR sum(unread) <> 0 ORDER BY user_id
+                ON CONFLICT (user_id) DO UPDATE SET
+                    total = notification_counters.total + EXCLUDED.total,
+                    unread = notification_counters.unread + EXCLUDED.unread;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """),
+    DDL("""
+        CREATE TRIGGER notifications_count_insert
+        AFTER INSERT ON notifications REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION count_notification_changes()
+    """),
+    DDL("""
+        CREATE TRIGGER notifications_count_update
+        AFTER UPDATE ON notifications REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION count_notification_changes()
+    """),
+    DDL("""
+        CREATE TRIGGER notifications_count_delete
+        AFTER DELETE ON notifications REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION count_notification_changes()
+    """),
+):
+    event.listen(Notification.__table__, "after_create", _ddl.execute_if(dialect="postgresql"))
 
 class NotificationTemplate(Base):
     __tablename__ = "notification_templates"
@@ -84,3 +267,66 @@ class NotificationTemplate(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     created_by = Column(Integer, ForeignKey("users.id"))
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # The sender only ever scans due, pending messages
+        Index(
+            "ix_email_outbox_pending_next_attempt_at", "next_attempt_at",
+            postgresql_where=text("status = 'PENDING'")
+        ),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    subtype = Column(String, default="html")  # "html" or "plain"
+    
+    status = Column(Enum(EmailStatus), default=EmailStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    # Earliest time of the next delivery attempt; also leases messages being sent
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error = Column(Text)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True))
+
+class NotificationJob(Base):
+    """A bulk send to an audience, fanned out in chunks by the job runner"""
+    __tablename__ = "notification_jobs"
+    __table_args__ = (
+        # Jobs the runner may claim
+        Index(
+            "ix_notification_jobs_unfinished_lease_expires_at", "lease_expires_at",
+            postgresql_where=text("status IN ('QUEUED', 'RUNNING')")
+        ),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(Enum(NotificationJobStatus), default=NotificationJobStatus.QUEUED, nullable=False)
+    
+    # Recipients: a NotificationAudience, resolved when the job runs
+    audience = Column(JSON, nullable=False)
+    
+    # What every recipient gets
+    notification_type = Column(Enum(NotificationType), nullable=False)
+    channel = Column(Enum(NotificationChannel), nullable=False)
+    title = Column(String)
+    message = Column(Text)
+    template_id = Column(Integer, ForeignKey("notification_templates.id"))
+    data = Column(JSON)
+    
+    # Progress; recipients are processed in user id order
+    total_recipients = Column(Integer)
+    sent_count = Column(Integer, default=0, server_default="0", nullable=False)
+    last_user_id = Column(Integer, default=0, server_default="0", nullable=False)
+    error = Column(Text)
+    # Claimed jobs are leased; a job whose runner died is resumed once the lease expires
+    lease_expires_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_by = Column(Integer, ForeignKey("users.id"))
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
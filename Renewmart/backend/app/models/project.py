@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, JSON, Boolean, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, JSON, Boolean, ForeignKey, Enum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.database import Base
@@ -52,6 +52,11 @@ class DevelopmentProject(Base):
 
 class TemplateProject(Base):
     __tablename__ = "template_projects"
+    __table_args__ = (
+        # Trigram indexes for fuzzy search (app.db.search)
+        Index("ix_template_projects_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_template_projects_region_trgm", "region", postgresql_using="gin", postgresql_ops={"region": "gin_trgm_ops"}),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
@@ -109,6 +114,11 @@ class TemplateTask(Base):
 
 class ApprovalRule(Base):
     __tablename__ = "approval_rules"
+    __table_args__ = (
+        # Trigram indexes for fuzzy search (app.db.search)
+        Index("ix_approval_rules_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_approval_rules_region_trgm", "region", postgresql_using="gin", postgresql_ops={"region": "gin_trgm_ops"}),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
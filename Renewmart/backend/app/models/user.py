@@ -22,6 +22,8 @@ class User(Base):
     hashed_password = Column(String)
     user_type = Column(Enum(UserType), default=UserType.LANDOWNER)
     is_active = Column(Boolean, default=True)
+    # Embedded in access tokens; incrementing it revokes every token issued so far
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     phone = Column(String)
     company = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -81,3 +83,26 @@ class RolePermission(Base):
     # Relationships
     role = relationship("Role")
     permission = relationship("Permission")
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+    
+    jti = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    # Rows are pruned once the token would have expired anyway
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    revoked_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# A refresh token; rotating it replaces the row with a new one in the same family
+class UserSession(Base):
+    __tablename__ = "user_sessions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    family_id = Column(String, nullable=False, index=True)
+    token_hash = Column(String, nullable=False, unique=True)  # sha256 hex of the refresh token
+    token_version = Column(Integer, nullable=False)  # user's token_version when issued
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    rotated_at = Column(DateTime(timezone=True), nullable=True)
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
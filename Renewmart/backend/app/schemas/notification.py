@@ -1,7 +1,8 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, computed_field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
-from app.models.notification import NotificationType, NotificationChannel, NotificationStatus
+from app.models.notification import NotificationType, NotificationChannel, NotificationStatus, NotificationJobStatus
+from app.models.user import UserType
 
 class NotificationBase(BaseModel):
     title: str
@@ -39,6 +40,26 @@ class Notification(NotificationBase):
     class Config:
         from_attributes = True
 
+class NotificationSelection(BaseModel):
+    """Notifications of the current user to act on: the given ids, those
+    created before a timestamp, or both"""
+    ids: Optional[List[int]] = Field(None, max_length=1000)
+    before: Optional[datetime] = None
+
+class NotificationPreferenceUpdate(BaseModel):
+    digest_enabled: Optional[bool] = None
+    # Seconds events are coalesced for; null uses the server default
+    digest_window_seconds: Optional[int] = Field(None, ge=0, le=86400)
+    email_enabled: Optional[bool] = None
+
+class NotificationPreference(BaseModel):
+    digest_enabled: bool = True
+    digest_window_seconds: Optional[int] = None
+    email_enabled: bool = True
+    
+    class Config:
+        from_attributes = True
+
 class NotificationTemplateBase(BaseModel):
     name: str
     notification_type: NotificationType
@@ -70,3 +91,35 @@ class NotificationTemplate(NotificationTemplateBase):
     
     class Config:
         from_attributes = True
+
+class NotificationAudience(BaseModel):
+    """Recipients of a bulk send. Active users matching any selector get one
+    notification each."""
+    user_ids: Optional[List[int]] = None
+    user_types: Optional[List[UserType]] = None
+    project_ids: Optional[List[int]] = None  # project managers and task assignees
+    parcel_ids: Optional[List[int]] = None  # landowners
+    all_users: bool = False
+
+class NotificationJob(BaseModel):
+    id: int
+    status: NotificationJobStatus
+    notification_type: NotificationType
+    channel: NotificationChannel
+    total_recipients: Optional[int] = None
+    sent_count: int
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    @computed_field
+    @property
+    def progress(self) -> Optional[float]:
+        """Fraction of recipients notified so far, once the audience is resolved"""
+        if self.total_recipients is None:
+            return None
+        return self.sent_count / self.total_recipients if self.total_recipients else 1.0
+    
+    class Config:
+        from_attributes = True
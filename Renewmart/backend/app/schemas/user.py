@@ -26,6 +26,9 @@ class PasswordResetVerify(BaseModel):
     otp: str
     new_password: str
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
 class UserUpdate(BaseModel):
     name: Optional[str] = None
     email: Optional[EmailStr] = None
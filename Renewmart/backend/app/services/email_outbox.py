@@ -0,0 +1,176 @@
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from sqlalchemy import select, update
+from typing import List, Optional
+import aiosmtplib
+import logging
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.models.notification import EmailOutbox, EmailStatus
+from app.services.email_service import conf
+from app.services.worker import PollingWorker, backoff_seconds, wake_on_commit
+
+logger = logging.getLogger(__name__)
+
+class SmtpTransport:
+    """Sends over one authenticated SMTP connection, kept open across
+    messages and batches until close()"""
+
+    def __init__(self, config=conf):
+        self.config = config
+        self._client: Optional[aiosmtplib.SMTP] = None
+
+    async def _connect(self):
+        client = aiosmtplib.SMTP(
+            hostname=self.config.MAIL_SERVER,
+            port=self.config.MAIL_PORT,
+            use_tls=self.config.MAIL_SSL_TLS,
+            start_tls=self.config.MAIL_STARTTLS,
+            validate_certs=self.config.VALIDATE_CERTS,
+            timeout=self.config.TIMEOUT
+        )
+        await client.connect()
+        if self.config.USE_CREDENTIALS:
+            await client.login(self.config.MAIL_USERNAME, self.config.MAIL_PASSWORD)
+        self._client = client
+
+    async def send(self, message: EmailMessage):
+        if self._client is None or not self._client.is_connected:
+            await self._connect()
+        try:
+            await self._client.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            # The server dropped the idle connection; retry once on a new one
+            await self._connect()
+            await self._client.send_message(message)
+
+    async def close(self):
+        if self._client is not None:
+            try:
+                await self._client.quit()
+            except aiosmtplib.SMTPException:
+                pass
+            self._client = None
+
+class MemoryTransport:
+    """Keeps messages in memory instead of sending them; a stand-in for SMTP
+    in tests and local development (EMAIL_TRANSPORT=memory)"""
+
+    def __init__(self):
+        self.sent: List[EmailMessage] = []
+
+    async def send(self, message: EmailMessage):
+        self.sent.append(message)
+
+    async def close(self):
+        pass
+
+def build_message(email: EmailOutbox, sender: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = email.recipient
+    message["Subject"] = email.subject
+    message.set_content(email.body, subtype=email.subtype or "html")
+    return message
+
+class EmailOutboxSender(PollingWorker):
+    """Background sender draining the email_outbox table.
+
+    Due messages are claimed in batches with FOR UPDATE SKIP LOCKED and
+    leased by pushing next_attempt_at forward, so several workers can run
+    senders without sending a message twice and no transaction stays open
+    while talking to SMTP. A batch is sent over one connection, which stays
+    open until the outbox is drained. Failed messages are retried with
+    exponential backoff and marked FAILED after max_attempts.
+    """
+
+    name = "Email outbox sender"
+
+    def __init__(
+        self,
+        transport,
+        batch_size: int,
+        poll_interval: float,
+        max_attempts: int,
+        retry_base_seconds: float,
+        retry_max_seconds: float,
+        lease_seconds: float = 300.0,
+        sender_address: str = conf.MAIL_FROM
+    ):
+        super().__init__(batch_size, poll_interval)
+        self.transport = transport
+        self.sender_address = sender_address
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.lease_seconds = lease_seconds
+
+    def retry_delay(self, attempts: int) -> float:
+        return backoff_seconds(attempts, self.retry_base_seconds, self.retry_max_seconds)
+
+    async def _claim(self) -> List[EmailOutbox]:
+        now = datetime.now(timezone.utc)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(EmailOutbox)
+                .where(EmailOutbox.status == EmailStatus.PENDING, EmailOutbox.next_attempt_at <= now)
+                .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            emails = result.scalars().all()
+            for email in emails:
+                email.attempts += 1
+                email.next_attempt_at = now + timedelta(seconds=self.lease_seconds)
+            await db.commit()
+        return emails
+
+    async def run_once(self) -> int:
+        """Send one batch of due messages; returns how many were claimed"""
+        emails = await self._claim()
+        if not emails:
+            return 0
+
+        sent_ids = []
+        failures = []
+        for email in emails:
+            try:
+                await self.transport.send(build_message(email, self.sender_address))
+                sent_ids.append(email.id)
+            except Exception as e:
+                logger.warning("Sending email %s to %s failed (attempt %d): %s", email.id, email.recipient, email.attempts, e)
+                failures.append((email, str(e)))
+
+        now = datetime.now(timezone.utc)
+        async with AsyncSessionLocal() as db:
+            if sent_ids:
+                await db.execute(
+                    update(EmailOutbox)
+                    .where(EmailOutbox.id.in_(sent_ids))
+                    .values(status=EmailStatus.SENT, sent_at=now, last_error=None)
+                )
+            for email, error in failures:
+                if email.attempts >= self.max_attempts:
+                    values = dict(status=EmailStatus.FAILED, last_error=error)
+                else:
+                    values = dict(next_attempt_at=now + timedelta(seconds=self.retry_delay(email.attempts)), last_error=error)
+                await db.execute(update(EmailOutbox).where(EmailOutbox.id == email.id).values(**values))
+            await db.commit()
+        return len(emails)
+
+    async def on_idle(self):
+        # Do not hold the SMTP connection while there is nothing to send
+        await self.transport.close()
+
+email_sender = EmailOutboxSender(
+    transport=MemoryTransport() if settings.email_transport == "memory" else SmtpTransport(),
+    batch_size=settings.email_batch_size,
+    poll_interval=settings.email_poll_seconds,
+    max_attempts=settings.email_max_attempts,
+    retry_base_seconds=settings.email_retry_base_seconds,
+    retry_max_seconds=settings.email_retry_max_seconds
+)
+
+# Queued emails go out right after the transaction that queued them commits
+wake_on_commit(email_sender, EmailOutbox)
@@ -1,7 +1,9 @@
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
+from fastapi_mail import ConnectionConfig
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 import os
 from app.core.config import settings
+from app.models.notification import EmailOutbox
 
 # Email configuration
 conf = ConnectionConfig(
@@ -16,12 +18,19 @@ conf = ConnectionConfig(
     VALIDATE_CERTS=True
 )
 
-async def send_password_reset_otp(email: str, otp: str, user_name: str = "User"):
-    """Send password reset OTP to user's email"""
+def queue_email(db: AsyncSession, recipient: str, subject: str, body: str, subtype: str = "html") -> EmailOutbox:
+    """Add an email to the outbox; it is sent once the caller's transaction commits"""
+    email = EmailOutbox(recipient=recipient, subject=subject, body=body, subtype=subtype)
+    db.add(email)
+    return email
+
+def queue_password_reset_otp(db: AsyncSession, email: str, otp: str, user_name: str = "User") -> EmailOutbox:
+    """Queue the password reset OTP email for a user"""
     
-    message = MessageSchema(
+    return queue_email(
+        db,
+        recipient=email,
         subject="Password Reset - RenewMart",
-        recipients=[email],
         body=f"""
         <html>
         <body>
@@ -38,6 +47,3 @@ async def send_password_reset_otp(email: str, otp: str, user_name: str = "User")
         """,
         subtype="html"
     )
-    
-    fm = FastMail(conf)
-    await fm.send_message(message)
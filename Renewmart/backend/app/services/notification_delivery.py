@@ -0,0 +1,235 @@
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.models.notification import Notification, NotificationChannel, NotificationStatus
+from app.models.user import User
+from app.services.email_outbox import email_sender
+from app.services.email_service import queue_email
+from app.services.notification_jobs import job_runner
+from app.services.notification_partitions import partition_maintainer
+from app.services.worker import PollingWorker, backoff_seconds, wake_on_commit
+
+logger = logging.getLogger(__name__)
+
+# Used for rows whose max_retries is NULL
+DEFAULT_MAX_RETRIES = Notification.__table__.c.max_retries.default.arg
+
+class ChannelAdapter(ABC):
+    """Delivers notifications over one NotificationChannel.
+
+    Implement deliver() for one-at-a-time providers (batches are sent with up
+    to `concurrency` deliveries in flight) or override deliver_batch() for
+    providers with a bulk API. A delivery fails by raising.
+    """
+
+    # Status of a notification once this adapter has delivered it
+    delivered_status = NotificationStatus.SENT
+    concurrency = 10
+
+    @abstractmethod
+    async def deliver(self, notification: Notification, recipient: User):
+        """Deliver one notification"""
+
+    async def deliver_batch(self, items: List[Tuple[Notification, User]]) -> List[Optional[str]]:
+        """Deliver a batch; returns an error message (or None) per item"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver_one(notification, recipient):
+            async with semaphore:
+                try:
+                    await self.deliver(notification, recipient)
+                    return None
+                except Exception as e:
+                    return str(e) or type(e).__name__
+
+        return await asyncio.gather(*(deliver_one(n, r) for n, r in items))
+
+class InAppAdapter(ChannelAdapter):
+    """In-app notifications are delivered by being in the user's inbox"""
+
+    delivered_status = NotificationStatus.DELIVERED
+
+    async def deliver(self, notification: Notification, recipient: User):
+        pass
+
+class EmailAdapter(ChannelAdapter):
+    """Hands email notifications to the email outbox, which does the SMTP work"""
+
+    def _queue(self, db, notification: Notification, recipient: User):
+        queue_email(
+            db, recipient.email, notification.title or "RenewMart notification", notification.message or "",
+            # Notification text is not markup and may contain user input
+            subtype="plain"
+        )
+
+    async def deliver(self, notification: Notification, recipient: User):
+        await self.deliver_batch([(notification, recipient)])
+
+    async def deliver_batch(self, items: List[Tuple[Notification, User]]) -> List[Optional[str]]:
+        # One transaction for the whole batch
+        async with AsyncSessionLocal() as db:
+            for notification, recipient in items:
+                self._queue(db, notification, recipient)
+            await db.commit()
+        return [None] * len(items)
+
+class NotificationDeliveryWorker(PollingWorker):
+    """Delivers PENDING notifications through the adapter of their channel.
+
+    Due rows are claimed with FOR UPDATE SKIP LOCKED and leased by pushing
+    next_attempt_at forward, so any number of worker processes can run side
+    by side without delivering a row twice. Channels of a batch are
+    dispatched concurrently. A failed delivery increments retry_count and is
+    retried with exponential backoff (the row stays PENDING) until
+    retry_count exceeds max_retries, when it becomes FAILED.
+    """
+
+    name = "Notification delivery worker"
+
+    def __init__(
+        self,
+        batch_size: int,
+        poll_interval: float,
+        retry_base_seconds: float,
+        retry_max_seconds: float,
+        lease_seconds: float = 300.0
+    ):
+        super().__init__(batch_size, poll_interval)
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.lease_seconds = lease_seconds
+        self.adapters: Dict[NotificationChannel, ChannelAdapter] = {}
+
+    def register_adapter(self, channel: NotificationChannel, adapter: ChannelAdapter):
+        self.adapters[channel] = adapter
+
+    def _due(self, now: datetime):
+        """Due rows this worker can deliver. Rows of channels without an
+        adapter stay PENDING (and in the inbox) until one is registered,
+        instead of failing."""
+        return (
+            select(Notification)
+            .where(
+                Notification.status == NotificationStatus.PENDING,
+                Notification.next_attempt_at <= now,
+                Notification.channel.in_(list(self.adapters))
+            )
+            .order_by(Notification.next_attempt_at, Notification.id)
+            .limit(self.batch_size)
+        )
+
+    async def _claim(self) -> List[Notification]:
+        now = datetime.now(timezone.utc)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(self._due(now).with_for_update(skip_locked=True))
+            notifications = result.scalars().all()
+            for notification in notifications:
+                notification.next_attempt_at = now + timedelta(seconds=self.lease_seconds)
+            await db.commit()
+        return notifications
+
+    async def _dispatch(self, channel, items) -> List[Optional[str]]:
+        adapter = self.adapters.get(channel)
+        if adapter is None:
+            return [f"No delivery adapter for channel {channel.value}"] * len(items)
+        try:
+            return await adapter.deliver_batch(items)
+        except Exception as e:
+            logger.warning("Delivering %d %s notifications failed: %s", len(items), channel.value, e)
+            return [str(e) or type(e).__name__] * len(items)
+
+    async def run_once(self) -> int:
+        notifications = await self._claim()
+        if not notifications:
+            return 0
+
+        async with AsyncSessionLocal() as db:
+            user_ids = {n.user_id for n in notifications}
+            recipients = {user.id: user for user in (await db.scalars(select(User).where(User.id.in_(user_ids)))).all()}
+
+        by_channel = defaultdict(list)
+        failures = []
+        for notification in notifications:
+            recipient = recipients.get(notification.user_id)
+            if recipient is None:
+                failures.append((notification, "Recipient not found"))
+            else:
+                by_channel[notification.channel].append((notification, recipient))
+
+        channels = list(by_channel)
+        results = await asyncio.gather(*(self._dispatch(channel, by_channel[channel]) for channel in channels))
+
+        delivered = defaultdict(list)
+        for channel, errors in zip(channels, results):
+            for (notification, _), error in zip(by_channel[channel], errors):
+                if error is None:
+                    delivered[self.adapters[channel].delivered_status].append(notification.id)
+                else:
+                    failures.append((notification, error))
+
+        await self._record(delivered, failures)
+        return len(notifications)
+
+    async def _record(self, delivered: Dict[NotificationStatus, List[int]], failures: List[Tuple[Notification, str]]):
+        now = datetime.now(timezone.utc)
+        # sent_at and delivered_at are naive columns holding UTC
+        delivered_at = now.replace(tzinfo=None)
+        async with AsyncSessionLocal() as db:
+            for status, ids in delivered.items():
+                values = dict(status=status, sent_at=delivered_at, failed_reason=None)
+                if status == NotificationStatus.DELIVERED:
+                    values["delivered_at"] = delivered_at
+                # A row read or deleted meanwhile keeps what the user did to it
+                await db.execute(
+                    update(Notification)
+                    .where(Notification.id.in_(ids), Notification.status == NotificationStatus.PENDING)
+                    .values(**values)
+                )
+            for notification, error in failures:
+                retry_count = (notification.retry_count or 0) + 1
+                max_retries = notification.max_retries if notification.max_retries is not None else DEFAULT_MAX_RETRIES
+                values = dict(retry_count=retry_count, failed_reason=error)
+                if retry_count > max_retries:
+                    values["status"] = NotificationStatus.FAILED
+                else:
+                    delay = backoff_seconds(retry_count, self.retry_base_seconds, self.retry_max_seconds)
+                    values["next_attempt_at"] = now + timedelta(seconds=delay)
+                await db.execute(
+                    update(Notification)
+                    .where(Notification.id == notification.id, Notification.status == NotificationStatus.PENDING)
+                    .values(**values)
+                )
+            await db.commit()
+
+delivery_worker = NotificationDeliveryWorker(
+    batch_size=settings.notification_batch_size,
+    poll_interval=settings.notification_poll_seconds,
+    retry_base_seconds=settings.notification_retry_base_seconds,
+    retry_max_seconds=settings.notification_retry_max_seconds
+)
+delivery_worker.register_adapter(NotificationChannel.IN_APP, InAppAdapter())
+delivery_worker.register_adapter(NotificationChannel.EMAIL, EmailAdapter())
+# SMS and web push have no provider yet: their rows stay PENDING until register_adapter() adds one
+
+# New notifications are delivered right after the transaction that created them commits
+wake_on_commit(delivery_worker, Notification)
+
+async def run_workers():
+    """Run the delivery workers outside the API (RUN_DELIVERY_WORKERS=false there)"""
+    await asyncio.gather(
+        delivery_worker.run_forever(),
+        email_sender.run_forever(),
+        job_runner.run_forever(),
+        partition_maintainer.run_forever()
+    )
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_workers())
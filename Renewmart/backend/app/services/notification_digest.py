@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.models.notification import (
+    Notification, NotificationChannel, NotificationPreference, NotificationStatus, NotificationType
+)
+
+def digest_window_seconds(preference: Optional[NotificationPreference]) -> int:
+    """Seconds a user's notifications are coalesced for; 0 delivers each one"""
+    if preference is None:
+        return settings.notification_digest_window_seconds
+    if not preference.digest_enabled:
+        return 0
+    if preference.digest_window_seconds is None:
+        return settings.notification_digest_window_seconds
+    return preference.digest_window_seconds
+
+def notification_channel(preference: Optional[NotificationPreference]) -> NotificationChannel:
+    """Channel of a user's event notifications. Every notification is in the
+    inbox; an EMAIL one is also mailed when the delivery worker delivers it,
+    so an email copy never needs a second inbox row."""
+    if preference is not None and not preference.email_enabled:
+        return NotificationChannel.IN_APP
+    return NotificationChannel.EMAIL
+
+def digest_text(items: List[Dict[str, Any]], count: int) -> Tuple[str, str]:
+    """Title and message of a digest of count events, listing items (the
+    first events, at most notification_digest_max_items of them)"""
+    if count == 1:
+        return items[0]["title"], items[0]["message"]
+    lines = [f"- {item['message']}" for item in items]
+    if count > len(items):
+        lines.append(f"...and {count - len(items)} more")
+    return f"{items[0]['title']} (+{count - 1} more)", "\n".join(lines)
+
+def merge_into_digest(notification: Notification, item: Dict[str, Any]):
+    """Add an event to an open digest. The digest's data only keeps the
+    digest itself, whose items carry each listed event's own data; the
+    payload of the event that opened it no longer describes the row."""
+    digest = (notification.data or {}).get("digest", {"count": 1, "items": []})
+    items = digest["items"]
+    if len(items) < settings.notification_digest_max_items:
+        items = items + [item]
+    count = digest["count"] + 1
+    notification.title, notification.message = digest_text(items, count)
+    # JSON columns are not mutation-tracked; assign a new value
+    notification.data = {"digest": {"count": count, "items": items}}
+    # Open notification streams send the merged row again
+    notification.changed_at = func.now()
+
+async def _open_digest(
+    db: AsyncSession,
+    user_id: int,
+    notification_type: NotificationType,
+    related_entity_type: Optional[str],
+    related_entity_id: Optional[int],
+    now: datetime
+) -> Optional[Notification]:
+    # A row the delivery worker has claimed has had next_attempt_at pushed
+    # past coalesce_until, so it no longer matches once the lock is granted
+    result = await db.execute(
+        select(Notification)
+        .where(
+            Notification.user_id == user_id,
+            Notification.notification_type == notification_type,
+            Notification.related_entity_type.is_not_distinct_from(related_entity_type),
+            Notification.related_entity_id.is_not_distinct_from(related_entity_id),
+            Notification.status == NotificationStatus.PENDING,
+            Notification.coalesce_until > now,
+            Notification.next_attempt_at == Notification.coalesce_until
+        )
+        .order_by(Notification.id.desc())
+        .limit(1)
+        .with_for_update()
+    )
+    return result.scalars().first()
+
+async def queue_notification(
+    db: AsyncSession,
+    user_id: int,
+    notification_type: NotificationType,
+    title: str,
+    message: str,
+    created_by: int,
+    related_entity_type: Optional[str] = None,
+    related_entity_id: Optional[int] = None,
+    data: Optional[Dict[str, Any]] = None
+) -> Notification:
+    """Notify user_id of an event as part of the caller's transaction.
+
+    Unless the user opted out of digests, an event is merged into the open
+    digest of the same type and related entity, if there is one; otherwise
+    it opens a digest that collects events for the user's digest window and
+    is delivered when the window closes. Either way the user has one inbox
+    row (and one unread) per event or digest, shown right away.
+    """
+    preference = await db.get(NotificationPreference, user_id)
+    window = digest_window_seconds(preference)
+    now = datetime.now(timezone.utc)
+    item = {"title": title, "message": message, "data": data or {}}
+
+    notification = None
+    if window > 0:
+        notification = await _open_digest(db, user_id, notification_type, related_entity_type, related_entity_id, now)
+    if notification is not None:
+        merge_into_digest(notification, item)
+    else:
+        coalesce_until = now + timedelta(seconds=window) if window > 0 else None
+        notification = Notification(
+            user_id=user_id,
+            title=title,
+            message=message,
+            notification_type=notification_type,
+            channel=notification_channel(preference),
+            status=NotificationStatus.PENDING,
+            related_entity_type=related_entity_type,
+            related_entity_id=related_entity_id,
+            data={**(data or {}), "digest": {"count": 1, "items": [item]}} if window > 0 else data,
+            next_attempt_at=coalesce_until or now,
+            coalesce_until=coalesce_until,
+            created_by=created_by
+        )
+        db.add(notification)
+    # Later events of the same transaction find the digest opened here
+    await db.flush()
+    return notification
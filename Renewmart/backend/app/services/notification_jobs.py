@@ -0,0 +1,206 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, false, func, insert, literal, or_, select, true, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Tuple
+import logging
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.models.land_parcel import LandParcel, Task
+from app.models.notification import (
+    Notification, NotificationJob, NotificationJobStatus, NotificationStatus, NotificationTemplate
+)
+from app.models.project import DevelopmentProject
+from app.models.user import User, UserType
+from app.services.templates import recipient_context, template_renderer
+from app.services.worker import PollingWorker, wake_on_commit
+
+logger = logging.getLogger(__name__)
+
+def audience_filter(audience: dict):
+    """WHERE clause on users selecting the active members of an audience
+    (a NotificationAudience as stored on the job)"""
+    selectors = []
+    if audience.get("all_users"):
+        selectors.append(true())
+    if audience.get("user_ids"):
+        selectors.append(User.id.in_(audience["user_ids"]))
+    if audience.get("user_types"):
+        selectors.append(User.user_type.in_([UserType(user_type) for user_type in audience["user_types"]]))
+    if audience.get("project_ids"):
+        project_ids = audience["project_ids"]
+        selectors.append(User.id.in_(
+            select(DevelopmentProject.project_manager_id).where(DevelopmentProject.id.in_(project_ids))
+        ))
+        selectors.append(User.id.in_(select(Task.assigned_to).where(Task.project_id.in_(project_ids))))
+    if audience.get("parcel_ids"):
+        selectors.append(User.id.in_(
+            select(LandParcel.landowner_id).where(LandParcel.id.in_(audience["parcel_ids"]))
+        ))
+    if not selectors:
+        return false()
+    return and_(User.is_active.is_not(False), or_(*selectors))
+
+class NotificationJobRunner(PollingWorker):
+    """Fans bulk sends out to their audience in the background.
+
+    Recipients are walked in user id order, chunk_size at a time. A chunk of
+    a plain send is one INSERT ... SELECT, so recipients never leave the
+    database; a templated send renders the chunk and inserts it as one
+    multi-row INSERT. Each chunk commits together with the job's progress,
+    and a job whose runner died is resumed after the last committed chunk
+    once its lease expires.
+    """
+
+    name = "Notification job runner"
+
+    def __init__(self, chunk_size: int, poll_interval: float, lease_seconds: float = 300.0):
+        # One job per run; its chunks are processed back to back
+        super().__init__(batch_size=1, poll_interval=poll_interval)
+        self.chunk_size = chunk_size
+        self.lease_seconds = lease_seconds
+
+    async def _claim(self) -> Optional[NotificationJob]:
+        now = datetime.now(timezone.utc)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(NotificationJob)
+                .where(
+                    NotificationJob.status.in_([NotificationJobStatus.QUEUED, NotificationJobStatus.RUNNING]),
+                    NotificationJob.lease_expires_at <= now
+                )
+                .order_by(NotificationJob.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            job = result.scalars().first()
+            if job is not None:
+                job.status = NotificationJobStatus.RUNNING
+                job.started_at = job.started_at or now
+                job.lease_expires_at = now + timedelta(seconds=self.lease_seconds)
+                await db.commit()
+        return job
+
+    async def run_once(self) -> int:
+        job = await self._claim()
+        if job is None:
+            return 0
+        try:
+            await self.run_job(job)
+        except Exception as e:
+            logger.exception("Notification job %s failed", job.id)
+            await self._finish(job, NotificationJobStatus.FAILED, error=str(e) or type(e).__name__)
+        return 1
+
+    async def run_job(self, job: NotificationJob):
+        async with AsyncSessionLocal() as db:
+            if job.total_recipients is None:
+                job.total_recipients = await db.scalar(
+                    select(func.count()).select_from(User).where(audience_filter(job.audience))
+                )
+                await db.execute(
+                    update(NotificationJob)
+                    .where(NotificationJob.id == job.id)
+                    .values(total_recipients=job.total_recipients)
+                )
+                await db.commit()
+            template = await db.get(NotificationTemplate, job.template_id) if job.template_id else None
+
+        while True:
+            async with AsyncSessionLocal() as db:
+                if template is None:
+                    count, last_user_id = await self._insert_chunk(db, job)
+                else:
+                    count, last_user_id = await self._render_chunk(db, job, template)
+                if count == 0:
+                    break
+                # Progress commits with the chunk. Matching on last_user_id
+                # stops a runner whose lease was taken over meanwhile.
+                result = await db.execute(
+                    update(NotificationJob)
+                    .where(NotificationJob.id == job.id, NotificationJob.last_user_id == job.last_user_id)
+                    .values(
+                        sent_count=NotificationJob.sent_count + count,
+                        last_user_id=last_user_id,
+                        lease_expires_at=datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)
+                    )
+                )
+                if result.rowcount != 1:
+                    await db.rollback()
+                    logger.warning("Notification job %s was taken over by another runner", job.id)
+                    return
+                await db.commit()
+            job.last_user_id = last_user_id
+            job.sent_count += count
+
+        await self._finish(job, NotificationJobStatus.COMPLETED)
+
+    def _recipients(self, job: NotificationJob):
+        return (
+            select(User.id)
+            .where(audience_filter(job.audience), User.id > job.last_user_id)
+            .order_by(User.id)
+            .limit(self.chunk_size)
+        )
+
+    async def _insert_chunk(self, db: AsyncSession, job: NotificationJob) -> Tuple[int, int]:
+        recipients = self._recipients(job).subquery()
+        columns = Notification.__table__.c
+        result = await db.execute(
+            insert(Notification)
+            .from_select(
+                ["user_id", "title", "message", "notification_type", "channel", "status", "data", "created_by"],
+                select(
+                    recipients.c.id,
+                    literal(job.title, columns.title.type),
+                    literal(job.message, columns.message.type),
+                    literal(job.notification_type, columns.notification_type.type),
+                    literal(job.channel, columns.channel.type),
+                    literal(NotificationStatus.PENDING, columns.status.type),
+                    literal(job.data or {}, columns.data.type),
+                    literal(job.created_by, columns.created_by.type)
+                )
+            )
+            .returning(Notification.user_id)
+        )
+        user_ids = result.scalars().all()
+        return len(user_ids), max(user_ids, default=job.last_user_id)
+
+    async def _render_chunk(self, db: AsyncSession, job: NotificationJob, template) -> Tuple[int, int]:
+        users = (await db.scalars(
+            select(User).where(User.id.in_(self._recipients(job).scalar_subquery())).order_by(User.id)
+        )).all()
+        if not users:
+            return 0, job.last_user_id
+        texts = template_renderer.render_batch(template, [recipient_context(user, job.data) for user in users])
+        await db.execute(insert(Notification), [
+            dict(
+                user_id=user.id,
+                title=title,
+                message=message,
+                notification_type=job.notification_type,
+                channel=job.channel,
+                status=NotificationStatus.PENDING,
+                data=job.data or {},
+                created_by=job.created_by
+            )
+            for user, (title, message) in zip(users, texts)
+        ])
+        return len(users), users[-1].id
+
+    async def _finish(self, job: NotificationJob, status: NotificationJobStatus, error: Optional[str] = None):
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(NotificationJob)
+                .where(NotificationJob.id == job.id)
+                .values(status=status, error=error, finished_at=datetime.now(timezone.utc))
+            )
+            await db.commit()
+
+job_runner = NotificationJobRunner(
+    chunk_size=settings.notification_job_chunk_size,
+    poll_interval=settings.notification_poll_seconds
+)
+
+# Queued jobs start right after the transaction that queued them commits
+wake_on_commit(job_runner, NotificationJob)
@@ -0,0 +1,167 @@
+from datetime import date, datetime, timezone
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from typing import Iterable, List, Optional
+import asyncio
+import gzip
+import logging
+import os
+import re
+
+from app.core.config import settings
+from app.db.database import async_engine
+from app.services.worker import PollingWorker
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME = re.compile(r"^notifications_(\d{4})_(\d{2})$")
+
+# Partition DDL waits at most this long for locks on notifications, so it
+# never queues traffic behind it; it is retried at the next check instead
+LOCK_TIMEOUT = "5s"
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"notifications_{month:%Y_%m}"
+
+def partition_month(name: str) -> Optional[date]:
+    match = PARTITION_NAME.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+def partition_months(today: date, months_ahead: int) -> List[date]:
+    """Months that must have a partition: this one and months_ahead more"""
+    current = today.replace(day=1)
+    return [add_months(current, offset) for offset in range(months_ahead + 1)]
+
+def expired_partitions(names: Iterable[str], today: date, retention_months: int) -> List[str]:
+    """Partitions holding only rows older than retention_months full months"""
+    cutoff = add_months(today.replace(day=1), -retention_months)
+    expired = []
+    for name in names:
+        month = partition_month(name)
+        if month is not None and month < cutoff:
+            expired.append(name)
+    return sorted(expired)
+
+class NotificationPartitionMaintainer(PollingWorker):
+    """Keeps notifications partitioned by month.
+
+    Every check creates the partitions for the current month and
+    months_ahead more, so inserts never find their partition missing. With
+    a retention, partitions older than retention_months are detached (their
+    rows leave notification_counters in the same transaction), written to
+    archive_dir as gzipped CSV and dropped. A partition detached before a
+    crash is archived at the next check. Does nothing unless notifications
+    is a partitioned table.
+    """
+
+    name = "Notification partition maintainer"
+
+    def __init__(self, months_ahead: int, retention_months: int, archive_dir: str, check_interval: float):
+        super().__init__(batch_size=1, poll_interval=check_interval)
+        self.months_ahead = months_ahead
+        self.retention_months = retention_months
+        self.archive_dir = archive_dir
+
+    async def run_once(self) -> int:
+        if async_engine.dialect.name != "postgresql":
+            return 0
+        today = datetime.now(timezone.utc).date()
+        async with async_engine.connect() as conn:
+            if not await conn.scalar(text(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('notifications'))"
+            )):
+                return 0
+            await conn.commit()
+            attached = set(await self._attached(conn))
+            for month in partition_months(today, self.months_ahead):
+                if partition_name(month) not in attached:
+                    await self._create(conn, month)
+            if self.retention_months > 0:
+                for name in expired_partitions(attached, today, self.retention_months):
+                    await self._detach(conn, name)
+            for name in await self._detached(conn):
+                await self._archive(conn, name)
+        return 0
+
+    async def _attached(self, conn: AsyncConnection) -> List[str]:
+        result = await conn.execute(text("""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'notifications'::regclass
+        """))
+        names = result.scalars().all()
+        await conn.commit()
+        return names
+
+    async def _detached(self, conn: AsyncConnection) -> List[str]:
+        result = await conn.execute(text("""
+            SELECT relname FROM pg_class
+            WHERE relkind = 'r' AND NOT relispartition
+              AND relnamespace = current_schema()::regnamespace
+              AND relname ~ '^notifications_[0-9]{4}_[0-9]{2}$'
+        """))
+        names = sorted(result.scalars().all())
+        await conn.commit()
+        return names
+
+    async def _create(self, conn: AsyncConnection, month: date):
+        name = partition_name(month)
+        try:
+            await conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+            await conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF notifications "
+                f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"
+            ))
+            await conn.commit()
+            logger.info("Created notification partition %s", name)
+        except Exception as e:
+            await conn.rollback()
+            logger.warning("Creating notification partition %s failed: %s", name, e)
+
+    async def _detach(self, conn: AsyncConnection, name: str):
+        try:
+            await conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+            # Detaching does not fire the counting triggers
+            await conn.execute(text(f"""
+                INSERT INTO notification_counters (user_id, total, unread)
+                SELECT user_id, -count(*), -count(*) FILTER (WHERE status IN ('PENDING', 'SENT', 'DELIVERED'))
+                FROM {name} WHERE user_id IS NOT NULL
+                GROUP BY user_id ORDER BY user_id
+                ON CONFLICT (user_id) DO UPDATE SET
+                    total = notification_counters.total + EXCLUDED.total,
+                    unread = notification_counters.unread + EXCLUDED.unread
+            """))
+            await conn.execute(text(f"ALTER TABLE notifications DETACH PARTITION {name}"))
+            await conn.commit()
+            logger.info("Detached notification partition %s", name)
+        except Exception as e:
+            await conn.rollback()
+            logger.warning("Detaching notification partition %s failed: %s", name, e)
+
+    async def _archive(self, conn: AsyncConnection, name: str):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, f"{name}.csv.gz")
+        partial_path = path + ".partial"
+        await conn.begin()
+        raw = await conn.get_raw_connection()
+        async with raw.driver_connection.cursor() as cursor:
+            async with cursor.copy(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)") as copy:
+                with gzip.open(partial_path, "wb") as archive:
+                    async for chunk in copy:
+                        await asyncio.to_thread(archive.write, chunk)
+        await conn.rollback()
+        os.replace(partial_path, path)
+
+        await conn.execute(text(f"DROP TABLE {name}"))
+        await conn.commit()
+        logger.info("Archived notification partition %s to %s", name, path)
+
+partition_maintainer = NotificationPartitionMaintainer(
+    months_ahead=settings.notification_partitions_ahead,
+    retention_months=settings.notification_retention_months,
+    archive_dir=settings.notification_archive_dir,
+    check_interval=settings.notification_partition_check_seconds
+)
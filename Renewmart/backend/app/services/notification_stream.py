@@ -0,0 +1,212 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+import asyncio
+import json
+import logging
+import psycopg
+
+from app.core.config import settings
+from app.core.principal import Principal
+from app.db.database import ASYNC_DATABASE_URL, AsyncSessionLocal
+from app.db.pagination import Keyset
+from app.models.notification import NOTIFICATION_CHANGES_CHANNEL, Notification, NotificationCounter
+from app.schemas.notification import Notification as NotificationSchema
+
+logger = logging.getLogger(__name__)
+
+class NotificationHub:
+    """Wakes the open notification streams of a user when their inbox changes.
+
+    One connection per process LISTENs on notification_changes (sent by a
+    trigger on the notifications table), so a change made by any API or
+    worker process reaches every stream. Wake-ups are doorbells: a stream
+    re-reads what it needs, and several changes before it gets to run
+    collapse into one read. After the listener reconnects every stream is
+    woken, since changes may have been missed in between.
+    """
+
+    def __init__(self, database_url: str, reconnect_seconds: float):
+        self.database_url = make_url(database_url)
+        self.reconnect_seconds = reconnect_seconds
+        self._subscribers: Dict[int, Set[asyncio.Event]] = defaultdict(set)
+        self._task: Optional[asyncio.Task] = None
+
+    @contextmanager
+    def subscribe(self, user_id: int):
+        """Event set whenever user_id's notifications change, for the duration of the block"""
+        changed = asyncio.Event()
+        self._subscribers[user_id].add(changed)
+        try:
+            yield changed
+        finally:
+            subscribers = self._subscribers[user_id]
+            subscribers.discard(changed)
+            if not subscribers:
+                del self._subscribers[user_id]
+
+    def publish(self, user_id: int):
+        for changed in self._subscribers.get(user_id, ()):
+            changed.set()
+
+    def publish_all(self):
+        for user_id in list(self._subscribers):
+            self.publish(user_id)
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    async def _listen(self):
+        # A plain libpq URL for psycopg, outside the engine's pool
+        conninfo = self.database_url.set(drivername="postgresql").render_as_string(hide_password=False)
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(conninfo, autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {NOTIFICATION_CHANGES_CHANNEL}")
+                    self.publish_all()
+                    async for notify in conn.notifies():
+                        try:
+                            self.publish(int(notify.payload))
+                        except ValueError:
+                            pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Notification listener disconnected: %s", e)
+            await asyncio.sleep(self.reconnect_seconds)
+
+    def start(self):
+        if self._task is None and self.database_url.get_backend_name() == "postgresql":
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+notification_hub = NotificationHub(
+    ASYNC_DATABASE_URL,
+    reconnect_seconds=settings.notification_stream_reconnect_seconds
+)
+
+# Position of a notification in a stream, encoded as its event id
+STREAM_KEYSET = Keyset(Notification.changed_at, Notification.id)
+
+def server_sent_event(event: str, data: dict, event_id: Optional[str] = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+async def _read_changes(user_id: int, since: datetime) -> Tuple[Dict[int, datetime], int]:
+    """The changed_at of each notification of user_id changed at or after
+    since, by id, and the unread count"""
+    async with AsyncSessionLocal() as db:
+        window = dict((await db.execute(
+            select(Notification.id, Notification.changed_at)
+            .where(Notification.user_id == user_id, Notification.changed_at >= since)
+        )).all())
+        counter = await db.get(NotificationCounter, user_id)
+        unread_count = counter.unread if counter else 0
+    return window, unread_count
+
+async def _load(ids: List[int]) -> List[Notification]:
+    async with AsyncSessionLocal() as db:
+        return (await db.scalars(
+            select(Notification).where(Notification.id.in_(ids)).order_by(*STREAM_KEYSET.order_by())
+        )).all()
+
+def _unsent(window: Dict[int, datetime], sent: Dict[int, datetime], limit: int) -> List[int]:
+    """Ids of up to limit notifications of window not sent with their current
+    changed_at, earliest change first"""
+    changes = sorted((changed_at, id) for id, changed_at in window.items() if sent.get(id) != changed_at)
+    return [id for _, id in changes[:limit]]
+
+def _resume_position(last_event_id: Optional[str]) -> Optional[datetime]:
+    """The change time a Last-Event-ID resumes a stream from; None (also for
+    ids this stream does not understand) starts a new stream"""
+    if not last_event_id:
+        return None
+    try:
+        return STREAM_KEYSET.decode(last_event_id)[0]
+    except HTTPException:
+        return None
+
+async def notification_events(
+    principal: Principal,
+    last_event_id: Optional[str],
+    expires_at: Optional[datetime],
+    hub: NotificationHub = notification_hub,
+    heartbeat_seconds: float = settings.notification_stream_heartbeat_seconds,
+    lookback_seconds: float = settings.notification_stream_lookback_seconds,
+    page_size: int = 100
+) -> AsyncIterator[str]:
+    """Server-sent events for a user's inbox.
+
+    Sends the unread count on connect, then every new notification (as a
+    "notification" event whose id resumes the stream through Last-Event-ID)
+    and the unread count whenever it changes. A digest is sent again each
+    time an event is merged into it; clients replace notifications by id.
+    No database connection is held while waiting for changes. The stream
+    ends with an "expired" event one heartbeat before the access token it was
+    opened with expires, so clients refresh their session and reconnect while
+    the old token still works.
+
+    changed_at is set when a transaction starts, so a change can commit after
+    later ones were sent. Every read covers the last lookback_seconds of
+    changes and skips those already sent, rather than only reading past the
+    latest one.
+    """
+    deadline = expires_at - timedelta(seconds=heartbeat_seconds) if expires_at else None
+    with hub.subscribe(principal.id) as changed:
+        lookback = timedelta(seconds=lookback_seconds)
+        resumed_from = _resume_position(last_event_id)
+        # A new stream does not replay the inbox: what changed before it
+        # opened counts as sent
+        replay = resumed_from is not None
+        latest = resumed_from or datetime.now(timezone.utc)
+        # changed_at of the notifications sent, by id, within the lookback
+        sent: Dict[int, datetime] = {}
+        sent_unread_count = None
+        while True:
+            # Cleared before reading, so a change committed meanwhile wakes us again
+            changed.clear()
+            window, unread_count = await _read_changes(principal.id, latest - lookback)
+            ids = _unsent(window, sent, page_size) if replay else []
+            if not replay:
+                sent.update(window)
+                replay = True
+            for notification in await _load(ids) if ids else []:
+                sent[notification.id] = notification.changed_at
+                latest = max(latest, notification.changed_at)
+                data = NotificationSchema.model_validate(notification).model_dump(mode="json")
+                event_id = STREAM_KEYSET.encode(STREAM_KEYSET.key_of(notification))
+                yield server_sent_event("notification", data, event_id=event_id)
+            sent = {id: changed_at for id, changed_at in sent.items() if changed_at >= latest - lookback}
+            if unread_count != sent_unread_count:
+                yield server_sent_event("unread_count", {"unread_count": unread_count})
+                sent_unread_count = unread_count
+            if len(ids) == page_size:
+                continue
+
+            while not changed.is_set():
+                remaining = (deadline - datetime.now(timezone.utc)).total_seconds() if deadline else None
+                if remaining is not None and remaining <= 0:
+                    yield server_sent_event("expired", {"detail": "Access token expired"})
+                    return
+                expiring = remaining is not None and remaining <= heartbeat_seconds
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=remaining if expiring else heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    if not expiring:
+                        # A comment line; keeps proxies from closing the idle connection
+                        yield ": keepalive\n\n"
@@ -0,0 +1,91 @@
+from collections import OrderedDict
+from jinja2 import StrictUndefined, TemplateError as JinjaTemplateError, meta
+from jinja2.sandbox import SandboxedEnvironment
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Available to every template in addition to its declared variables
+RECIPIENT_VARIABLES = ("user_name", "user_email")
+
+class TemplateError(ValueError):
+    """A notification template that does not compile or cannot be rendered"""
+
+class CompiledTemplate:
+    def __init__(self, subject, message, variables: Iterable[str]):
+        self.subject = subject
+        self.message = message
+        self.variables = list(variables)
+
+    def render(self, context: Dict[str, Any]) -> Tuple[str, str]:
+        """Render (subject, message); raises TemplateError when a declared
+        variable is missing from context"""
+        missing = [name for name in self.variables if name not in context]
+        if missing:
+            raise TemplateError(f"Missing template variables: {', '.join(missing)}")
+        try:
+            return self.subject.render(context), self.message.render(context)
+        except JinjaTemplateError as e:
+            raise TemplateError(str(e))
+
+class TemplateRenderer:
+    """Compiles notification templates once and caches them.
+
+    Entries are keyed by template id and updated_at, so an edited template
+    is recompiled on first use and the stale entry ages out of the LRU.
+    Templates run in Jinja's sandbox and may only reference their declared
+    variables plus RECIPIENT_VARIABLES.
+    """
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self.environment = SandboxedEnvironment(undefined=StrictUndefined, autoescape=False)
+        self._compiled: "OrderedDict[Tuple[int, Any], CompiledTemplate]" = OrderedDict()
+        self._lock = Lock()
+
+    def validate(self, subject_template: str, message_template: str, variables: List[str]):
+        """Raise TemplateError unless both sources compile and only use declared variables"""
+        allowed = set(variables) | set(RECIPIENT_VARIABLES)
+        for source in (subject_template, message_template):
+            try:
+                used = meta.find_undeclared_variables(self.environment.parse(source or ""))
+            except JinjaTemplateError as e:
+                raise TemplateError(f"Invalid template: {e}")
+            undeclared = sorted(used - allowed)
+            if undeclared:
+                raise TemplateError(f"Undeclared template variables: {', '.join(undeclared)}")
+
+    def compile(self, template) -> CompiledTemplate:
+        key = (template.id, template.updated_at)
+        with self._lock:
+            compiled = self._compiled.get(key)
+            if compiled is not None:
+                self._compiled.move_to_end(key)
+                return compiled
+
+        self.validate(template.subject_template, template.message_template, template.variables or [])
+        compiled = CompiledTemplate(
+            self.environment.from_string(template.subject_template or ""),
+            self.environment.from_string(template.message_template or ""),
+            template.variables or []
+        )
+        with self._lock:
+            self._compiled[key] = compiled
+            while len(self._compiled) > self.max_size:
+                self._compiled.popitem(last=False)
+        return compiled
+
+    def render_batch(self, template, contexts: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+        """Render a template for many recipients; every context is validated
+        before anything is rendered"""
+        compiled = self.compile(template)
+        for context in contexts:
+            missing = [name for name in compiled.variables if name not in context]
+            if missing:
+                raise TemplateError(f"Missing template variables: {', '.join(missing)}")
+        return [compiled.render(context) for context in contexts]
+
+def recipient_context(user, data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Template variables for one recipient: the send's data plus RECIPIENT_VARIABLES"""
+    return {**(data or {}), "user_name": user.name, "user_email": user.email}
+
+template_renderer = TemplateRenderer()
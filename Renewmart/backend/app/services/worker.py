@@ -0,0 +1,93 @@
+from abc import ABC, abstractmethod
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from typing import Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+def backoff_seconds(attempts: int, base_seconds: float, max_seconds: float) -> float:
+    """Exponential backoff after the given number of failed attempts"""
+    return min(max_seconds, base_seconds * 2 ** (attempts - 1))
+
+class PollingWorker(ABC):
+    """Background task processing a table-backed queue in batches.
+
+    Subclasses implement run_once(), which claims and processes one batch
+    and returns how many rows it claimed. Full batches are processed back to
+    back; otherwise the worker sleeps for poll_interval or until wake().
+    """
+
+    name = "worker"
+
+    def __init__(self, batch_size: int, poll_interval: float):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @abstractmethod
+    async def run_once(self) -> int:
+        """Claim and process one batch; returns how many rows were claimed"""
+
+    async def on_idle(self):
+        """Called whenever the queue has been drained (or processing failed)"""
+
+    def wake(self):
+        """Process queued rows now instead of at the next poll"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def run_forever(self):
+        self._wake = asyncio.Event()
+        while True:
+            try:
+                while await self.run_once() >= self.batch_size:
+                    pass
+            except Exception:
+                logger.exception("%s failed", self.name)
+            finally:
+                await self.on_idle()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+def wake_on_commit(worker: PollingWorker, model):
+    """Wake worker whenever a transaction that inserted model rows commits"""
+    key = f"wake_{model.__tablename__}"
+
+    @event.listens_for(Session, "after_flush")
+    def _remember_inserts(session, flush_context):
+        if any(isinstance(instance, model) for instance in session.new):
+            session.info[key] = True
+
+    @event.listens_for(Session, "do_orm_execute")
+    def _remember_bulk_inserts(orm_execute_state):
+        # insert(model) statements, which never pass through session.new
+        if orm_execute_state.is_insert and orm_execute_state.bind_mapper is model.__mapper__:
+            orm_execute_state.session.info[key] = True
+
+    @event.listens_for(Session, "after_commit")
+    def _wake_worker(session):
+        if session.info.pop(key, False):
+            worker.wake()
+
+    @event.listens_for(Session, "after_rollback")
+    def _forget_inserts(session):
+        session.info.pop(key, None)
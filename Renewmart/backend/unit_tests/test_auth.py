@@ -13,9 +13,11 @@ class DummyForm:
 @pytest.mark.asyncio
 async def test_login_wrong_password_raises_401(monkeypatch):
     # Mock authenticate_user to simulate wrong password (returns None)
+    async def mock_authenticate_user(db, username, password):
+        return None
     monkeypatch.setattr(
         "backend.app.api.endpoints.auth.authenticate_user",
-        lambda db, username, password: None
+        mock_authenticate_user
     )
     # Mock create_access_token to ensure it's never called (fails test if it is)
     def _should_not_be_called(*args, **kwargs):  # pragma: no cover
@@ -39,7 +41,7 @@ from backend.app.api.endpoints.auth import login
 @pytest.mark.asyncio
 async def test_login_unknown_user_raises_401(monkeypatch):
     # Mock authenticate_user to simulate unknown user
-    def mock_authenticate_user(db, username, password):
+    async def mock_authenticate_user(db, username, password):
         return None
     monkeypatch.setattr(
         "backend.app.api.endpoints.auth.authenticate_user",
@@ -78,7 +80,7 @@ async def test_login_happy_path(monkeypatch):
     dummy_user = types.SimpleNamespace(email=dummy_username)
 
     # Mock authenticate_user to return a valid user
-    def fake_authenticate_user(db, username, password):
+    async def fake_authenticate_user(db, username, password):
         assert db is dummy_db
         assert username == dummy_username
         assert password == dummy_password
@@ -151,9 +153,11 @@ async def test_login_happy_path(monkeypatch):
     dummy_user = SimpleNamespace(email=test_email)
 
     # Mock database interaction and authentication
+    async def fake_authenticate_user(db, username, password):
+        return dummy_user
     monkeypatch.setattr(
         "app.api.endpoints.auth.authenticate_user",
-        lambda db, username, password: dummy_user
+        fake_authenticate_user
     )
 
     # Mock token creation to return a predictable value
@@ -191,7 +195,9 @@ async def test_login_generates_token_with_correct_expiration(monkeypatch):
     captured = {}
 
     # Mock dependencies
-    monkeypatch.setattr(auth_module, "authenticate_user", lambda db, username, password: dummy_user)
+    async def fake_authenticate_user(db, username, password):
+        return dummy_user
+    monkeypatch.setattr(auth_module, "authenticate_user", fake_authenticate_user)
 
     def fake_create_access_token(*, data, expires_delta):
         captured["data"] = data
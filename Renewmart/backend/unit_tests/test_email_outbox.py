@@ -0,0 +1,26 @@
+from app.models.notification import EmailOutbox
+from app.services.email_outbox import EmailOutboxSender, MemoryTransport, build_message
+
+def make_sender():
+    return EmailOutboxSender(
+        transport=MemoryTransport(),
+        batch_size=10,
+        poll_interval=1,
+        max_attempts=5,
+        retry_base_seconds=30,
+        retry_max_seconds=600
+    )
+
+def test_retry_delay_backs_off_exponentially_up_to_the_cap():
+    sender = make_sender()
+
+    assert [sender.retry_delay(attempts) for attempts in range(1, 7)] == [30, 60, 120, 240, 480, 600]
+
+def test_build_message_from_outbox_row():
+    email = EmailOutbox(recipient="a@example.com", subject="Hello", body="<p>Hi</p>", subtype="html")
+
+    message = build_message(email, "noreply@example.com")
+
+    assert (message["From"], message["To"], message["Subject"]) == ("noreply@example.com", "a@example.com", "Hello")
+    assert message.get_content_type() == "text/html"
+    assert "<p>Hi</p>" in message.get_content()
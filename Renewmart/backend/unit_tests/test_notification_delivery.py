@@ -0,0 +1,87 @@
+import pytest
+from datetime import datetime, timezone
+from sqlalchemy.dialects import postgresql
+
+from app.models.notification import Notification, NotificationChannel, NotificationStatus
+from app.models.user import User
+from app.services import notification_delivery
+from app.services.notification_delivery import ChannelAdapter, EmailAdapter, InAppAdapter, NotificationDeliveryWorker
+from app.services.worker import PollingWorker
+
+class FlakyAdapter(ChannelAdapter):
+    concurrency = 2
+
+    async def deliver(self, notification, recipient):
+        if notification.id % 2:
+            raise ConnectionError("provider unavailable")
+
+def make_worker():
+    return NotificationDeliveryWorker(batch_size=10, poll_interval=1, retry_base_seconds=60, retry_max_seconds=3600)
+
+@pytest.mark.asyncio
+async def test_adapter_reports_an_error_per_failed_item():
+    items = [(Notification(id=i), User(id=1)) for i in range(1, 5)]
+
+    errors = await FlakyAdapter().deliver_batch(items)
+
+    assert errors == ["provider unavailable", None, "provider unavailable", None]
+
+@pytest.mark.asyncio
+async def test_channels_without_adapter_fail_every_item():
+    worker = make_worker()
+    items = [(Notification(id=1), User(id=1))]
+
+    assert await worker._dispatch(NotificationChannel.SMS, items) == ["No delivery adapter for channel sms"]
+
+    worker.register_adapter(NotificationChannel.SMS, FlakyAdapter())
+    assert await worker._dispatch(NotificationChannel.SMS, items) == ["provider unavailable"]
+
+class RecordingSession:
+    def __init__(self):
+        self.added = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    def add(self, row):
+        self.added.append(row)
+
+    async def commit(self):
+        pass
+
+@pytest.mark.asyncio
+async def test_email_notifications_are_sent_as_plain_text(monkeypatch):
+    session = RecordingSession()
+    monkeypatch.setattr(notification_delivery, "AsyncSessionLocal", lambda: session)
+    notification = Notification(id=1, title="Hi", message="<script>alert(1)</script>")
+
+    assert await EmailAdapter().deliver_batch([(notification, User(id=1, email="a@example.com"))]) == [None]
+    assert [(email.subtype, email.body) for email in session.added] == [("plain", "<script>alert(1)</script>")]
+
+def test_sms_rows_without_adapter_stay_pending_and_unclaimed():
+    worker = make_worker()
+    worker.register_adapter(NotificationChannel.IN_APP, InAppAdapter())
+    worker.register_adapter(NotificationChannel.EMAIL, EmailAdapter())
+
+    due = str(worker._due(datetime.now(timezone.utc)).compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    ))
+
+    # An SMS row is never claimed, so it cannot exhaust its retries and turn FAILED
+    assert "notifications.channel IN ('IN_APP', 'EMAIL')" in due
+    assert "SMS" not in due
+
+def test_adapters_and_workers_must_implement_their_method():
+    class NoDeliver(ChannelAdapter):
+        pass
+
+    class NoRunOnce(PollingWorker):
+        pass
+
+    with pytest.raises(TypeError):
+        NoDeliver()
+    with pytest.raises(TypeError):
+        NoRunOnce(batch_size=1, poll_interval=1)
@@ -0,0 +1,89 @@
+import pytest
+
+from app.core.config import settings
+from app.models.notification import (
+    Notification, NotificationChannel, NotificationPreference, NotificationStatus, NotificationType
+)
+from app.services.notification_digest import (
+    digest_text, digest_window_seconds, notification_channel, queue_notification
+)
+
+class FakeResult:
+    def __init__(self, row):
+        self.row = row
+
+    def scalars(self):
+        return self
+
+    def first(self):
+        return self.row
+
+class FakeSession:
+    """Serves the open digest lookup from the rows added so far"""
+
+    def __init__(self, preference=None):
+        self.preference = preference
+        self.added = []
+
+    async def get(self, model, key):
+        return self.preference
+
+    async def execute(self, stmt):
+        open_digests = [row for row in self.added if row.coalesce_until is not None]
+        return FakeResult(open_digests[-1] if open_digests else None)
+
+    def add(self, row):
+        self.added.append(row)
+
+    async def flush(self):
+        pass
+
+def unread(rows):
+    return sum(row.status == NotificationStatus.PENDING for row in rows)
+
+def test_single_event_keeps_its_text():
+    assert digest_text([{"title": "New task assigned", "message": "Survey"}], 1) == ("New task assigned", "Survey")
+
+def test_digest_lists_items_and_counts_the_rest():
+    items = [{"title": "New task assigned", "message": "Survey"}, {"title": "New task assigned", "message": "Permit"}]
+    title, message = digest_text(items, 5)
+    assert title == "New task assigned (+4 more)"
+    assert message == "- Survey\n- Permit\n...and 3 more"
+
+def test_preferences_choose_window_and_channel():
+    assert digest_window_seconds(None) == settings.notification_digest_window_seconds
+    assert digest_window_seconds(NotificationPreference(digest_enabled=False, digest_window_seconds=60)) == 0
+    assert digest_window_seconds(NotificationPreference(digest_enabled=True, digest_window_seconds=60)) == 60
+    assert notification_channel(None) == NotificationChannel.EMAIL
+    assert notification_channel(NotificationPreference(email_enabled=False)) == NotificationChannel.IN_APP
+
+@pytest.mark.asyncio
+async def test_each_event_is_one_inbox_row_without_digests():
+    db = FakeSession(NotificationPreference(digest_enabled=False, email_enabled=True))
+    for task_id in (1, 2):
+        await queue_notification(
+            db, 5, NotificationType.TASK_ASSIGNED, "New task assigned", f"Task {task_id}",
+            created_by=1, related_entity_type="project", related_entity_id=9, data={"task_id": task_id}
+        )
+
+    assert len(db.added) == 2
+    assert unread(db.added) == 2
+    assert [row.channel for row in db.added] == [NotificationChannel.EMAIL] * 2
+    assert [row.data for row in db.added] == [{"task_id": 1}, {"task_id": 2}]
+
+@pytest.mark.asyncio
+async def test_digest_is_one_inbox_row_with_every_event_data():
+    db = FakeSession()
+    for task_id in (1, 2, 3):
+        await queue_notification(
+            db, 5, NotificationType.TASK_ASSIGNED, "New task assigned", f"Task {task_id}",
+            created_by=1, related_entity_type="project", related_entity_id=9, data={"task_id": task_id}
+        )
+
+    [digest] = db.added
+    assert unread(db.added) == 1
+    assert digest.title == "New task assigned (+2 more)"
+    assert digest.data["digest"]["count"] == 3
+    assert [item["data"]["task_id"] for item in digest.data["digest"]["items"]] == [1, 2, 3]
+    # The payload of the first event no longer describes the row
+    assert "task_id" not in digest.data
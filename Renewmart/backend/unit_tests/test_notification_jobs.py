@@ -0,0 +1,22 @@
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.models.user import User
+from app.services.notification_jobs import audience_filter
+
+def compiled(audience):
+    query = select(User.id).where(audience_filter(audience))
+    return str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+def test_audience_selectors_are_combined_in_one_query():
+    sql = compiled({"user_types": ["investor"], "project_ids": [3], "parcel_ids": [7]})
+
+    assert "users.is_active IS NOT false" in sql
+    assert "users.user_type IN ('INVESTOR')" in sql
+    assert "development_projects.project_manager_id" in sql
+    assert "tasks.assigned_to" in sql
+    assert "land_parcels.landowner_id" in sql
+
+def test_empty_audience_selects_nobody():
+    assert "false" in compiled({}).lower()
+    assert "true" in compiled({"all_users": True}).lower()
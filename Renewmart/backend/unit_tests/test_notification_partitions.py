@@ -0,0 +1,39 @@
+from datetime import date
+from sqlalchemy import create_mock_engine
+
+from app.core.config import settings
+from app.models.notification import Notification
+from app.services.notification_partitions import (
+    add_months, expired_partitions, partition_month, partition_months, partition_name
+)
+
+def test_add_months_crosses_years():
+    assert add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+    assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+
+def test_partition_months_covers_current_and_ahead():
+    months = partition_months(date(2025, 12, 17), 2)
+    assert [partition_name(month) for month in months] == [
+        "notifications_2025_12", "notifications_2026_01", "notifications_2026_02"
+    ]
+
+def test_partition_month_ignores_other_tables():
+    assert partition_month("notifications_2025_03") == date(2025, 3, 1)
+    assert partition_month("notifications_partitioned") is None
+
+def test_expired_partitions_keeps_retention_window():
+    names = ["notifications_2024_09", "notifications_2024_10", "notifications_2025_10", "notification_counters"]
+    assert expired_partitions(names, date(2025, 10, 5), 12) == ["notifications_2024_09"]
+
+def test_create_all_creates_partitions_to_insert_into():
+    statements = []
+    engine = create_mock_engine(
+        "postgresql+psycopg://", lambda sql, *multiparams, **params: statements.append(str(sql.compile(dialect=engine.dialect)))
+    )
+    Notification.__table__.create(engine)
+
+    [table] = [i for i, statement in enumerate(statements) if statement.strip().startswith("CREATE TABLE notifications")]
+    [partitions] = [i for i, statement in enumerate(statements) if "PARTITION OF notifications" in statement]
+    assert "PARTITION BY RANGE (created_at)" in statements[table]
+    assert partitions > table
+    assert f"interval '{settings.notification_partitions_ahead} months'" in statements[partitions]
@@ -0,0 +1,19 @@
+from app.api.endpoints.notifications import _summarize_counts
+from app.models.notification import NotificationStatus, NotificationType
+
+def test_summary_folds_grouped_counts():
+    rows = [
+        (NotificationStatus.PENDING, NotificationType.TASK_ASSIGNED, 2),
+        (NotificationStatus.DELIVERED, NotificationType.SLA_BREACH, 3),
+        (NotificationStatus.READ, NotificationType.TASK_ASSIGNED, 4),
+        (NotificationStatus.FAILED, None, 1),
+    ]
+
+    stats = _summarize_counts(rows)
+
+    assert stats["total_notifications"] == 10
+    assert stats["unread_notifications"] == 5
+    assert stats["read_notifications"] == 4
+    assert stats["by_type"]["task_assigned"] == 6
+    assert stats["by_type"]["sla_breach"] == 3
+    assert stats["by_type"]["milestone_reached"] == 0
@@ -0,0 +1,145 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+
+from app.api.endpoints import auth
+from app.core.principal import Principal
+from app.models.notification import Notification, NotificationChannel, NotificationStatus, NotificationType
+from app.models.user import User, UserType
+from app.schemas.user import RefreshTokenRequest
+from app.services import notification_stream
+from app.services.notification_stream import STREAM_KEYSET, NotificationHub, notification_events
+
+def make_hub():
+    return NotificationHub("sqlite+aiosqlite://", reconnect_seconds=1)
+
+@pytest.mark.asyncio
+async def test_publish_wakes_only_the_users_streams():
+    hub = make_hub()
+
+    with hub.subscribe(1) as first, hub.subscribe(2) as second:
+        hub.publish(1)
+        assert first.is_set() and not second.is_set()
+        assert hub.subscriber_count() == 2
+    assert hub.subscriber_count() == 0
+
+class FakeInbox:
+    """Serves the stream's reads from notifications kept in memory"""
+
+    def __init__(self, unread_count=2):
+        self.rows = {}
+        self.unread_count = unread_count
+
+    def put(self, id, changed_at, title="Hi"):
+        self.rows[id] = Notification(
+            id=id, user_id=1, title=title, message="There", status=NotificationStatus.PENDING,
+            notification_type=NotificationType.TASK_ASSIGNED, channel=NotificationChannel.IN_APP,
+            retry_count=0, max_retries=3, created_by=1, created_at=changed_at, changed_at=changed_at
+        )
+
+    async def read_changes(self, user_id, since):
+        window = {id: row.changed_at for id, row in self.rows.items() if row.changed_at >= since}
+        return window, self.unread_count
+
+    async def load(self, ids):
+        return sorted((self.rows[id] for id in ids), key=lambda row: (row.changed_at, row.id))
+
+def use_inbox(monkeypatch, inbox):
+    monkeypatch.setattr(notification_stream, "_read_changes", inbox.read_changes)
+    monkeypatch.setattr(notification_stream, "_load", inbox.load)
+
+principal = Principal(id=1, email="a@x.com", user_type=UserType.ADMIN, is_active=True, token_version=0)
+
+@pytest.mark.asyncio
+async def test_stream_pushes_changes_until_the_token_expires(monkeypatch):
+    hub = make_hub()
+    inbox = FakeInbox()
+    now = datetime.now(timezone.utc)
+    inbox.put(4, now - timedelta(seconds=1))
+    use_inbox(monkeypatch, inbox)
+    # Expired one heartbeat early: 0.2s from now
+    events = notification_events(principal, None, now + timedelta(seconds=5.2), hub=hub, heartbeat_seconds=5)
+
+    # The notification from before the stream opened is not replayed
+    assert await events.__anext__() == 'event: unread_count\ndata: {"unread_count": 2}\n\n'
+    inbox.put(5, now)
+    inbox.unread_count = 3
+    hub.publish(1)
+    pushed = await events.__anext__()
+    event_id = STREAM_KEYSET.encode([now, 5])
+    assert pushed.startswith(f"event: notification\nid: {event_id}\n") and '"title": "Hi"' in pushed
+    assert await events.__anext__() == 'event: unread_count\ndata: {"unread_count": 3}\n\n'
+    assert (await events.__anext__()).startswith("event: expired")
+    with pytest.raises(StopAsyncIteration):
+        await events.__anext__()
+
+@pytest.mark.asyncio
+async def test_stream_sends_late_commits_and_merged_digests_once(monkeypatch):
+    hub = make_hub()
+    inbox = FakeInbox()
+    now = datetime.now(timezone.utc)
+    use_inbox(monkeypatch, inbox)
+    events = notification_events(principal, None, None, hub=hub)
+    assert (await events.__anext__()).startswith("event: unread_count")
+
+    inbox.put(6, now)
+    hub.publish(1)
+    assert "id: " + STREAM_KEYSET.encode([now, 6]) in await events.__anext__()
+    # Changed in a transaction that started first but committed after 6 was sent
+    inbox.put(5, now - timedelta(seconds=1))
+    hub.publish(1)
+    assert "id: " + STREAM_KEYSET.encode([now - timedelta(seconds=1), 5]) in await events.__anext__()
+    # A digest merge keeps the row's id and moves its changed_at
+    inbox.put(6, now + timedelta(seconds=1), title="Hi (+1 more)")
+    hub.publish(1)
+    merged = await events.__anext__()
+    assert "id: " + STREAM_KEYSET.encode([now + timedelta(seconds=1), 6]) in merged
+    assert '"title": "Hi (+1 more)"' in merged
+    # Nothing is sent twice
+    hub.publish(1)
+    inbox.unread_count = 3
+    assert (await events.__anext__()).startswith("event: unread_count")
+    await events.aclose()
+
+@pytest.mark.asyncio
+async def test_resumed_stream_sends_changes_after_its_last_event(monkeypatch):
+    hub = make_hub()
+    inbox = FakeInbox()
+    now = datetime.now(timezone.utc)
+    inbox.put(3, now - timedelta(minutes=5))
+    inbox.put(7, now)
+    use_inbox(monkeypatch, inbox)
+
+    events = notification_events(principal, STREAM_KEYSET.encode([now - timedelta(minutes=1), 4]), None, hub=hub)
+    assert "id: " + STREAM_KEYSET.encode([now, 7]) in await events.__anext__()
+    assert (await events.__anext__()).startswith("event: unread_count")
+    await events.aclose()
+
+    # An id from before change cursors starts a new stream
+    events = notification_events(principal, "5", None, hub=hub)
+    assert (await events.__anext__()).startswith("event: unread_count")
+    await events.aclose()
+
+@pytest.mark.asyncio
+async def test_expired_stream_reconnects_with_the_refresh_token(monkeypatch):
+    hub = make_hub()
+
+    async def rotate_session(db, refresh_token):
+        assert refresh_token == "first"
+        return User(id=1, email="a@x.com", user_type=UserType.ADMIN, is_active=True, token_version=0), "second"
+
+    use_inbox(monkeypatch, FakeInbox())
+    monkeypatch.setattr(auth, "rotate_session", rotate_session)
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=1.1)
+    events = notification_events(principal, None, expires_at, hub=hub, heartbeat_seconds=1)
+
+    assert (await events.__anext__()).startswith("event: unread_count")
+    assert (await events.__anext__()).startswith("event: expired")
+    # The old token still works, but reconnecting only needs the refresh token
+    assert datetime.now(timezone.utc) < expires_at
+    refreshed = await auth.refresh_session(RefreshTokenRequest(refresh_token="first"), db=None)
+    assert refreshed["refresh_token"] == "second"
+
+    exp = auth.decode_token(refreshed["access_token"])["exp"]
+    reopened = notification_events(principal, None, datetime.fromtimestamp(exp, timezone.utc), hub=hub, heartbeat_seconds=1)
+    assert (await reopened.__anext__()) == 'event: unread_count\ndata: {"unread_count": 2}\n\n'
+    await reopened.aclose()
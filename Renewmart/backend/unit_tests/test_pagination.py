@@ -0,0 +1,38 @@
+import pytest
+from datetime import datetime, timezone
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.db.pagination import Keyset
+from app.models.notification import Notification
+from app.models.land_parcel import LandParcel
+from app.main import app, cors_origins
+
+def test_cursor_round_trip_with_timestamp():
+    keyset = Keyset(Notification.created_at, Notification.id, descending=True)
+    values = [datetime(2025, 3, 1, 12, 30, tzinfo=timezone.utc), 42]
+
+    cursor = keyset.encode(values)
+
+    assert "=" not in cursor
+    assert keyset.decode(cursor) == values
+
+def test_cursor_round_trip_with_id():
+    keyset = Keyset(LandParcel.id)
+
+    assert keyset.decode(keyset.encode([7])) == [7]
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", Keyset(LandParcel.id).encode([1, 2])])
+def test_invalid_cursor_is_rejected(cursor):
+    keyset = Keyset(LandParcel.id)
+
+    with pytest.raises(HTTPException) as exc_info:
+        keyset.decode(cursor)
+
+    assert exc_info.value.status_code == 400
+
+def test_pagination_headers_are_exposed_to_cross_origin_clients():
+    response = TestClient(app).get("/", headers={"Origin": cors_origins[0]})
+
+    exposed = {name.strip().lower() for name in response.headers["access-control-expose-headers"].split(",")}
+    assert {"x-next-cursor", "link"} <= exposed
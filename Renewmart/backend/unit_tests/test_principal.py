@@ -0,0 +1,68 @@
+import pytest
+
+from app.core.principal import Principal, token_claims
+from app.core.principal_cache import TokenVersionCache
+from app.models.user import User, UserType
+
+class FakeResult:
+    def __init__(self, row):
+        self.row = row
+
+    def first(self):
+        return self.row
+
+class FakeSession:
+    def __init__(self, version):
+        self.version = version
+        self.queries = 0
+        self.info = {}
+        self.replica_queries = 0
+
+    async def execute(self, stmt):
+        self.queries += 1
+        if self.info.get("allow_replica"):
+            self.replica_queries += 1
+        return FakeResult(None if self.version is None else (self.version,))
+
+def test_claims_round_trip():
+    user = User(id=7, email="a@example.com", user_type=UserType.INVESTOR, is_active=True, token_version=3)
+
+    principal = Principal.from_claims(token_claims(user))
+
+    assert principal == Principal(id=7, email="a@example.com", user_type=UserType.INVESTOR, is_active=True, token_version=3)
+    assert principal.user_type.value == "investor"
+
+def test_malformed_claims_are_rejected():
+    with pytest.raises(ValueError):
+        Principal.from_claims({"sub": "a@example.com", "uid": 1, "user_type": "pirate", "active": True, "ver": 0})
+
+@pytest.mark.asyncio
+async def test_token_version_is_cached_until_invalidated():
+    cache = TokenVersionCache(max_size=10, ttl_seconds=60)
+    db = FakeSession(version=0)
+
+    assert await cache.is_current(db, 1, 0)
+    assert await cache.is_current(db, 1, 0)
+    assert db.queries == 1
+
+    db.version = 1
+    cache.invalidate_users({1})
+
+    assert not await cache.is_current(db, 1, 0)
+    assert db.queries == 2
+
+@pytest.mark.asyncio
+async def test_deleted_user_has_no_valid_tokens():
+    cache = TokenVersionCache(max_size=10, ttl_seconds=60)
+
+    assert not await cache.is_current(FakeSession(version=None), 1, 0)
+
+@pytest.mark.asyncio
+async def test_token_version_is_read_on_the_primary():
+    cache = TokenVersionCache(max_size=10, ttl_seconds=60)
+    db = FakeSession(version=2)
+    db.info["allow_replica"] = True
+
+    assert await cache.is_current(db, 1, 2)
+    assert db.replica_queries == 0
+    assert db.info["allow_replica"] is True
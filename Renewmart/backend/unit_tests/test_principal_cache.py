@@ -0,0 +1,46 @@
+import time
+
+from app.core.principal_cache import PrincipalCache
+from app.models.user import User, UserType
+
+def make_user(id):
+    return User(id=id, email=f"user{id}@example.com", name="User", user_type=UserType.LANDOWNER, is_active=True)
+
+def test_returns_detached_snapshot():
+    cache = PrincipalCache(max_size=10, ttl_seconds=60)
+    user = make_user(1)
+
+    cache.put("token", user)
+    cached = cache.get("token")
+
+    assert cached is not user
+    assert (cached.id, cached.email) == (1, "user1@example.com")
+
+def test_evicts_least_recently_used():
+    cache = PrincipalCache(max_size=2, ttl_seconds=60)
+    cache.put("a", make_user(1))
+    cache.put("b", make_user(2))
+    cache.get("a")
+
+    cache.put("c", make_user(3))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+def test_entry_does_not_outlive_token():
+    cache = PrincipalCache(max_size=10, ttl_seconds=60)
+
+    cache.put("expired", make_user(1), token_expires_at=time.time() - 1)
+
+    assert cache.get("expired") is None
+
+def test_invalidate_users_drops_all_their_tokens():
+    cache = PrincipalCache(max_size=10, ttl_seconds=60)
+    cache.put("a", make_user(1))
+    cache.put("b", make_user(1))
+    cache.put("c", make_user(2))
+
+    cache.invalidate_users({1})
+
+    assert cache.get("a") is None and cache.get("b") is None
+    assert cache.get("c") is not None
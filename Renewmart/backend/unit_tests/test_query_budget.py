@@ -0,0 +1,37 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.db.instrumentation import instrument_engine, assert_query_budget, query_budget
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    return engine
+
+def test_query_budget_within_limit_passes(engine):
+    @query_budget(2)
+    async def get_things():
+        pass
+
+    with assert_query_budget(get_things) as stats:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+
+    assert stats.count == 2
+    assert stats.total_ms >= 0
+
+def test_query_budget_exceeded_fails_with_statements(engine):
+    @query_budget(1)
+    async def get_things():
+        pass
+
+    with pytest.raises(AssertionError) as exc_info:
+        with assert_query_budget(get_things):
+            with engine.connect() as conn:
+                for i in range(3):
+                    conn.execute(text(f"SELECT {i}"))
+
+    assert "get_things issued 3 queries, budget is 1" in str(exc_info.value)
+    assert "SELECT 2" in str(exc_info.value)
@@ -0,0 +1,46 @@
+import pytest
+from collections import Counter
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import rate_limit
+from app.core.rate_limit import MemoryBackend, RateLimit, RateLimitBackend
+
+@pytest.mark.asyncio
+async def test_previous_window_decays_linearly():
+    backend = MemoryBackend()
+    for _ in range(10):
+        await backend.hit("k", 60, now=30)
+
+    # A quarter into the next window, 75% of the previous window still counts
+    assert await backend.hit("k", 60, now=75) == pytest.approx(10 * 0.75 + 1)
+    # Two windows later everything has expired
+    assert await backend.hit("k", 60, now=200) == 1
+
+def test_rejects_per_account_before_the_endpoint_runs(monkeypatch):
+    monkeypatch.setattr(rate_limit, "_backend", MemoryBackend())
+    monkeypatch.setattr(rate_limit, "rejections", Counter())
+    limiter = RateLimit("test", per_ip=100, per_account=2, window_seconds=60, account_field="username")
+    calls = []
+    app = FastAPI()
+
+    @app.post("/login", dependencies=[Depends(limiter)])
+    async def login():
+        calls.append(1)
+        return {}
+
+    client = TestClient(app)
+    codes = [client.post("/login", data={"username": "User@example.com"}).status_code for _ in range(3)]
+    other = client.post("/login", data={"username": "other@example.com"})
+
+    assert codes == [200, 200, 429]
+    assert other.status_code == 200
+    assert len(calls) == 3
+    assert rate_limit.rejections[("test", "account")] == 1
+
+def test_backend_without_hit_cannot_be_created():
+    class IncompleteBackend(RateLimitBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteBackend()
@@ -0,0 +1,32 @@
+import pytest
+from types import SimpleNamespace
+from fastapi import HTTPException
+
+from app.db.repository import get_or_404
+from app.models.notification import Notification
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.info = {}
+
+    async def get(self, model, id):
+        return self.rows.get(id)
+
+@pytest.mark.asyncio
+async def test_get_or_404_returns_row():
+    row = SimpleNamespace(id=1, user_id=5)
+    db = FakeSession({1: row})
+
+    assert await get_or_404(db, Notification, 1, user_id=5) is row
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("id, scope", [(2, {}), (1, {"user_id": 6})])
+async def test_get_or_404_raises_for_missing_or_foreign_row(id, scope):
+    db = FakeSession({1: SimpleNamespace(id=1, user_id=5)})
+
+    with pytest.raises(HTTPException) as exc_info:
+        await get_or_404(db, Notification, id, "Notification not found", **scope)
+
+    assert exc_info.value.status_code == 404
+    assert exc_info.value.detail == "Notification not found"
@@ -0,0 +1,57 @@
+import pytest
+from datetime import datetime, timezone
+
+from app.core.revocation import BloomFilter, RevocationList
+
+class FakeSession:
+    def __init__(self):
+        self.rows = {}
+        self.lookups = 0
+        self.info = {}
+        self.replica_lookups = 0
+
+    async def get(self, model, key):
+        self.lookups += 1
+        if self.info.get("allow_replica"):
+            self.replica_lookups += 1
+        return self.rows.get(key)
+
+    def add(self, row):
+        self.rows[row.jti] = row
+
+    async def commit(self):
+        pass
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000)
+    added = [f"jti-{i}" for i in range(1000)]
+    for jti in added:
+        bloom.add(jti)
+
+    assert all(jti in bloom for jti in added)
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+@pytest.mark.asyncio
+async def test_only_probable_hits_touch_storage():
+    revocations = RevocationList(capacity=100, refresh_interval=30)
+    revocations._rebuild([], 0)
+    db = FakeSession()
+
+    await revocations.revoke(db, "revoked", 1, datetime.now(timezone.utc))
+    db.lookups = 0
+
+    assert await revocations.is_revoked(db, "revoked")
+    assert not await revocations.is_revoked(db, "valid")
+    assert db.lookups == 1
+
+@pytest.mark.asyncio
+async def test_revocation_lookups_read_the_primary():
+    revocations = RevocationList(capacity=0, refresh_interval=60)
+    db = FakeSession()
+    await revocations.revoke(db, "jti-1", 1, datetime.now(timezone.utc))
+    db.info["allow_replica"] = True
+
+    assert await revocations.is_revoked(db, "jti-1")
+    assert db.replica_lookups == 0
+    assert db.info["allow_replica"] is True
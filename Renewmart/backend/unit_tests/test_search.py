@@ -0,0 +1,29 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.db.search import fuzzy_match, fuzzy_search, ranked_page
+from app.models.project import ApprovalRule
+
+def compile_pg(query):
+    return query.compile(dialect=postgresql.dialect())
+
+def test_fuzzy_match_escapes_like_wildcards():
+    compiled = compile_pg(select(ApprovalRule).where(fuzzy_match(ApprovalRule.region, "50%_off")))
+
+    assert "approval_rules.region ILIKE" in str(compiled)
+    assert "approval_rules.region %% " in str(compiled)
+    assert "%50/%/_off%" in compiled.params.values()
+    assert "50%_off" in compiled.params.values()
+
+def test_fuzzy_search_ranks_by_similarity():
+    compiled = str(compile_pg(fuzzy_search(select(ApprovalRule), ApprovalRule.name, "permit")))
+
+    assert "ORDER BY similarity(approval_rules.name, " in compiled
+
+@pytest.mark.asyncio
+async def test_ranked_page_rejects_cursors():
+    with pytest.raises(HTTPException) as exc_info:
+        await ranked_page(None, select(ApprovalRule), ApprovalRule.name, "permit", cursor="WzFd")
+    assert exc_info.value.status_code == 400
@@ -0,0 +1,45 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from app.core import security
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_off_the_event_loop(monkeypatch):
+    monkeypatch.setattr(security, "pwd_context", CryptContext(schemes=["bcrypt"], bcrypt__rounds=4))
+
+    hashed = await security.hash_password("secret")
+
+    assert await security.verify_password("secret", hashed)
+    assert not await security.verify_password("wrong", hashed)
+
+@pytest.mark.asyncio
+async def test_rehashes_when_work_factor_changes(monkeypatch):
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("secret")
+    monkeypatch.setattr(security, "pwd_context", CryptContext(schemes=["bcrypt"], bcrypt__rounds=5))
+
+    verified, new_hash = await security.verify_and_update("secret", old_hash)
+
+    assert verified and new_hash.startswith("$2b$05$")
+    assert await security.verify_and_update("secret", new_hash) == (True, None)
+
+@pytest.mark.asyncio
+async def test_sheds_load_beyond_max_pending(monkeypatch):
+    monkeypatch.setattr(security.settings, "password_hash_max_pending", 1)
+    release = asyncio.Event()
+    loop = asyncio.get_running_loop()
+
+    def slow_hash(password):
+        asyncio.run_coroutine_threadsafe(release.wait(), loop).result()
+        return "hashed"
+
+    first = asyncio.create_task(security._run(slow_hash, "a"))
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await security._run(slow_hash, "b")
+    assert exc_info.value.status_code == 503
+
+    release.set()
+    assert await first == "hashed"
@@ -0,0 +1,20 @@
+from datetime import datetime, timezone
+
+from app.core.sessions import _new_session, hash_refresh_token
+from app.models.user import User
+
+def test_only_the_hash_of_a_refresh_token_is_stored():
+    user = User(id=3, token_version=2)
+
+    session, token = _new_session(user, family_id="family")
+
+    assert session.token_hash == hash_refresh_token(token) != token
+    assert (session.user_id, session.family_id, session.token_version) == (3, "family", 2)
+    assert session.expires_at > datetime.now(timezone.utc)
+
+def test_each_session_gets_a_distinct_token():
+    user = User(id=3, token_version=0)
+
+    tokens = {_new_session(user, family_id="family")[1] for _ in range(100)}
+
+    assert len(tokens) == 100
@@ -0,0 +1,41 @@
+import pytest
+from datetime import datetime
+
+from app.models.notification import NotificationTemplate
+from app.services.templates import TemplateError, TemplateRenderer
+
+def make_template(updated_at=datetime(2025, 1, 1), message="Hi {{ user_name }}, please {{ action }}"):
+    return NotificationTemplate(
+        id=7,
+        subject_template="Task {{ task }}",
+        message_template=message,
+        variables=["task", "action"],
+        updated_at=updated_at
+    )
+
+def test_validate_rejects_undeclared_variables():
+    renderer = TemplateRenderer()
+
+    renderer.validate("Task {{ task }}", "Hi {{ user_name }}", ["task"])
+    with pytest.raises(TemplateError, match="secret"):
+        renderer.validate("Task {{ task }}", "{{ secret }}", ["task"])
+
+def test_compiled_template_is_cached_until_the_template_changes():
+    renderer = TemplateRenderer()
+    template = make_template()
+
+    assert renderer.compile(template) is renderer.compile(template)
+
+    edited = make_template(updated_at=datetime(2025, 2, 1), message="Please {{ action }}")
+    assert renderer.compile(edited) is not renderer.compile(template)
+    assert renderer.compile(edited).render({"task": "T1", "action": "sign"}) == ("Task T1", "Please sign")
+
+def test_render_batch_checks_every_context_first():
+    renderer = TemplateRenderer()
+    contexts = [
+        {"task": "T1", "action": "review", "user_name": "A"},
+        {"task": "T1", "user_name": "B"},
+    ]
+
+    with pytest.raises(TemplateError, match="action"):
+        renderer.render_batch(make_template(), contexts)
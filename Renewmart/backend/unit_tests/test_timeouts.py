@@ -0,0 +1,63 @@
+import asyncio
+import json
+import pytest
+from sqlalchemy import exc
+
+from app.db.timeouts import CancelOnDisconnectMiddleware, database_error_handler, statement_timeout, timeout_for_scope
+from app.core.config import settings
+
+def test_timeout_for_scope_uses_route_class():
+    @statement_timeout("report")
+    async def report():
+        pass
+
+    async def detail():
+        pass
+
+    assert timeout_for_scope({"endpoint": report}) == settings.statement_timeout_report_ms
+    assert timeout_for_scope({"endpoint": detail}) == settings.statement_timeout_detail_ms
+    assert timeout_for_scope({"endpoint": statement_timeout(750)(detail)}) == 750
+
+def test_unknown_route_class_is_rejected():
+    with pytest.raises(ValueError):
+        statement_timeout("bulk")
+
+@pytest.mark.asyncio
+async def test_client_disconnect_cancels_handler():
+    cancelled = asyncio.Event()
+
+    async def slow_app(scope, receive, send):
+        await receive()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    incoming = [{"type": "http.request", "body": b"", "more_body": False}, {"type": "http.disconnect"}]
+
+    async def receive():
+        if len(incoming) == 1:
+            await asyncio.sleep(0.01)
+        return incoming.pop(0)
+
+    async def send(message):
+        raise AssertionError("nothing should be sent to a disconnected client")
+
+    middleware = CancelOnDisconnectMiddleware(slow_app)
+    await asyncio.wait_for(middleware({"type": "http", "method": "GET", "path": "/"}, receive, send), 1)
+
+    assert cancelled.is_set()
+
+@pytest.mark.asyncio
+async def test_query_cancelled_maps_to_503():
+    class QueryCanceled(Exception):
+        sqlstate = "57014"
+
+    error = exc.OperationalError("SELECT 1", {}, QueryCanceled("canceling statement due to statement timeout"))
+    request = type("FakeRequest", (), {"method": "GET", "url": type("U", (), {"path": "/documents/"})()})()
+
+    response = await database_error_handler(request, error)
+
+    assert response.status_code == 503
+    assert json.loads(response.body) == {"detail": "Database query timed out"}
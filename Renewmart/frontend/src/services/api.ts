@@ -21,6 +21,7 @@ const API_BASE_URL = 'http://localhost:8001/api/v1';
 class ApiService {
   private baseURL: string;
   private token: string | null = null;
+  private refreshing: Promise<boolean> | null = null;
 
   constructor(baseURL: string = API_BASE_URL) {
     this.baseURL = baseURL;
@@ -63,8 +64,8 @@ class ApiService {
             }
             return await retryResponse.json();
           } else {
-            // Refresh failed, redirect to login
-            this.logout();
+            // Refresh failed, the session is over; redirect to login
+            this.clearToken();
             throw new Error('Authentication failed');
           }
         }
@@ -94,7 +95,7 @@ class ApiService {
     }
 
     const data: AuthResponse = await response.json();
-    this.setToken(data.access_token);
+    this.setToken(data.access_token, data.refresh_token);
     return data;
   }
 
@@ -106,12 +107,35 @@ class ApiService {
     return response;
   }
 
-  async refreshToken(): Promise<boolean> {
+  // Concurrent callers share one refresh: a refresh token is single-use, and
+  // reusing it ends the session
+  refreshToken(): Promise<boolean> {
+    if (!this.refreshing) {
+      this.refreshing = this.rotateRefreshToken().finally(() => {
+        this.refreshing = null;
+      });
+    }
+    return this.refreshing;
+  }
+
+  // Not through request(): the access token may already be expired, and a
+  // 401 here must not trigger another refresh
+  private async rotateRefreshToken(): Promise<boolean> {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (!refreshToken) {
+      return false;
+    }
     try {
-      const response = await this.request<RefreshResponse>('/auth/refresh', {
+      const response = await fetch(`${this.baseURL}/auth/token/refresh`, {
         method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ refresh_token: refreshToken }),
       });
-      this.setToken(response.access_token);
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      const data: RefreshResponse = await response.json();
+      this.setToken(data.access_token, data.refresh_token);
       return true;
     } catch (error) {
       console.error('Token refresh failed:', error);
@@ -121,6 +145,14 @@ class ApiService {
 
   async logout(): Promise<void> {
     try {
+      const refreshToken = localStorage.getItem('refresh_token');
+      if (refreshToken) {
+        // Ends the session, so its refresh token cannot outlive the logout
+        await this.request('/auth/token/revoke', {
+          method: 'POST',
+          body: JSON.stringify({ refresh_token: refreshToken }),
+        });
+      }
       await this.request('/auth/logout', {
         method: 'POST',
       });
@@ -132,14 +164,18 @@ class ApiService {
   }
 
   // Token Management
-  setToken(token: string): void {
+  setToken(token: string, refreshToken?: string): void {
     this.token = token;
     localStorage.setItem('access_token', token);
+    if (refreshToken) {
+      localStorage.setItem('refresh_token', refreshToken);
+    }
   }
 
   clearToken(): void {
     this.token = null;
     localStorage.removeItem('access_token');
+    localStorage.removeItem('refresh_token');
   }
 
   getToken(): string | null {
@@ -672,6 +708,43 @@ class ApiService {
     return this.request<Notification[]>('/notifications/unread');
   }
 
+  // Pushes new notifications and unread-count changes; call close() on the result to stop.
+  // A digest is pushed again when events are merged into it: replace notifications by id.
+  streamNotifications(
+    onNotification: (notification: Notification) => void,
+    onUnreadCount: (unreadCount: number) => void
+  ): { close: () => void } {
+    let source: EventSource;
+    let closed = false;
+
+    const open = () => {
+      const params = new URLSearchParams({ access_token: this.token || '' });
+      source = new EventSource(`${this.baseURL}/notifications/stream?${params}`);
+
+      source.addEventListener('notification', (event) => {
+        onNotification(JSON.parse((event as MessageEvent).data));
+      });
+      source.addEventListener('unread_count', (event) => {
+        onUnreadCount(JSON.parse((event as MessageEvent).data).unread_count);
+      });
+      source.addEventListener('expired', async () => {
+        // Sent shortly before the access token expires; reopen with a fresh one
+        source.close();
+        if (!closed && await this.refreshToken()) {
+          open();
+        }
+      });
+    };
+
+    open();
+    return {
+      close: () => {
+        closed = true;
+        source.close();
+      },
+    };
+  }
+
   async getNotification(notificationId: number): Promise<Notification> {
     return this.request<Notification>(`/notifications/${notificationId}`);
   }
@@ -39,12 +39,14 @@ export interface UserLogin {
 // Authentication Types
 export interface AuthResponse {
   access_token: string;
+  refresh_token: string;
   token_type: string;
   user: User;
 }
 
 export interface RefreshResponse {
   access_token: string;
+  refresh_token: string;
   token_type: string;
 }
 